@@ -1,26 +1,62 @@
-from flask import Flask, request, render_template, redirect, url_for, jsonify, flash
+from flask import Flask, Response, g, request, render_template, redirect, url_for, jsonify, flash, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, bindparam, event, insert, or_, select, union_all, update
+from sqlalchemy.engine import Engine
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from werkzeug.exceptions import HTTPException
 from werkzeug.security import generate_password_hash, check_password_hash
+import atexit
 import json
+import os
+import sqlite3
 import time
-import random
-import math
 from hashlib import sha256
 from uuid import uuid4
-from collections import defaultdict, Counter
 from datetime import datetime
 
+from blockchain import DEMO_BALANCES, NetworkParameters, Blockchain, transfer_error
+from block_store import BlockStore
+from events import EventBus
+from ledger import Ledger
+from metrics import REGISTRY
+from mining import start_search_pool
+from mining_jobs import MiningJobManager
+from profiler import DEFAULT_INTERVAL, SamplingProfiler
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///cryptosim.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('CRYPTOSIM_DATABASE_URI', 'sqlite:///cryptosim.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['MAX_SEND_BATCH'] = 10000
+app.config['PROFILE_PAGE_SIZE'] = 10
+app.config['MAX_MINING_JOBS'] = 8  # running at once; more get 429
+# Directory for the on-disk block log; set CRYPTOSIM_CHAIN_DIR to "" to keep the chain in memory only
+app.config['CHAIN_DATA_DIR'] = os.environ.get('CRYPTOSIM_CHAIN_DIR', os.path.join(app.instance_path, 'chaindata'))
+# /metrics and the timing behind it; CRYPTOSIM_METRICS=0 turns both off
+app.config['METRICS_ENABLED'] = os.environ.get('CRYPTOSIM_METRICS', '1') != '0'
+# /debug/profile captures stacks on demand; off unless CRYPTOSIM_PROFILER=1
+app.config['PROFILER_ENABLED'] = os.environ.get('CRYPTOSIM_PROFILER') == '1'
+REGISTRY.enabled = app.config['METRICS_ENABLED']
 
 db = SQLAlchemy(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+@event.listens_for(Engine, 'connect')
+def tune_sqlite(dbapi_connection, connection_record):
+    """WAL lets page reads run while /send commits; NORMAL sync is durable enough under WAL"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.execute('PRAGMA cache_size=-65536')  # 64MB page cache
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.close()
+
 # ------------------------
 # Database Models
 # ------------------------
@@ -44,290 +80,91 @@ class UserTransaction(db.Model):
     txid = db.Column(db.String(64), unique=True, nullable=False)
     status = db.Column(db.String(20), default='pending')  # pending, confirmed, failed
 
+    # A user's history is read newest first from either side of the transfer
+    __table_args__ = (
+        db.Index('ix_user_transaction_sender_time', 'sender_id', 'timestamp'),
+        db.Index('ix_user_transaction_recipient_time', 'recipient_id', 'timestamp'),
+    )
+
+def transfer_page(user_id, limit, before=None):
+    """`limit` of a user's transfers, newest first, older than the transfer with id `before`.
+
+    Keyset pagination on (timestamp, id): each side of the transfer walks its
+    own index from the cursor, so a page costs the same however deep it is.
+    """
+    branches = []
+    for column in (UserTransaction.sender_id, UserTransaction.recipient_id):
+        branch = select(UserTransaction.id).where(column == user_id)
+        if column is UserTransaction.recipient_id:
+            branch = branch.where(UserTransaction.sender_id != user_id)  # self-transfers come from the sender side
+        if before is not None:
+            cursor = select(UserTransaction.timestamp).where(UserTransaction.id == before).scalar_subquery()
+            branch = branch.where(UserTransaction.timestamp <= cursor, or_(
+                UserTransaction.timestamp < cursor,
+                and_(UserTransaction.timestamp == cursor, UserTransaction.id < before)))
+        branches.append(branch.order_by(UserTransaction.timestamp.desc(), UserTransaction.id.desc())
+                        .limit(limit).subquery().select())
+    ids = union_all(*branches).subquery()
+    return db.session.scalars(
+        select(UserTransaction).where(UserTransaction.id.in_(select(ids.c.id)))
+        .order_by(UserTransaction.timestamp.desc(), UserTransaction.id.desc()).limit(limit)
+    ).all()
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-# ------------------------
-# Network Parameters
-# ------------------------
-class NetworkParameters:
-    def __init__(self):
-        self.block_size_limit = 1000000  # 1MB in bytes
-        self.mining_difficulty = 3
-        self.transaction_fee = 0.001
-        self.block_time_target = 10  # seconds
-        self.max_transactions_per_block = 1000
-        self.network_hashrate = 1000000  # hashes per second
-        self.node_count = 10
-        self.miner_distribution = {
-            'large_miners': 0.3,  # 30% of hashrate
-            'medium_miners': 0.4,  # 40% of hashrate
-            'small_miners': 0.3   # 30% of hashrate
-        }
-
-# ------------------------
-# Blockchain Components
-# ------------------------
-class Block:
-    def __init__(self, index, timestamp, transactions, previous_hash, nonce=0, block_size=0):
-        self.index = index
-        self.timestamp = timestamp
-        self.transactions = transactions
-        self.previous_hash = previous_hash
-        self.nonce = nonce
-        self.block_size = block_size
-        self.hash = self.compute_hash()
-
-    def compute_hash(self):
-        block_string = json.dumps(self.__dict__, sort_keys=True)
-        return sha256(block_string.encode()).hexdigest()
-
-class Transaction:
-    def __init__(self, sender, recipient, amount, fee=0.001, timestamp=None):
-        self.sender = sender
-        self.recipient = recipient
-        self.amount = float(amount)
-        self.fee = float(fee)
-        self.timestamp = timestamp or time.time()
-        self.txid = self.compute_txid()
-        self.size = len(json.dumps(self.__dict__))
-
-    def compute_txid(self):
-        tx_string = json.dumps({
-            'sender': self.sender,
-            'recipient': self.recipient,
-            'amount': self.amount,
-            'fee': self.fee,
-            'timestamp': self.timestamp
-        }, sort_keys=True)
-        return sha256(tx_string.encode()).hexdigest()
-
-class Blockchain:
-    def __init__(self, network_params):
-        self.chain = []
-        self.current_transactions = []
-        self.network_params = network_params
-        self.balances = defaultdict(float)
-        self.mempool = []
-        self.mining_stats = {
-            'total_blocks_mined': 0,
-            'total_transactions_processed': 0,
-            'average_block_time': 0,
-            'difficulty_adjustments': 0,
-            'orphaned_blocks': 0
-        }
-        self.decentralization_metrics = {
-            'gini_coefficient': 0,
-            'herfindahl_index': 0,
-            'top_miners_concentration': 0,
-            'node_distribution': {}
-        }
-        self.miner_stats = defaultdict(lambda: {
-            'blocks_mined': 0,
-            'total_rewards': 0,
-            'hashrate': 0
-        })
-        self.create_genesis_block()
-
-    def create_genesis_block(self):
-        genesis_block = Block(0, time.time(), [], "0", block_size=0)
-        self.chain.append(genesis_block)
-
-    def get_last_block(self):
-        return self.chain[-1]
-
-    def add_transaction(self, sender, recipient, amount, fee=None):
-        if fee is None:
-            fee = self.network_params.transaction_fee
-        
-        amount = float(amount)
-        fee = float(fee)
-        
-        if sender != "MINER" and self.balances[sender] < (amount + fee):
-            return False, "Insufficient balance"
-        
-        transaction = Transaction(sender, recipient, amount, fee)
-        
-        # Check if transaction would fit in a block
-        if transaction.size > self.network_params.block_size_limit:
-            return False, "Transaction too large"
-        
-        self.mempool.append(transaction)
-        
-        if sender != "MINER":
-            self.balances[sender] -= (amount + fee)
-        self.balances[recipient] += amount
-        
-        return True, transaction.txid
-
-    def select_transactions_for_block(self):
-        """Select transactions from mempool based on fee priority and size limits"""
-        sorted_mempool = sorted(self.mempool, key=lambda tx: tx.fee/tx.size, reverse=True)
-        
-        selected_transactions = []
-        current_size = 0
-        
-        for tx in sorted_mempool:
-            if (current_size + tx.size <= self.network_params.block_size_limit and 
-                len(selected_transactions) < self.network_params.max_transactions_per_block):
-                selected_transactions.append(tx)
-                current_size += tx.size
-        
-        return selected_transactions, current_size
-
-    def proof_of_work(self, block):
-        block.nonce = 0
-        block.hash = block.compute_hash()
-        target = '0' * self.network_params.mining_difficulty
-        
-        while not block.hash.startswith(target):
-            block.nonce += 1
-            block.hash = block.compute_hash()
-        
-        return block.hash
-
-    def mine_block(self, miner):
-        if not self.mempool:
-            return None, "No transactions to mine"
-        
-        # Select transactions for this block
-        selected_transactions, block_size = self.select_transactions_for_block()
-        
-        if not selected_transactions:
-            return None, "No valid transactions to mine"
-        
-        # Calculate total fees
-        total_fees = sum(tx.fee for tx in selected_transactions)
-        
-        # Add mining reward transaction
-        reward_tx = Transaction("MINER", miner, 10.0 + total_fees, 0)
-        selected_transactions.append(reward_tx)
-        
-        last_block = self.get_last_block()
-        new_block = Block(
-            index=last_block.index + 1,
-            timestamp=time.time(),
-            transactions=selected_transactions,
-            previous_hash=last_block.hash,
-            block_size=block_size
-        )
-        
-        new_block.hash = self.proof_of_work(new_block)
-        self.chain.append(new_block)
-        
-        # Remove mined transactions from mempool
-        for tx in selected_transactions[:-1]:  # Exclude reward transaction
-            if tx in self.mempool:
-                self.mempool.remove(tx)
-        
-        # Update mining statistics
-        self.mining_stats['total_blocks_mined'] += 1
-        self.mining_stats['total_transactions_processed'] += len(selected_transactions) - 1
-        
-        # Update miner statistics
-        self.miner_stats[miner]['blocks_mined'] += 1
-        self.miner_stats[miner]['total_rewards'] += 10.0 + total_fees
-        
-        # Calculate decentralization metrics
-        self.update_decentralization_metrics()
-        
-        return new_block, f"Block mined successfully with {len(selected_transactions)-1} transactions"
-
-    def update_decentralization_metrics(self):
-        """Calculate various decentralization metrics"""
-        if not self.miner_stats:
-            return
-        
-        # Calculate Gini coefficient for mining rewards
-        rewards = [stats['total_rewards'] for stats in self.miner_stats.values()]
-        if len(rewards) > 1:
-            rewards.sort()
-            n = len(rewards)
-            cumsum = sum(rewards)
-            gini_numerator = sum((2 * i - n - 1) * reward for i, reward in enumerate(rewards, 1))
-            gini_denominator = n * cumsum
-            self.decentralization_metrics['gini_coefficient'] = gini_numerator / gini_denominator if gini_denominator > 0 else 0
-        
-        # Calculate Herfindahl-Hirschman Index
-        total_rewards = sum(rewards)
-        if total_rewards > 0:
-            market_shares = [reward / total_rewards for reward in rewards]
-            self.decentralization_metrics['herfindahl_index'] = sum(share ** 2 for share in market_shares)
-        
-        # Top miners concentration (percentage controlled by top 3 miners)
-        sorted_miners = sorted(self.miner_stats.items(), key=lambda x: x[1]['total_rewards'], reverse=True)
-        top_3_rewards = sum(stats['total_rewards'] for _, stats in sorted_miners[:3])
-        total_rewards = sum(stats['total_rewards'] for _, stats in self.miner_stats.values())
-        self.decentralization_metrics['top_miners_concentration'] = (top_3_rewards / total_rewards * 100) if total_rewards > 0 else 0
-
-    def adjust_difficulty(self):
-        """Adjust mining difficulty based on recent block times"""
-        if len(self.chain) < 10:
-            return
-        
-        recent_blocks = self.chain[-10:]
-        actual_time = recent_blocks[-1].timestamp - recent_blocks[0].timestamp
-        target_time = self.network_params.block_time_target * 10
-        
-        if actual_time < target_time * 0.5:
-            self.network_params.mining_difficulty += 1
-        elif actual_time > target_time * 2:
-            self.network_params.mining_difficulty = max(1, self.network_params.mining_difficulty - 1)
-        
-        self.mining_stats['difficulty_adjustments'] += 1
-
-    def get_network_analytics(self):
-        """Get comprehensive network analytics"""
-        return {
-            'network_params': {
-                'block_size_limit': self.network_params.block_size_limit,
-                'mining_difficulty': self.network_params.mining_difficulty,
-                'transaction_fee': self.network_params.transaction_fee,
-                'block_time_target': self.network_params.block_time_target,
-                'max_transactions_per_block': self.network_params.max_transactions_per_block
-            },
-            'mining_stats': self.mining_stats,
-            'decentralization_metrics': self.decentralization_metrics,
-            'mempool_size': len(self.mempool),
-            'total_blocks': len(self.chain),
-            'total_transactions': self.mining_stats['total_transactions_processed'],
-            'average_block_size': sum(block.block_size for block in self.chain) / len(self.chain) if self.chain else 0,
-            'miner_distribution': dict(self.miner_stats)
-        }
-
-    def to_dict(self):
-        return [block.__dict__ for block in self.chain]
-
-    def get_transaction_history(self):
-        history = []
-        for block in self.chain:
-            for txn in block.transactions:
-                if hasattr(txn, 'txid'):  # Transaction object
-                    txn_dict = {
-                        'txid': txn.txid,
-                        'sender': txn.sender,
-                        'recipient': txn.recipient,
-                        'amount': txn.amount,
-                        'fee': txn.fee,
-                        'timestamp': txn.timestamp,
-                        'block': block.index
-                    }
-                else:  # Legacy transaction dict
-                    txn_dict = txn.copy()
-                    txn_dict['block'] = block.index
-                history.append(txn_dict)
-        return history
-
 # ------------------------
 # App Initialization
 # ------------------------
+# Parallel nonce searches share one worker pool. Starting it here, before
+# the ledger and server threads exist, lets its workers be forked safely.
+start_search_pool()
 network_params = NetworkParameters()
-blockchain = Blockchain(network_params)
-blockchain.balances['alice'] = 50
-blockchain.balances['bob'] = 30
-blockchain.balances['carol'] = 20
+block_store = BlockStore(app.config['CHAIN_DATA_DIR']) if app.config['CHAIN_DATA_DIR'] else None
+event_bus = EventBus()
+blockchain = Blockchain(network_params, store=block_store, events=event_bus)
+if len(blockchain.chain) == 1:  # Fresh chain: seed the demo accounts
+    blockchain.open_accounts(DEMO_BALANCES)
+# Request threads never change `blockchain`: writes go through the ledger's
+# writer thread. Reads use its latest snapshot; the chain and its indexes are
+# read in place but only up to the snapshot's height. Blocks and index entries
+# are only ever appended, so that part cannot change under a reader.
+ledger = Ledger(blockchain)
+mining_jobs = MiningJobManager(ledger, max_running=app.config['MAX_MINING_JOBS'])
+atexit.register(ledger.close)
+atexit.register(mining_jobs.cancel_all)  # runs first: atexit is last-in, first-out
 node_id = str(uuid4()).replace('-', '')
+profiler = SamplingProfiler()
+
+# ------------------------
+# Metrics
+# ------------------------
+REQUEST_SECONDS = REGISTRY.histogram('cryptosim_request_seconds', 'Time to handle a request, by route',
+                                     labels=('route', 'method', 'status'))
+REGISTRY.gauge('cryptosim_hashes_per_second', 'Measured hash rate over the last 10 seconds of nonce searching',
+               function=lambda: blockchain.hashrate.rate())
+REGISTRY.gauge('cryptosim_mempool_transactions', 'Transactions waiting in the mempool',
+               function=lambda: len(ledger.snapshot.mempool))
+REGISTRY.gauge('cryptosim_mempool_bytes', 'Total size of the transactions waiting in the mempool',
+               function=lambda: ledger.snapshot.mempool.total_bytes)
+REGISTRY.gauge('cryptosim_chain_height', 'Height of the chain tip', function=lambda: ledger.snapshot.height)
+REGISTRY.gauge('cryptosim_average_block_time_seconds', 'Exponentially weighted mean of recent block intervals',
+               function=lambda: ledger.snapshot.analytics['mining_stats']['average_block_time'])
+
+if app.config['METRICS_ENABLED']:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        # Streamed responses are timed to their first byte; unmatched paths are left out
+        started = g.pop('request_started', None)
+        if started is not None and request.url_rule is not None:
+            REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                    (request.url_rule.rule, request.method, str(response.status_code)))
+        return response
 
 # ------------------------
 # Flask Routes
@@ -335,114 +172,330 @@ node_id = str(uuid4()).replace('-', '')
 @app.route('/')
 @login_required
 def index():
-    # Get user balances from database
-    users = User.query.all()
-    user_balances = {user.username: user.balance for user in users}
+    # Open a ledger account for a user who signed up since the chain started
+    if current_user.username not in ledger.snapshot.balances:
+        ledger.open_accounts({current_user.username: current_user.balance})
     
-    # Update blockchain balances to match database
-    blockchain.balances = user_balances
-    
-    return render_template('index.html', balances=user_balances, user=current_user)
+    return render_template('index.html', user=current_user)
 
 @app.route('/send', methods=['POST'])
 @login_required
 def send():
+    # The form may repeat the recipient/amount pair to pay several users at once
     sender = current_user.username
-    recipient = request.form['recipient']
-    amount = float(request.form['amount'])
-    fee = float(request.form.get('fee', network_params.transaction_fee))
+    recipients = request.form.getlist('recipient')
+    amounts = [float(amount) for amount in request.form.getlist('amount')]
+    fee = float(request.form.get('fee') or network_params.transaction_fee)
     
-    # Check if recipient exists
-    recipient_user = User.query.filter_by(username=recipient).first()
-    if not recipient_user:
+    # Check that every recipient exists, in one query
+    users = dict(db.session.execute(
+        select(User.username, User.id).where(User.username.in_(recipients))).all())
+    if not recipients or len(recipients) != len(amounts) or any(name not in users for name in recipients):
         flash('Recipient not found', 'error')
         return redirect(url_for('index'))
     
     # Check if user has enough balance
-    if current_user.balance < (amount + fee):
+    if current_user.balance < sum(amounts) + fee * len(amounts):
         flash('Insufficient balance', 'error')
         return redirect(url_for('index'))
     
-    # Create transaction in database
-    txid = sha256(f"{sender}{recipient}{amount}{fee}{time.time()}".encode()).hexdigest()
-    user_transaction = UserTransaction(
-        sender_id=current_user.id,
-        recipient_id=recipient_user.id,
-        amount=amount,
-        fee=fee,
-        txid=txid
-    )
-    db.session.add(user_transaction)
-    
-    # Update balances
-    current_user.balance -= (amount + fee)
-    recipient_user.balance += amount
+    # Users who have not logged in since the chain started have no ledger account yet
+    known = ledger.snapshot.balances
+    missing = [name for name in {sender, *users} if name not in known]
+    if missing:
+        ledger.open_accounts(dict(db.session.execute(
+            select(User.username, User.balance).where(User.username.in_(missing))).all()))
     
     # Add to blockchain
-    success, message = blockchain.add_transaction(sender, recipient, amount, fee)
-    if not success:
-        db.session.rollback()
+    results = ledger.add_transactions([
+        {'sender': sender, 'recipient': name, 'amount': amount, 'fee': fee}
+        for name, amount in zip(recipients, amounts)
+    ])
+    
+    # Record the accepted transfers and update balances: one multi-row insert,
+    # one batched relative update and one commit
+    user_transactions = []
+    changes = {current_user.id: 0.0}
+    now = datetime.utcnow()
+    for name, amount, (success, txid) in zip(recipients, amounts, results):
+        if not success:
+            continue
+        recipient_id = users[name]
+        user_transactions.append({
+            'sender_id': current_user.id,
+            'recipient_id': recipient_id,
+            'amount': amount,
+            'fee': fee,
+            'timestamp': now,
+            'txid': txid,
+            'status': 'pending'
+        })
+        changes[current_user.id] -= amount + fee
+        changes[recipient_id] = changes.get(recipient_id, 0.0) + amount
+    if not user_transactions:
         flash('Transaction failed', 'error')
         return redirect(url_for('index'))
-    
+    db.session.execute(insert(UserTransaction.__table__), user_transactions)
+    db.session.execute(
+        update(User.__table__).where(User.__table__.c.id == bindparam('user_id'))
+        .values(balance=User.__table__.c.balance + bindparam('change')),
+        [{'user_id': user_id, 'change': change} for user_id, change in changes.items()])
     db.session.commit()
-    flash('Transaction sent successfully!', 'success')
+    
+    if len(user_transactions) < len(results):
+        flash(f'{len(user_transactions)} of {len(results)} transactions sent', 'error')
+    else:
+        flash('Transaction sent successfully!', 'success')
     return redirect(url_for('index'))
 
 @app.route('/mine', methods=['POST'])
 @login_required
 def miner():
     miner = current_user.username
-    new_block, message = blockchain.mine_block(miner)
-    if not new_block:
-        flash('Mining failed: ' + message, 'error')
-        return redirect(url_for('index'))
-    
-    flash('Block mined successfully!', 'success')
+    job = mining_jobs.start(miner, continuous='continuous' in request.form)
+    if job is None:
+        flash('Too many mining jobs are running; try again when one finishes', 'error')
+    else:
+        flash(f'Mining job #{job.id} started', 'success')
     return redirect(url_for('index'))
 
+def chain_page_args(snapshot):
+    """Parse ?from_height=&limit=&order= into a page of block heights up to the snapshot's tip"""
+    from_height = request.args.get('from_height', type=int)
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, 1000))
+    descending = request.args.get('order', 'asc') == 'desc'
+    return blockchain.block_heights(from_height, limit, descending, tip=snapshot.height)
+
+def wants_ndjson():
+    return (request.args.get('format') == 'ndjson' or
+            request.accept_mimetypes.best == 'application/x-ndjson')
+
+def is_paginated():
+    return 'from_height' in request.args or 'limit' in request.args
+
+def chain_etag(snapshot):
+    """ETag for chain-derived responses: the snapshot's tip hash plus the exact query"""
+    return sha256(f"{snapshot.tip.hash}|{request.full_path}".encode()).hexdigest()
+
+def conditional(etag, build):
+    """Return 304 when the client already holds `etag`, otherwise the built response"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def ndjson_response(records):
+    return Response(stream_with_context(json.dumps(record) + '\n' for record in records),
+                    mimetype='application/x-ndjson')
+
 @app.route('/chain')
 def get_chain():
-    return jsonify(blockchain.to_dict())
+    snapshot = ledger.snapshot
+
+    def build():
+        heights, next_height = chain_page_args(snapshot)
+        blocks = blockchain.iter_blocks(heights)
+        if wants_ndjson():
+            return ndjson_response(block.to_dict() for block in blocks)
+        if is_paginated():
+            return jsonify({
+                'blocks': [block.to_dict() for block in blocks],
+                'next_from_height': next_height,
+                'height': snapshot.height
+            })
+        return jsonify([block.to_dict() for block in blocks])
+    return conditional(chain_etag(snapshot), build)
 
 @app.route('/balances')
 def get_balances():
-    return jsonify(blockchain.balances)
+    return jsonify(ledger.snapshot.balances.to_dict())
 
 @app.route('/transactions')
 def get_transactions():
-    return jsonify(blockchain.get_transaction_history())
+    snapshot = ledger.snapshot
+
+    def build():
+        heights, next_height = chain_page_args(snapshot)
+        records = blockchain.iter_transaction_history(blockchain.iter_blocks(heights))
+        if wants_ndjson():
+            return ndjson_response(records)
+        if is_paginated():
+            return jsonify({
+                'transactions': list(records),
+                'next_from_height': next_height,
+                'height': snapshot.height
+            })
+        return jsonify(list(records))
+    return conditional(chain_etag(snapshot), build)
+
+@app.route('/events')
+def stream_events():
+    """Server-sent events carrying block, mempool, balance and parameter deltas.
+
+    Reconnecting clients resume from Last-Event-ID (or ?last_event_id=); new
+    clients start from the current event. An id this process did not issue
+    (the server restarted since) gets a reset first.
+    """
+    event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_id = event_bus.last_id if event_id is None else event_bus.parse_id(event_id)
+
+    def stream(last_id):
+        yield 'retry: 3000\n\n'
+        if last_id is None:
+            yield 'event: reset\ndata: {}\n\n'
+            last_id = event_bus.last_id
+        while True:
+            reset, events = event_bus.since(last_id, timeout=15)
+            if reset:
+                yield 'event: reset\ndata: {}\n\n'
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for event_id, event_type, data in events:
+                yield f'id: {event_bus.format_id(event_id)}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n'
+                last_id = event_id
+
+    return Response(stream_with_context(stream(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def get_metrics():
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def view_function_name(path, method):
+    """Name of the view function serving `path`, or None if no route matches"""
+    try:
+        endpoint, _ = app.url_map.bind('localhost').match(path, method=method)
+    except HTTPException:
+        return None
+    return app.view_functions[endpoint].__name__
+
+@app.route('/debug/profile', methods=['POST'])
+def start_profile():
+    """Start sampling stacks through a function ({"function": name}) or a route's view ({"route": path})"""
+    if not app.config['PROFILER_ENABLED']:
+        return jsonify({"error": "Profiler is disabled (set CRYPTOSIM_PROFILER=1)"}), 404
+    data = request.get_json()
+    function = data.get('function')
+    if 'route' in data:
+        function = view_function_name(data['route'], data.get('method', 'GET'))
+        if function is None:
+            return jsonify({"error": "No route matches"}), 400
+    if not function:
+        return jsonify({"error": "A function or route is required"}), 400
+    capture = profiler.start(function, data.get('seconds', 10), float(data.get('interval', DEFAULT_INTERVAL)))
+    if capture is None:
+        return jsonify({"error": "A profile is already being captured"}), 409
+    response = jsonify(capture.to_dict())
+    response.headers['Location'] = url_for('get_profile')
+    return response, 202
+
+@app.route('/debug/profile')
+def get_profile():
+    """Status while capturing, then the folded stacks of the last capture"""
+    capture = profiler.capture if app.config['PROFILER_ENABLED'] else None
+    if capture is None:
+        return jsonify({"error": "No profile captured"}), 404
+    if capture.running:
+        return jsonify(capture.to_dict()), 202
+    return Response(capture.folded(), mimetype='text/plain')
+
+@app.route('/debug/profile', methods=['DELETE'])
+def stop_profile():
+    capture = profiler.stop() if app.config['PROFILER_ENABLED'] else None
+    if capture is None:
+        return jsonify({"error": "No profile captured"}), 404
+    return jsonify(capture.to_dict())
+
+@app.route('/tx/<txid>')
+def get_transaction(txid):
+    snapshot = ledger.snapshot
+    record = blockchain.get_transaction(txid, mempool=snapshot.mempool, tip=snapshot.height)
+    if record is None:
+        return jsonify({"error": "Transaction not found"}), 404
+    return jsonify(record)
+
+@app.route('/tx/<txid>/proof')
+def get_transaction_proof(txid):
+    proof, error = blockchain.get_merkle_proof(txid, tip=ledger.snapshot.height)
+    if proof is None:
+        return jsonify({"error": error}), 404
+    return jsonify(proof)
+
+@app.route('/address/<name>/transactions')
+def get_address_transactions(name):
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+    snapshot = ledger.snapshot
+    total, transactions = blockchain.get_address_transactions(name, offset, limit, tip=snapshot.height)
+    return jsonify({
+        'address': name,
+        'balance': snapshot.balances.get(name, 0),
+        'total': total,
+        'offset': offset,
+        'transactions': transactions
+    })
 
 @app.route('/analytics')
 def get_analytics():
-    return jsonify(blockchain.get_network_analytics())
+    snapshot = ledger.snapshot
+    return conditional(snapshot.version, lambda: Response(snapshot.analytics_json(), mimetype='application/json'))
 
 @app.route('/mempool')
 def get_mempool():
-    return jsonify([{
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    mempool = ledger.snapshot.mempool
+    response = jsonify([{
         'txid': tx.txid,
         'sender': tx.sender,
         'recipient': tx.recipient,
         'amount': tx.amount,
         'fee': tx.fee,
         'size': tx.size
-    } for tx in blockchain.mempool])
+    } for tx in mempool.page(offset, limit)])
+    response.headers['X-Total-Count'] = str(len(mempool))
+    return response
 
-@app.route('/update_params', methods=['POST'])
-def update_network_params():
-    data = request.get_json()
-    
+def apply_network_params(data):
+    """Apply a parameter update; runs on the ledger writer"""
     if 'block_size_limit' in data:
         blockchain.network_params.block_size_limit = int(data['block_size_limit'])
     if 'mining_difficulty' in data:
-        blockchain.network_params.mining_difficulty = int(data['mining_difficulty'])
+        blockchain.network_params.mining_difficulty = float(data['mining_difficulty'])
+    if 'mining_target' in data:
+        blockchain.network_params.mining_target = int(data['mining_target'], 16)
     if 'transaction_fee' in data:
         blockchain.network_params.transaction_fee = float(data['transaction_fee'])
     if 'block_time_target' in data:
         blockchain.network_params.block_time_target = int(data['block_time_target'])
+    if 'retarget_window' in data:
+        blockchain.network_params.retarget_window = max(0, int(data['retarget_window']))
     if 'max_transactions_per_block' in data:
         blockchain.network_params.max_transactions_per_block = int(data['max_transactions_per_block'])
-    
+    if 'mining_workers' in data:
+        blockchain.network_params.mining_workers = max(0, int(data['mining_workers']))
+    if 'mempool_max_bytes' in data:
+        blockchain.network_params.mempool_max_bytes = int(data['mempool_max_bytes'])
+    if 'mempool_max_transactions' in data:
+        blockchain.network_params.mempool_max_transactions = int(data['mempool_max_transactions'])
+    if 'mempool_expiry' in data:
+        blockchain.network_params.mempool_expiry = int(data['mempool_expiry'])
+    if 'decentralization_window' in data:
+        blockchain.network_params.decentralization_window = max(0, int(data['decentralization_window']))
+        blockchain.update_decentralization_metrics()
+    blockchain.params_changed()
+
+@app.route('/update_params', methods=['POST'])
+def update_network_params():
+    ledger.call(apply_network_params, request.get_json())
     return jsonify({"message": "Network parameters updated successfully"})
 
 @app.route('/api/send', methods=['POST'])
@@ -450,25 +503,80 @@ def api_send():
     data = request.get_json()
     if not all(k in data for k in ('sender', 'recipient', 'amount')):
         return jsonify({"error": "Missing fields"}), 400
+    if not isinstance(data['sender'], str) or not isinstance(data['recipient'], str):
+        return jsonify({"error": "Sender and recipient must be strings"}), 400
+    try:
+        amount = float(data['amount'])
+        fee = float(data.get('fee', network_params.transaction_fee))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Amount and fee must be numbers"}), 400
+    error = transfer_error(data['sender'], amount, fee)
+    if error is not None:
+        return jsonify({"error": error}), 400
     
-    fee = data.get('fee', network_params.transaction_fee)
-    success, message = blockchain.add_transaction(data['sender'], data['recipient'], data['amount'], fee)
+    success, message = ledger.add_transaction(data['sender'], data['recipient'], amount, fee,
+                                                  replaces=data.get('replaces'))
     
     if not success:
         return jsonify({"error": message}), 400
     return jsonify({"message": "Transaction added", "txid": message}), 201
 
+@app.route('/api/send_batch', methods=['POST'])
+def api_send_batch():
+    data = request.get_json()
+    batch = data.get('transactions') if isinstance(data, dict) else data
+    if not isinstance(batch, list):
+        return jsonify({"error": "Expected a list of transactions"}), 400
+    if len(batch) > app.config['MAX_SEND_BATCH']:
+        return jsonify({"error": f"At most {app.config['MAX_SEND_BATCH']} transactions per batch"}), 400
+    
+    results = [
+        {"ok": True, "txid": message} if success else {"ok": False, "error": message}
+        for success, message in ledger.add_transactions(batch)
+    ]
+    accepted = sum(1 for result in results if result["ok"])
+    return jsonify({"accepted": accepted, "rejected": len(results) - accepted, "results": results}), 200
+
 @app.route('/api/mine', methods=['POST'])
 def api_mine():
+    """Start a background mining job; with "wait": true, mine one block and return it"""
     data = request.get_json()
     if 'miner' not in data:
         return jsonify({"error": "Miner address required"}), 400
+    continuous = bool(data.get('continuous'))
+    if continuous and data.get('wait'):
+        return jsonify({"error": "A continuous job cannot be waited for"}), 400
     
-    block, message = blockchain.mine_block(data['miner'])
-    if not block:
-        return jsonify({"error": message}), 400
+    job = mining_jobs.start(data['miner'], continuous=continuous)
+    if job is None:
+        return jsonify({"error": f"At most {mining_jobs.max_running} mining jobs can run at once"}), 429
+    if not data.get('wait'):
+        response = jsonify(job.to_dict())
+        response.headers['Location'] = url_for('get_mining_job', job_id=job.id)
+        return response, 202
     
-    return jsonify(block.__dict__), 201
+    job.wait()
+    if job.last_block is None:
+        return jsonify({"error": job.message}), 400
+    return jsonify(job.last_block.to_dict()), 201
+
+@app.route('/api/mine')
+def list_mining_jobs():
+    return jsonify([job.to_dict() for job in list(mining_jobs.jobs.values())])
+
+@app.route('/api/mine/<job_id>')
+def get_mining_job(job_id):
+    job = mining_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Mining job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/mine/<job_id>', methods=['DELETE'])
+def cancel_mining_job(job_id):
+    job = mining_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Mining job not found"}), 404
+    return jsonify(job.to_dict())
 
 # ------------------------
 # Authentication Routes
@@ -529,12 +637,14 @@ def logout():
 @app.route('/profile')
 @login_required
 def profile():
-    user_transactions = UserTransaction.query.filter(
-        (UserTransaction.sender_id == current_user.id) | 
-        (UserTransaction.recipient_id == current_user.id)
-    ).order_by(UserTransaction.timestamp.desc()).limit(10).all()
+    # ?before=<id of the last transfer shown> pages back through the history
+    before = request.args.get('before', type=int)
+    limit = app.config['PROFILE_PAGE_SIZE']
+    user_transactions = transfer_page(current_user.id, limit + 1, before)
+    next_before = user_transactions[limit - 1].id if len(user_transactions) > limit else None
     
-    return render_template('profile.html', user=current_user, transactions=user_transactions)
+    return render_template('profile.html', user=current_user, transactions=user_transactions[:limit],
+                           before=before, next_before=next_before)
 
 # ------------------------
 # Database Initialization
@@ -542,6 +652,9 @@ def profile():
 def init_db():
     with app.app_context():
         db.create_all()
+        # create_all skips tables that exist, so add indexes introduced since
+        for index in UserTransaction.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
         
         # Create default users if they don't exist
         if not User.query.filter_by(username='alice').first():
@@ -0,0 +1,131 @@
+"""Page latencies of the SQL-backed routes on a large seeded user database.
+
+Seeds --users users and --transfers UserTransaction rows into a scratch
+SQLite database. One "hot" user takes part in --hot-share of the transfers;
+the rest are between random users. Then requests go through Flask's test
+client, logged in as random users: the dashboard, the first /profile page,
+deep /profile pages of the hot user (a random keyset cursor into their
+history) and /send. Reports p50 and p99 latency per page.
+
+An existing bench.db in --dir is reused instead of seeded again.
+--without-indexes drops the transfer indexes first, for comparison.
+
+    python benchmarks/bench_db.py --users 300000 --transfers 3000000 --dir /tmp/cryptosim-db
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['CRYPTOSIM_CHAIN_DIR'] = ''  # keep the chain in memory
+
+SEED_CHUNK = 50000
+HOT_USER = 1
+
+
+def seed(db, User, UserTransaction, users, transfers, hot_share, rng):
+    from sqlalchemy import insert
+    started = time.perf_counter()
+    for first in range(1, users + 1, SEED_CHUNK):
+        db.session.execute(insert(User.__table__), [
+            {'id': i, 'username': f"user{i}", 'email': f"user{i}@example.com", 'password_hash': '-',
+             'created_at': datetime(2024, 1, 1), 'balance': 1e6}
+            for i in range(first, min(first + SEED_CHUNK, users + 1))
+        ])
+    # One transfer a minute, ending now
+    start = datetime.utcnow() - timedelta(minutes=transfers)
+    for first in range(0, transfers, SEED_CHUNK):
+        rows = []
+        for i in range(first, min(first + SEED_CHUNK, transfers)):
+            sender, recipient = rng.randint(1, users), rng.randint(1, users)
+            if rng.random() < hot_share:
+                if rng.random() < 0.5:
+                    sender = HOT_USER
+                else:
+                    recipient = HOT_USER
+            rows.append({'sender_id': sender, 'recipient_id': recipient, 'amount': 1.0, 'fee': 0.001,
+                         'timestamp': start + timedelta(minutes=i), 'txid': f"{i:064x}", 'status': 'confirmed'})
+        db.session.execute(insert(UserTransaction.__table__), rows)
+        db.session.commit()
+        print(f"  seeded {first + len(rows):,} transfers ({time.perf_counter() - started:.0f}s)")
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def timed(client, user_id, method, path, data=None):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    started = time.perf_counter()
+    response = client.open(path, method=method, data=data)
+    elapsed = time.perf_counter() - started
+    if response.status_code not in (200, 302):
+        sys.exit(f"{method} {path} returned {response.status_code}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--transfers', type=int, default=2000000)
+    parser.add_argument('--hot-share', type=float, default=0.05, help='share of transfers involving the hot user')
+    parser.add_argument('--requests', type=int, default=500, help='requests timed per page')
+    parser.add_argument('--without-indexes', action='store_true', help='drop the transfer indexes before timing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dir', help='scratch directory (default: a temporary directory)')
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix='cryptosim-db-')
+    path = os.path.join(directory, 'bench.db')
+    seeded = os.path.exists(path)
+    os.environ['CRYPTOSIM_DATABASE_URI'] = f"sqlite:///{path}"
+    from sqlalchemy import func, select
+    from app import app, db, ledger, User, UserTransaction, init_db
+
+    rng = random.Random(args.seed)
+    try:
+        with app.app_context():
+            if not seeded:
+                db.create_all()
+                print(f"Seeding {args.users:,} users and {args.transfers:,} transfers into {path}")
+                seed(db, User, UserTransaction, args.users, args.transfers, args.hot_share, rng)
+        init_db()  # the demo accounts, and any indexes the seeded tables lack
+        with app.app_context():
+            if args.without_indexes:
+                for index in UserTransaction.__table__.indexes:
+                    index.drop(db.engine, checkfirst=True)
+            users = db.session.scalar(select(func.count(User.id).filter(User.username.like('user%'))))
+            hot_ids = db.session.scalars(select(UserTransaction.id).where(UserTransaction.sender_id == HOT_USER)
+                                         .order_by(UserTransaction.id).limit(100000)).all()
+
+        client = app.test_client()
+        pages = {
+            'dashboard': lambda: timed(client, rng.randint(1, users), 'GET', '/'),
+            'profile': lambda: timed(client, rng.randint(1, users), 'GET', '/profile'),
+            'profile (hot, deep)': lambda: timed(client, HOT_USER, 'GET',
+                                                 f"/profile?before={rng.choice(hot_ids)}" if hot_ids else '/profile'),
+            'send': lambda: timed(client, rng.randint(1, users), 'POST', '/send',
+                                  {'recipient': f"user{rng.randint(1, users)}", 'amount': '1', 'fee': '0.001'}),
+        }
+        print(f"{args.requests} requests per page{' without transfer indexes' if args.without_indexes else ''}:")
+        for name, request in pages.items():
+            request()  # warm up
+            samples = [request() for _ in range(args.requests)]
+            print(f"  {name:<20} p50 {percentile(samples, 0.5) * 1000:7.2f} ms   "
+                  f"p99 {percentile(samples, 0.99) * 1000:7.2f} ms")
+    finally:
+        ledger.close()
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
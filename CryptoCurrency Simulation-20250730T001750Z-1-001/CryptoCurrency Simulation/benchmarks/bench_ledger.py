@@ -0,0 +1,262 @@
+"""Microbenchmarks of the Blockchain hot paths, saved as JSON for regression checks.
+
+Cases, each at every --mempool-sizes pool size where a pool is involved:
+
+    add_transaction          transactions admitted per second into a pool of N
+    ledger_add_transaction   the same through Ledger, one call at a time: each
+                             call is a writer batch that publishes a snapshot
+    select_transactions      milliseconds per block template from a pool of N
+    proof_of_work            hashes per second at --pow-difficulty
+    mine_block               milliseconds per block of --block-txs transactions
+                             (template, trivial search, commit) on a chain of
+                             --chain-blocks blocks
+    get_transaction_history  records per second over that chain
+
+Each case runs --repeat times and keeps the best run. --output writes the
+results with the machine they ran on, and --compare reads an earlier file
+and flags every case that got worse by more than --tolerance. It exits with
+status 1 if any did, so the check can gate a change.
+
+    python benchmarks/bench_ledger.py --output before.json
+    python benchmarks/bench_ledger.py --compare before.json
+    python benchmarks/bench_ledger.py --mempool-sizes 10000 --chain-blocks 10000   # quick run
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from blockchain import Blockchain, NetworkParameters  # noqa: E402
+from ledger import Ledger  # noqa: E402
+from mining import difficulty_to_target  # noqa: E402
+
+ACCOUNTS = 1000
+FILL_BATCH = 10000
+
+
+def network_params(pool_size=0):
+    params = NetworkParameters()
+    params.mining_difficulty = 0
+    params.retarget_window = 0
+    params.mining_workers = 1
+    params.mempool_expiry = 0
+    params.mempool_max_transactions = max(params.mempool_max_transactions, 2 * pool_size)
+    params.mempool_max_bytes = max(params.mempool_max_bytes, 200 * 2 * pool_size)
+    return params
+
+
+class Transfers:
+    """Random transfers between funded accounts; random fees give the pool a realistic fee-rate spread"""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.accounts = [f"user{i}" for i in range(ACCOUNTS)]
+
+    def fund(self, blockchain):
+        blockchain.open_accounts({account: 1e12 for account in self.accounts})
+
+    def batch(self, count):
+        rng, accounts = self.rng, self.accounts
+        return [{'sender': rng.choice(accounts), 'recipient': rng.choice(accounts),
+                 'amount': round(rng.uniform(0.01, 100.0), 6), 'fee': round(rng.uniform(0.0001, 0.01), 6)}
+                for _ in range(count)]
+
+
+def filled_blockchain(pool_size, transfers):
+    blockchain = Blockchain(network_params(pool_size))
+    transfers.fund(blockchain)
+    for first in range(0, pool_size, FILL_BATCH):
+        blockchain.add_transactions(transfers.batch(min(FILL_BATCH, pool_size - first)))
+    return blockchain
+
+
+def best(repeat, run):
+    return min(run() for _ in range(repeat))
+
+
+def bench_add_transaction(pool_size, ops, repeat, transfers):
+    def run():
+        blockchain = filled_blockchain(pool_size, transfers)
+        batch = transfers.batch(ops)
+        started = time.perf_counter()
+        for item in batch:
+            blockchain.add_transaction(item['sender'], item['recipient'], item['amount'], item['fee'])
+        return time.perf_counter() - started
+    return ops / best(repeat, run)
+
+
+def bench_ledger_add_transaction(pool_size, ops, repeat, transfers):
+    def run():
+        ledger = Ledger(filled_blockchain(pool_size, transfers))
+        batch = transfers.batch(ops)
+        started = time.perf_counter()
+        for item in batch:
+            ledger.add_transaction(item['sender'], item['recipient'], item['amount'], item['fee'])
+        elapsed = time.perf_counter() - started
+        ledger.close()
+        return elapsed
+    return ops / best(repeat, run)
+
+
+def bench_select(pool_size, templates, transfers):
+    blockchain = filled_blockchain(pool_size, transfers)
+    timings = []
+    for item in transfers.batch(templates):
+        # The pool changes between templates, as it does on a live node
+        blockchain.add_transaction(item['sender'], item['recipient'], item['amount'], item['fee'])
+        started = time.perf_counter()
+        blockchain.select_transactions_for_block()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1000
+
+
+def bench_proof_of_work(difficulty, blocks, transfers):
+    blockchain = filled_blockchain(1000, transfers)
+    blockchain.network_params.mining_target = difficulty_to_target(difficulty)
+    block, _ = blockchain.prepare_block("miner")
+    hashes = elapsed = 0
+    for attempt in range(blocks):
+        block.timestamp = time.time() + attempt  # a fresh header for each search
+        started = time.perf_counter()
+        blockchain.proof_of_work(block)
+        elapsed += time.perf_counter() - started
+        hashes += block.nonce + 1
+    return hashes / elapsed
+
+
+def build_chain(blocks, transfers):
+    """A chain of `blocks` blocks with one transfer and the reward each"""
+    blockchain = Blockchain(network_params())
+    transfers.fund(blockchain)
+    started = time.perf_counter()
+    for height in range(1, blocks + 1):
+        item = transfers.batch(1)[0]
+        blockchain.add_transaction(item['sender'], item['recipient'], item['amount'], item['fee'])
+        blockchain.mine_block(f"miner{height % 10}")
+        if height % 20000 == 0:
+            print(f"  built {height:,} blocks ({time.perf_counter() - started:.0f}s)", file=sys.stderr)
+    return blockchain
+
+
+def bench_mine_block(blockchain, block_txs, blocks, transfers):
+    timings = []
+    for height in range(blocks):
+        blockchain.add_transactions(transfers.batch(block_txs))
+        started = time.perf_counter()
+        blockchain.mine_block(f"miner{height % 10}")
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1000
+
+
+def bench_history(blockchain, repeat):
+    records = sum(len(block.transactions) for block in blockchain.chain)
+
+    def run():
+        started = time.perf_counter()
+        blockchain.get_transaction_history()
+        return time.perf_counter() - started
+    return records / best(repeat, run)
+
+
+def run_cases(args):
+    """{case name: {'value', 'unit', 'higher_is_better'}}"""
+    transfers = Transfers(args.seed)
+    results = {}
+
+    def record(name, value, unit, higher_is_better):
+        results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+        print(f"  {name:<42} {value:>14,.2f} {unit}", file=sys.stderr)
+
+    for size in args.mempool_sizes:
+        record(f"add_transaction[mempool={size}]",
+               bench_add_transaction(size, args.ops, args.repeat, transfers), 'tx/s', True)
+        record(f"ledger_add_transaction[mempool={size}]",
+               bench_ledger_add_transaction(size, args.ledger_ops, args.repeat, transfers), 'tx/s', True)
+        record(f"select_transactions[mempool={size}]", bench_select(size, args.templates, transfers), 'ms', False)
+    record(f"proof_of_work[difficulty={args.pow_difficulty:g}]",
+           bench_proof_of_work(args.pow_difficulty, args.pow_blocks, transfers), 'hashes/s', True)
+
+    print(f"  building a {args.chain_blocks:,}-block chain", file=sys.stderr)
+    blockchain = build_chain(args.chain_blocks, transfers)
+    record(f"mine_block[chain={args.chain_blocks},txs={args.block_txs}]",
+           bench_mine_block(blockchain, args.block_txs, args.mine_blocks, transfers), 'ms', False)
+    record(f"get_transaction_history[chain={args.chain_blocks}]",
+           bench_history(blockchain, args.repeat), 'records/s', True)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each case against the baseline; returns the names that regressed"""
+    regressions = []
+    print(f"{'case':<44} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<44} {'-':>14} {result['value']:>14,.2f}      new")
+            continue
+        change = result['value'] / before['value'] - 1 if before['value'] else 0.0
+        worse = -change if result['higher_is_better'] else change
+        flag = '  REGRESSION' if worse > tolerance else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<44} {before['value']:>14,.2f} {result['value']:>14,.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mempool-sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--ops', type=int, default=10000, help='add_transaction calls timed per run')
+    parser.add_argument('--ledger-ops', type=int, default=5000, help='Ledger.add_transaction calls timed per run')
+    parser.add_argument('--templates', type=int, default=50, help='block templates timed per pool size')
+    parser.add_argument('--pow-difficulty', type=float, default=4)
+    parser.add_argument('--pow-blocks', type=int, default=5, help='nonce searches timed')
+    parser.add_argument('--chain-blocks', type=int, default=100000)
+    parser.add_argument('--block-txs', type=int, default=1000, help='transactions per timed mine_block')
+    parser.add_argument('--mine-blocks', type=int, default=20, help='mine_block calls timed')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per throughput case; the best is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to check against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='slowdown allowed before a case is flagged')
+    args = parser.parse_args()
+
+    results = run_cases(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'environment': environment(), 'arguments': vars(args), 'results': results}, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than {args.compare} by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
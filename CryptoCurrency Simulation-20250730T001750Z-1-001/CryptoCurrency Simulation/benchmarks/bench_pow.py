@@ -0,0 +1,66 @@
+"""Proof-of-work hash rate: legacy JSON hashing vs. the fixed binary header.
+
+The legacy scheme re-serialized the whole block (every transaction included)
+for each nonce; the header engine hashes a constant prefix once and copies the
+SHA-256 midstate per nonce.
+
+    python benchmarks/bench_pow.py [--attempts 20000] [--txs 1 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from hashlib import sha256
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import Block, Transaction  # noqa: E402
+from mining import search_nonce  # noqa: E402
+
+# A digest is never <= 0 in practice, so searches run the full range.
+UNREACHABLE_TARGET = 0
+
+
+def build_block(tx_count):
+    transactions = [Transaction(f"user{i}", f"user{i + 1}", 1.0, 0.001) for i in range(tx_count)]
+    return Block(1, time.time(), transactions, "0" * 64, block_size=sum(tx.size for tx in transactions))
+
+
+def legacy_hash_rate(block, attempts):
+    """Hashes/sec of the old `json.dumps(self.__dict__)` per-nonce scheme."""
+    fields = block.to_dict()
+    del fields['hash']
+    start = time.perf_counter()
+    for nonce in range(attempts):
+        fields['nonce'] = nonce
+        sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+    return attempts / (time.perf_counter() - start)
+
+
+def header_hash_rate(block, attempts):
+    """Hashes/sec of the midstate search over the packed header."""
+    prefix = block.header_prefix()
+    start = time.perf_counter()
+    search_nonce(prefix, UNREACHABLE_TARGET, 0, attempts)
+    return attempts / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=20000, help='nonces hashed per measurement')
+    parser.add_argument('--txs', type=int, nargs='+', default=[1, 1000], help='block sizes in transactions')
+    args = parser.parse_args()
+
+    print(f"{'txs':>6} {'legacy H/s':>14} {'header H/s':>14} {'speedup':>9}")
+    for tx_count in args.txs:
+        block = build_block(tx_count)
+        # The legacy path is slow on big blocks; scale its sample down to keep runs short.
+        legacy_attempts = max(50, args.attempts // max(1, tx_count // 10))
+        before = legacy_hash_rate(block, legacy_attempts)
+        after = header_hash_rate(block, args.attempts)
+        print(f"{tx_count:>6} {before:>14,.0f} {after:>14,.0f} {after / before:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
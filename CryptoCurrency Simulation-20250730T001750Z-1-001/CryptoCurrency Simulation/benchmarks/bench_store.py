@@ -0,0 +1,97 @@
+"""Cold-start time of a Blockchain backed by the on-disk block store.
+
+Builds a chain of --blocks blocks (one transfer plus the reward each) in a
+scratch directory, then times startup three ways: from a checkpoint at the
+tip, from a checkpoint --lag blocks behind the tip, and from no checkpoint at
+all (full replay). Also times random explorer reads through the memory map.
+
+    python benchmarks/bench_store.py --blocks 1000000 [--dir /tmp/cryptosim-bench]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import Blockchain, NetworkParameters  # noqa: E402
+from block_store import BlockStore  # noqa: E402
+
+
+def network_params():
+    params = NetworkParameters()
+    params.mining_difficulty = 0
+    params.retarget_window = 0
+    return params
+
+
+def build_chain(directory, blocks, lag):
+    """Mine `blocks` blocks; the last checkpoint is left `lag` blocks behind the tip"""
+    store = BlockStore(directory, checkpoint_interval=blocks + 1)
+    blockchain = Blockchain(network_params(), store=store)
+    accounts = [f"user{i}" for i in range(100)]
+    for account in accounts:
+        blockchain.balances[account] = 1e9
+    started = time.perf_counter()
+    for height in range(1, blocks + 1):
+        blockchain.add_transaction(accounts[height % 100], accounts[(height + 1) % 100], 1.0)
+        blockchain.mine_block(f"miner{height % 10}")
+        if height == blocks - lag:
+            blockchain.save_checkpoint()
+        if height % 100000 == 0:
+            print(f"  built {height:,} blocks ({time.perf_counter() - started:.0f}s)")
+    store.close()
+
+
+def time_startup(directory):
+    started = time.perf_counter()
+    store = BlockStore(directory)
+    blockchain = Blockchain(network_params(), store=store)
+    elapsed = time.perf_counter() - started
+    return elapsed, blockchain, store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=1000000)
+    parser.add_argument('--lag', type=int, default=1000, help='blocks between the checkpoint and the tip')
+    parser.add_argument('--reads', type=int, default=10000, help='random block reads to time')
+    parser.add_argument('--dir', help='scratch directory (default: a temporary directory)')
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix='cryptosim-store-')
+    try:
+        print(f"Building {args.blocks:,} blocks in {directory}")
+        build_chain(directory, args.blocks, min(args.lag, args.blocks - 1))
+
+        elapsed, blockchain, store = time_startup(directory)
+        print(f"Cold start, checkpoint {args.lag:,} blocks behind tip: {elapsed:.3f}s "
+              f"(height {blockchain.get_last_block().index:,})")
+
+        blockchain.save_checkpoint()
+        store.close()
+        elapsed, blockchain, store = time_startup(directory)
+        print(f"Cold start, checkpoint at tip:                 {elapsed:.3f}s")
+
+        heights = [random.randrange(len(store)) for _ in range(args.reads)]
+        started = time.perf_counter()
+        for height in heights:
+            store[height]
+        elapsed = time.perf_counter() - started
+        print(f"Random block reads: {args.reads / elapsed:,.0f} blocks/s ({elapsed / args.reads * 1e6:.1f} us each)")
+        store.close()
+
+        os.remove(os.path.join(directory, 'checkpoint.pickle'))
+        elapsed, blockchain, store = time_startup(directory)
+        print(f"Cold start, full replay (no checkpoint):       {elapsed:.3f}s")
+        store.close()
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Memory per transaction and construction, mempool and block-selection throughput.
+
+Builds --count transactions between --addresses accounts and reports the
+bytes each one holds (the object, its fields and its id, measured with
+tracemalloc), how many are constructed per second, how fast they enter a
+Mempool, the memory the pool adds on top of the transactions, and how long
+one block template selection takes from the full pool.
+
+    python benchmarks/bench_tx.py --count 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import NetworkParameters, Transaction  # noqa: E402
+from mempool import Mempool  # noqa: E402
+
+
+def build(count, addresses, seed):
+    rng = random.Random(seed)
+    names = [f"user{i}" for i in range(addresses)]
+    # Addresses arrive as fresh strings, as they would from parsed requests
+    pairs = [(''.join(rng.choice(names)), ''.join(rng.choice(names))) for _ in range(count)]
+    fees = [rng.uniform(0.0001, 0.01) for _ in range(count)]
+    return pairs, fees
+
+
+def filled(transactions):
+    pool = Mempool()
+    for tx in transactions:
+        pool.add(tx)
+    return pool
+
+
+def measure(function):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--addresses', type=int, default=1000)
+    parser.add_argument('--selections', type=int, default=20, help='block templates timed from the full pool')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pairs, fees = build(args.count, args.addresses, args.seed)
+
+    # Untraced timing first: tracemalloc slows allocation-heavy code down
+    started = time.perf_counter()
+    [Transaction(sender, recipient, 1.0, fee) for (sender, recipient), fee in zip(pairs, fees)]
+    construct_rate = args.count / (time.perf_counter() - started)
+    transactions, _, tx_bytes = measure(
+        lambda: [Transaction(sender, recipient, 1.0, fee) for (sender, recipient), fee in zip(pairs, fees)]
+    )
+
+    started = time.perf_counter()
+    pool = filled(transactions)
+    add_rate = args.count / (time.perf_counter() - started)
+    del pool
+    pool, _, pool_bytes = measure(lambda: filled(transactions))
+
+    params = NetworkParameters()
+    started = time.perf_counter()
+    for _ in range(args.selections):
+        selected, size = pool.select(params.block_size_limit, params.max_transactions_per_block)
+    select_ms = (time.perf_counter() - started) / args.selections * 1000
+
+    print(f"transactions:      {args.count:,} between {args.addresses:,} addresses")
+    print(f"memory per tx:     {tx_bytes / args.count:,.0f} bytes (mempool adds {pool_bytes / args.count:,.0f})")
+    print(f"construction:      {construct_rate:,.0f} tx/s")
+    print(f"mempool add:       {add_rate:,.0f} tx/s")
+    print(f"block selection:   {select_ms:.2f} ms for {len(selected)} txs ({size:,} bytes) from a full pool")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Open-loop HTTP load against /api/send, /api/mine, /chain and /analytics.
+
+Each endpoint gets its own request rate (per second; 0 leaves it out).
+Requests are scheduled on a fixed timetable (or with Poisson arrivals) and
+handed to a pool of --concurrency client threads. Latency is measured from
+the moment a request was due, not from when a thread became free. A server
+that falls behind therefore shows up as latency, not as a lower offered
+rate ("coordinated omission").
+
+Without --url the app is started in-process on a threaded server with the
+chain in memory, and 100 funded accounts send to each other. Against a
+running server, --senders names accounts that already hold funds; sends
+they cannot afford count as rejected, not failed.
+
+    python benchmarks/loadgen.py --duration 30 --send-rate 200 --mine-rate 1 --chain-rate 20 --analytics-rate 20
+    python benchmarks/loadgen.py --url http://127.0.0.1:5000 --senders alice bob carol --send-rate 50
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CRYPTOSIM_CHAIN_DIR', '')  # an in-process server keeps its chain in memory
+
+FUNDED_ACCOUNTS = 100
+MINERS = ['miner1', 'miner2', 'miner3']
+
+
+def call(base, method, path, payload=None, timeout=60):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        error.read()
+        return error.code
+
+
+def start_server(difficulty):
+    from werkzeug.serving import make_server
+    from app import app, ledger
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    senders = [f"load{i}" for i in range(FUNDED_ACCOUNTS)]
+    ledger.open_accounts({sender: 1e12 for sender in senders})
+    base = f'http://127.0.0.1:{server.server_port}'
+    call(base, 'POST', '/update_params', {'mining_difficulty': difficulty, 'mining_workers': 1, 'retarget_window': 0})
+
+    def stop():
+        server.shutdown()
+        ledger.close()
+    return base, senders, stop
+
+
+class Endpoint:
+    def __init__(self, name, rate, make_request):
+        self.name = name
+        self.rate = rate
+        self.make_request = make_request  # rng -> (method, path, payload)
+        self.latencies = []
+        self.statuses = {}
+        self.lock = threading.Lock()
+
+    def record(self, latency, status):
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+def endpoints(args, senders):
+    def send(rng):
+        sender, recipient = rng.sample(senders, 2) if len(senders) > 1 else (senders[0], rng.choice(MINERS))
+        return 'POST', '/api/send', {'sender': sender, 'recipient': recipient,
+                                     'amount': round(rng.uniform(0.01, 1.0), 4),
+                                     'fee': round(rng.uniform(0.0001, 0.01), 6)}
+
+    return [endpoint for endpoint in (
+        Endpoint('send', args.send_rate, send),
+        Endpoint('mine', args.mine_rate, lambda rng: ('POST', '/api/mine', {'miner': rng.choice(MINERS), 'wait': True})),
+        Endpoint('chain', args.chain_rate, lambda rng: ('GET', args.chain_path, None)),
+        Endpoint('analytics', args.analytics_rate, lambda rng: ('GET', '/analytics', None)),
+    ) if endpoint.rate > 0]
+
+
+def schedule(endpoint, base, pool, started, duration, poisson, seed):
+    """Submit `endpoint`'s requests on their timetable until `duration` seconds have passed"""
+    rng = random.Random(seed)
+    due = 0.0
+    while True:
+        due += rng.expovariate(endpoint.rate) if poisson else 1 / endpoint.rate
+        if due >= duration:
+            return
+        delay = started + due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        method, path, payload = endpoint.make_request(rng)
+        pool.submit(issue, endpoint, base, method, path, payload, started + due)
+
+
+def issue(endpoint, base, method, path, payload, due):
+    try:
+        status = call(base, method, path, payload)
+    except OSError:
+        status = 'error'
+    endpoint.record(time.perf_counter() - due, status)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def report(endpoints, elapsed):
+    """Per-endpoint throughput and latency; 4xx on /api/send and /api/mine are refusals, not failures"""
+    rows = {}
+    for endpoint in endpoints:
+        ordered = sorted(endpoint.latencies)
+        ok = sum(count for status, count in endpoint.statuses.items() if status in (200, 201, 202, 304))
+        rejected = sum(count for status, count in endpoint.statuses.items()
+                       if isinstance(status, int) and 400 <= status < 500)
+        rows[endpoint.name] = {
+            'offered_rps': endpoint.rate,
+            'completed': len(ordered),
+            'throughput_rps': len(ordered) / elapsed,
+            'ok': ok,
+            'rejected': rejected,
+            'failed': len(ordered) - ok - rejected,
+            'p50_ms': percentile(ordered, 0.5) * 1000,
+            'p90_ms': percentile(ordered, 0.9) * 1000,
+            'p99_ms': percentile(ordered, 0.99) * 1000,
+            'max_ms': (ordered[-1] if ordered else 0.0) * 1000
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='server to load (default: start the app in-process)')
+    parser.add_argument('--senders', nargs='+', help='funded accounts to send from (with --url)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--send-rate', type=float, default=100.0)
+    parser.add_argument('--mine-rate', type=float, default=0.5)
+    parser.add_argument('--chain-rate', type=float, default=10.0)
+    parser.add_argument('--analytics-rate', type=float, default=10.0)
+    parser.add_argument('--chain-path', default='/chain?limit=100&order=desc', help='what a /chain request fetches')
+    parser.add_argument('--concurrency', type=int, default=64, help='client threads')
+    parser.add_argument('--poisson', action='store_true', help='exponential gaps instead of a fixed timetable')
+    parser.add_argument('--difficulty', type=float, default=2, help='mining difficulty of the in-process server')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the report to this JSON file')
+    args = parser.parse_args()
+
+    if args.url:
+        base, senders, stop = args.url.rstrip('/'), args.senders or ['alice', 'bob', 'carol'], None
+    else:
+        base, senders, stop = start_server(args.difficulty)
+    loads = endpoints(args, senders)
+    print(f"Loading {base} for {args.duration:g}s: " +
+          ', '.join(f"{endpoint.name} {endpoint.rate:g}/s" for endpoint in loads), file=sys.stderr)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        schedulers = [threading.Thread(target=schedule, args=(endpoint, base, pool, started, args.duration,
+                                                              args.poisson, args.seed + number))
+                      for number, endpoint in enumerate(loads)]
+        for scheduler in schedulers:
+            scheduler.start()
+        for scheduler in schedulers:
+            scheduler.join()
+    elapsed = time.perf_counter() - started  # includes draining the requests still in flight
+    if stop is not None:
+        stop()
+
+    rows = report(loads, elapsed)
+    print(f"{'endpoint':<10} {'offered/s':>9} {'done/s':>8} {'ok':>7} {'rejected':>8} {'failed':>6} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, row in rows.items():
+        print(f"{name:<10} {row['offered_rps']:>9g} {row['throughput_rps']:>8.1f} {row['ok']:>7} {row['rejected']:>8} "
+              f"{row['failed']:>6} {row['p50_ms']:>8.1f} {row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'arguments': vars(args), 'seconds': elapsed, 'endpoints': rows}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
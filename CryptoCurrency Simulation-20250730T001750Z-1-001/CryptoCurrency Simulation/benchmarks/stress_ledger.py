@@ -0,0 +1,120 @@
+"""Concurrent /api/send and /api/mine calls against a threaded server.
+
+Starts the app in-process on a threaded WSGI server (chain kept in memory),
+then lets --clients threads fire random transfers and mining requests at it.
+Afterwards checks that no coins were created or lost: the balances plus the
+fees still waiting in the mempool must equal the starting supply plus the
+block reward of every block mined during the run.
+
+    python benchmarks/stress_ledger.py --clients 32 --requests 200
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['CRYPTOSIM_CHAIN_DIR'] = ''  # keep the chain in memory
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import app, ledger  # noqa: E402
+from blockchain import BLOCK_REWARD  # noqa: E402
+
+ACCOUNTS = ['alice', 'bob', 'carol']
+MINERS = ['miner1', 'miner2', 'miner3']
+
+
+def request(base, method, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def supply(base):
+    """Balances plus the fees pending transactions have paid but no miner has collected"""
+    _, balances = request(base, 'GET', '/balances')
+    pending_fees = 0.0
+    offset = 0
+    while True:
+        _, page = request(base, 'GET', f'/mempool?offset={offset}&limit=1000')
+        pending_fees += sum(tx['fee'] for tx in page)
+        if len(page) < 1000:
+            break
+        offset += len(page)
+    _, analytics = request(base, 'GET', '/analytics')
+    return sum(balances.values()) + pending_fees, analytics['mining_stats']['total_blocks_mined'], balances
+
+
+def client(base, seed, requests, mine_ratio):
+    rng = random.Random(seed)
+    counts = {'sent': 0, 'rejected': 0, 'mined': 0, 'not_mined': 0}
+    for _ in range(requests):
+        if rng.random() < mine_ratio:
+            status, _ = request(base, 'POST', '/api/mine', {'miner': rng.choice(MINERS), 'wait': True})
+            counts['mined' if status == 201 else 'not_mined'] += 1
+        else:
+            sender, recipient = rng.sample(ACCOUNTS + MINERS, 2)
+            status, _ = request(base, 'POST', '/api/send', {
+                'sender': sender, 'recipient': recipient,
+                'amount': round(rng.uniform(0.01, 2.0), 2), 'fee': round(rng.uniform(0.0001, 0.01), 4)
+            })
+            counts['sent' if status == 201 else 'rejected'] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200, help='requests per client')
+    parser.add_argument('--mine-ratio', type=float, default=0.1, help='share of requests that mine')
+    parser.add_argument('--difficulty', type=int, default=2)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    request(base, 'POST', '/update_params', {'mining_difficulty': args.difficulty, 'mining_workers': 1,
+                                          'retarget_window': 0})
+
+    start_supply, start_blocks, _ = supply(base)
+    print(f"Starting supply {start_supply:.6f} after {start_blocks} blocks; "
+          f"{args.clients} clients x {args.requests} requests")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as pool:
+        results = list(pool.map(lambda seed: client(base, seed, args.requests, args.mine_ratio),
+                                range(args.clients)))
+    elapsed = time.perf_counter() - started
+    totals = {key: sum(result[key] for result in results) for key in results[0]}
+    print(f"{args.clients * args.requests / elapsed:,.0f} requests/s over {elapsed:.2f}s: {totals}")
+
+    end_supply, end_blocks, balances = supply(base)
+    expected = start_supply + BLOCK_REWARD * (end_blocks - start_blocks)
+    print(f"Supply {end_supply:.6f}, expected {expected:.6f} ({end_blocks - start_blocks} blocks mined)")
+    negative = {address: balance for address, balance in balances.items() if balance < -1e-9}
+    server.shutdown()
+    ledger.close()
+
+    ok = abs(end_supply - expected) <= 1e-6 * max(1.0, expected) and not negative
+    if negative:
+        print(f"Negative balances: {negative}")
+    print("PASS: supply conserved" if ok else "FAIL: supply not conserved")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
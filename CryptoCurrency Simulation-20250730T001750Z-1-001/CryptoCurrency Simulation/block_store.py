@@ -0,0 +1,229 @@
+"""Append-only on-disk block log.
+
+Blocks are appended as JSON lines to segment files (blocks-00000.dat,
+blocks-00001.dat, ...). A fixed-width index file maps every height to its
+(segment, offset, length), so any block is one memory-mapped slice away and
+the chain never has to be loaded into memory. Derived state (balances, miner
+statistics, indexes, mempool) is periodically written to a checkpoint so that
+startup only replays the blocks appended after it.
+
+Starting balances of opened accounts are in no block, so each opening is
+appended to accounts.jsonl and synced before it takes effect. A replay
+applies the openings its checkpoint does not cover before the blocks.
+
+The store behaves like the list `Blockchain.chain` used to be: it supports
+len(), indexing (including negative indexes and slices), iteration and append.
+"""
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+
+from blockchain import Block
+
+INDEX_RECORD = struct.Struct('<IQI')  # segment, offset, length
+SEGMENT_SIZE = 64 * 1024 * 1024
+CHECKPOINT_INTERVAL = 1000
+
+
+class BlockStore:
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, checkpoint_interval=CHECKPOINT_INTERVAL,
+                 readonly=False):
+        """Open (or create) the log in `directory`.
+
+        A `readonly` store never writes: a tool can read a log that a running
+        node is appending to. Any half-written record at the end is left out.
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.checkpoint_interval = checkpoint_interval
+        self.readonly = readonly
+
+        self._lock = threading.Lock()
+        self._maps = {}  # segment number -> mmap
+        self._tip = None
+
+        index_path = os.path.join(directory, 'index.dat')
+        self._accounts_path = os.path.join(directory, 'accounts.jsonl')
+        if readonly:
+            with open(index_path, 'rb') as index_file:
+                self._index = bytearray(index_file.read())
+            del self._index[self._complete_records() * INDEX_RECORD.size:]
+            self.accounts_recorded = len(self._account_lines())
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(index_path, 'ab+') as index_file:
+            index_file.seek(0)
+            self._index = bytearray(index_file.read())
+        self._recover()
+        self._index_file = open(index_path, 'ab')
+        self._open_segment(self._last_segment())
+        lines = self._account_lines()
+        self.accounts_recorded = len(lines)  # openings on disk
+        self._accounts_file = open(self._accounts_path, 'ab')
+        self._accounts_file.truncate(sum(map(len, lines)))  # an interrupted append
+
+    # ------------------------
+    # Files
+    # ------------------------
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'blocks-{segment:05d}.dat')
+
+    def _last_segment(self):
+        if not self._index:
+            return 0
+        return INDEX_RECORD.unpack_from(self._index, len(self._index) - INDEX_RECORD.size)[0]
+
+    def _complete_records(self):
+        """Number of leading index records whose block bytes are all on disk"""
+        count = len(self._index) // INDEX_RECORD.size
+        while count:
+            segment, offset, length = INDEX_RECORD.unpack_from(self._index, (count - 1) * INDEX_RECORD.size)
+            path = self._segment_path(segment)
+            if os.path.exists(path) and os.path.getsize(path) >= offset + length:
+                break
+            count -= 1
+        return count
+
+    def _recover(self):
+        """Drop index records and segment bytes left behind by an interrupted append"""
+        count = self._complete_records()
+        if len(self._index) != count * INDEX_RECORD.size:
+            del self._index[count * INDEX_RECORD.size:]
+            with open(os.path.join(self.directory, 'index.dat'), 'r+b') as index_file:
+                index_file.truncate(len(self._index))
+
+        if count:
+            segment, offset, length = INDEX_RECORD.unpack_from(self._index, (count - 1) * INDEX_RECORD.size)
+            path = self._segment_path(segment)
+            if os.path.getsize(path) > offset + length:
+                with open(path, 'r+b') as segment_file:
+                    segment_file.truncate(offset + length)
+
+    def _open_segment(self, segment):
+        self._segment = segment
+        self._segment_file = open(self._segment_path(segment), 'ab')
+        self._segment_offset = self._segment_file.tell()
+
+    def _map(self, segment, end):
+        """mmap of a segment covering at least `end` bytes (the active segment grows)"""
+        mapped = self._maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), 'rb') as segment_file:
+                mapped = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    # ------------------------
+    # Sequence interface
+    # ------------------------
+    def __len__(self):
+        return len(self._index) // INDEX_RECORD.size
+
+    def __iter__(self):
+        for height in range(len(self)):
+            yield self[height]
+
+    def __getitem__(self, height):
+        if isinstance(height, slice):
+            return [self[h] for h in range(*height.indices(len(self)))]
+        count = len(self)
+        if height < 0:
+            height += count
+        if not 0 <= height < count:
+            raise IndexError('block height out of range')
+        # Readers race the writer's appends, so the cached tip is matched by height
+        tip = self._tip
+        if tip is not None and tip.index == height:
+            return tip
+        block = Block.from_dict(json.loads(self.read_raw(height)))
+        if height == count - 1 and (tip is None or tip.index < height):
+            self._tip = block
+        return block
+
+    def read_raw(self, height):
+        """Stored JSON bytes of one block, read straight from the memory map"""
+        segment, offset, length = INDEX_RECORD.unpack_from(self._index, height * INDEX_RECORD.size)
+        with self._lock:
+            mapped = self._map(segment, offset + length)
+            return mapped[offset:offset + length]
+
+    def append(self, block):
+        record = json.dumps(block.to_dict()).encode() + b'\n'
+        with self._lock:
+            if self._segment_offset and self._segment_offset + len(record) > self.segment_size:
+                self._segment_file.close()
+                self._open_segment(self._segment + 1)
+            self._segment_file.write(record)
+            self._segment_file.flush()
+            entry = INDEX_RECORD.pack(self._segment, self._segment_offset, len(record))
+            self._index_file.write(entry)
+            self._index_file.flush()
+            self._index += entry
+            self._segment_offset += len(record)
+            self._tip = block
+
+    # ------------------------
+    # Account openings
+    # ------------------------
+    def _account_lines(self):
+        """Complete lines of the openings journal"""
+        if not os.path.exists(self._accounts_path):
+            return []
+        with open(self._accounts_path, 'rb') as accounts_file:
+            lines = accounts_file.read().splitlines(keepends=True)
+        if lines and not lines[-1].endswith(b'\n'):
+            lines.pop()
+        return lines
+
+    def record_accounts(self, balances):
+        """Durably append one opening of {address: starting balance}"""
+        record = json.dumps(balances).encode() + b'\n'
+        with self._lock:
+            self._accounts_file.write(record)
+            self._accounts_file.flush()
+            os.fsync(self._accounts_file.fileno())
+            self.accounts_recorded += 1
+
+    def load_accounts(self, start=0):
+        """Starting balances from the openings after the first `start`, merged"""
+        balances = {}
+        for line in self._account_lines()[start:self.accounts_recorded]:
+            balances.update(json.loads(line))
+        return balances
+
+    # ------------------------
+    # Checkpoints
+    # ------------------------
+    def save_checkpoint(self, state, name='checkpoint'):
+        """Atomically replace a derived-state checkpoint; `name` keeps independent ones apart"""
+        path = os.path.join(self.directory, f'{name}.pickle')
+        with open(path + '.tmp', 'wb') as checkpoint_file:
+            pickle.dump(state, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(path + '.tmp', path)
+
+    def load_checkpoint(self, name='checkpoint'):
+        path = os.path.join(self.directory, f'{name}.pickle')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as checkpoint_file:
+            try:
+                return pickle.load(checkpoint_file)
+            except (pickle.UnpicklingError, AttributeError, EOFError):
+                return None  # written by an incompatible version; the caller replays instead
+
+    def close(self):
+        with self._lock:
+            if not self.readonly:
+                self._segment_file.close()
+                self._index_file.close()
+                self._accounts_file.close()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
@@ -0,0 +1,1162 @@
+import json
+import struct
+import time
+from bisect import bisect_right
+from hashlib import sha256
+from sys import intern
+from collections import defaultdict, deque
+from uuid import uuid4
+
+from decentralization import RewardDistribution
+from mempool import Mempool
+from merkle import MerkleCache, build_levels, merkle_root, proof_path
+from metrics import BLOCK_INTERVAL_BUCKETS, REGISTRY, HashrateMeter
+from mining import (
+    HEADER_VERSION, MAX_TARGET, pack_header_prefix, difficulty_to_target, target_to_difficulty,
+    hash_header, search_nonce, parallel_search, resolve_workers
+)
+
+# ------------------------
+# Network Parameters
+# ------------------------
+class NetworkParameters:
+    def __init__(self):
+        self.block_size_limit = 1000000  # 1MB in bytes
+        self.mining_target = difficulty_to_target(3)  # a block's hash must be <= this 256-bit integer
+        self.transaction_fee = 0.001
+        self.block_time_target = 10  # seconds
+        self.retarget_window = 10  # blocks averaged by the difficulty retarget; 0 = fixed difficulty
+        self.max_transactions_per_block = 1000
+        self.network_hashrate = 1000000  # hashes per second
+        self.node_count = 10
+        self.mining_workers = 1  # processes used by proof_of_work; 0 = one per CPU
+        self.mempool_max_bytes = 50000000  # 50MB of pending transactions
+        self.mempool_max_transactions = 200000
+        self.mempool_expiry = 3600  # seconds a transaction may wait before it is dropped
+        self.decentralization_window = 0  # blocks covered by decentralization metrics; 0 = all time
+        self.miner_distribution = {
+            'large_miners': 0.3,  # 30% of hashrate
+            'medium_miners': 0.4,  # 40% of hashrate
+            'small_miners': 0.3   # 30% of hashrate
+        }
+
+    @property
+    def mining_difficulty(self):
+        """The target as an equivalent number of leading hex zeros (fractional)"""
+        return target_to_difficulty(self.mining_target)
+
+    @mining_difficulty.setter
+    def mining_difficulty(self, difficulty):
+        self.mining_target = difficulty_to_target(difficulty)
+
+    def to_dict(self):
+        """Parameters reported by analytics and parameter-change events"""
+        return {
+            'block_size_limit': self.block_size_limit,
+            'mining_difficulty': self.mining_difficulty,
+            'mining_target': f'{self.mining_target:064x}',
+            'transaction_fee': self.transaction_fee,
+            'block_time_target': self.block_time_target,
+            'retarget_window': self.retarget_window,
+            'max_transactions_per_block': self.max_transactions_per_block,
+            'mining_workers': self.mining_workers,
+            'mempool_max_bytes': self.mempool_max_bytes,
+            'mempool_max_transactions': self.mempool_max_transactions,
+            'mempool_expiry': self.mempool_expiry,
+            'decentralization_window': self.decentralization_window
+        }
+
+# ------------------------
+# Blockchain Components
+# ------------------------
+class Block:
+    def __init__(self, index, timestamp, transactions, previous_hash, nonce=0, block_size=0,
+                 target=MAX_TARGET, version=HEADER_VERSION):
+        self.index = index
+        self.timestamp = timestamp
+        self.transactions = transactions
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.block_size = block_size
+        self.target = target
+        self.version = version
+        self.merkle_root = self.compute_merkle_root()
+        self.hash = self.compute_hash()
+
+    def leaves(self):
+        for tx in self.transactions:
+            if hasattr(tx, 'txid'):
+                yield tx.id
+            else:  # Legacy transaction dict
+                yield json.dumps(tx, sort_keys=True).encode()
+
+    def merkle_levels(self):
+        """Merkle tree over the transactions, built on every call; a MerkleCache keeps the ones proofs need"""
+        return build_levels(list(self.leaves()))
+
+    def compute_merkle_root(self):
+        """Commit to the block's transactions once, so the header stays fixed-size"""
+        if self.version < 3:
+            # Older headers carried one flat hash over every transaction
+            body = sha256()
+            for leaf in self.leaves():
+                body.update(leaf)
+            return body.hexdigest()
+        return merkle_root(list(self.leaves()))
+
+    def header_prefix(self):
+        """Packed header without the nonce; constant for the whole nonce search"""
+        return pack_header_prefix(self.version, self.previous_hash, self.merkle_root,
+                                  self.timestamp, self.target)
+
+    @property
+    def difficulty(self):
+        return target_to_difficulty(self.target)
+
+    def compute_hash(self):
+        return hash_header(self.header_prefix(), self.nonce)
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'transactions': [tx.to_dict() if hasattr(tx, 'to_dict') else tx for tx in self.transactions],
+            'previous_hash': self.previous_hash,
+            'nonce': self.nonce,
+            'block_size': self.block_size,
+            'difficulty': self.difficulty,
+            'target': f'{self.target:064x}',
+            'version': self.version,
+            # Before version 3 the field was a flat hash, not a Merkle root
+            'merkle_root' if self.version >= 3 else 'body_hash': self.merkle_root,
+            'hash': self.hash
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a stored block without recomputing its digests"""
+        block = cls.__new__(cls)
+        block.index = data['index']
+        block.timestamp = data['timestamp']
+        block.transactions = [Transaction.from_dict(tx) if 'size' in tx else tx for tx in data['transactions']]
+        block.previous_hash = data['previous_hash']
+        block.nonce = data['nonce']
+        block.block_size = data['block_size']
+        # Version 1 blocks stored only the difficulty
+        block.target = int(data['target'], 16) if 'target' in data else difficulty_to_target(data['difficulty'])
+        block.version = data['version']
+        block.merkle_root = data['merkle_root'] if 'merkle_root' in data else data['body_hash']
+        block.hash = data['hash']
+        return block
+
+# Binary transaction encoding: the byte lengths of sender and recipient,
+# then amount, fee and timestamp as float64, then the two UTF-8 addresses
+TX_ENCODING = struct.Struct('>HHddd')
+
+
+def txid_key(txid):
+    """Raw 32-byte id of a hex txid, or None if `txid` is not one"""
+    try:
+        key = bytes.fromhex(txid)
+    except (TypeError, ValueError):
+        return None
+    return key if len(key) == 32 else None
+
+def transfer_error(sender, amount, fee):
+    """Why a transfer breaks the rules every block is validated against, or None"""
+    if sender == "MINER":
+        return "Only block rewards can be paid by MINER"
+    if not amount > 0:  # also catches NaN
+        return "Amount must be positive"
+    if not fee >= 0:
+        return "Fee cannot be negative"
+    return None
+
+
+class Transaction:
+    """One transfer. Instances are compact and never change once built.
+
+    The id is the SHA-256 of the binary encoding, kept as 32 raw bytes
+    (`txid` is its hex form), and `size` is the length of that encoding.
+    Addresses are interned, so every transaction from the same address
+    shares one string.
+    """
+    __slots__ = ('sender', 'recipient', 'amount', 'fee', 'timestamp', 'id', 'size')
+
+    def __init__(self, sender, recipient, amount, fee=0.001, timestamp=None):
+        self.sender = intern(sender)
+        self.recipient = intern(recipient)
+        self.amount = float(amount)
+        self.fee = float(fee)
+        self.timestamp = timestamp or time.time()
+        encoded = self.encode()
+        self.id = sha256(encoded).digest()
+        self.size = len(encoded)
+
+    @property
+    def txid(self):
+        return self.id.hex()
+
+    def encode(self):
+        sender = self.sender.encode()
+        recipient = self.recipient.encode()
+        return TX_ENCODING.pack(len(sender), len(recipient), self.amount, self.fee, self.timestamp) + sender + recipient
+
+    def compute_txid(self, version=HEADER_VERSION):
+        """Hex id derived from the fields, as blocks of header `version` define it"""
+        if version < 4:
+            # Older blocks hashed the sorted JSON of the five fields
+            return sha256(json.dumps({
+                'sender': self.sender,
+                'recipient': self.recipient,
+                'amount': self.amount,
+                'fee': self.fee,
+                'timestamp': self.timestamp
+            }, sort_keys=True).encode()).hexdigest()
+        return sha256(self.encode()).hexdigest()
+
+    def to_dict(self):
+        return {
+            'txid': self.id.hex(),
+            'sender': self.sender,
+            'recipient': self.recipient,
+            'amount': self.amount,
+            'fee': self.fee,
+            'timestamp': self.timestamp,
+            'size': self.size
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        tx = cls.__new__(cls)
+        tx.sender = intern(data['sender'])
+        tx.recipient = intern(data['recipient'])
+        tx.amount = data['amount']
+        tx.fee = data['fee']
+        tx.timestamp = data['timestamp']
+        tx.id = bytes.fromhex(data['txid'])
+        tx.size = data['size']
+        return tx
+
+class Balances(defaultdict):
+    """Address -> balance, 0.0 for unseen addresses, that can report which addresses were set.
+
+    Recording starts with the first take_changes() call, so a Blockchain used
+    without a Ledger only pays an attribute check per update.
+    """
+
+    def __init__(self):
+        super().__init__(float)
+        self._changed = None
+
+    def __setitem__(self, address, balance):
+        if self._changed is not None:
+            self._changed.add(address)
+        super().__setitem__(address, balance)
+
+    def update(self, *args, **kwargs):
+        for address, balance in dict(*args, **kwargs).items():
+            self[address] = balance
+
+    def take_changes(self):
+        """Addresses set since the previous call"""
+        changed, self._changed = self._changed or set(), set()
+        return changed
+
+BLOCK_TIME_EWMA_ALPHA = 0.1
+BLOCK_REWARD = 10.0
+# Starting balances of the demo accounts on a fresh chain; no block records them
+DEMO_BALANCES = {'alice': 50, 'bob': 30, 'carol': 20}
+# Most a single retarget may scale the target by, in either direction
+RETARGET_MAX_FACTOR = 4
+# Unconfirmed credit below this is rounding left over from settled transactions
+CREDIT_EPSILON = 1e-9
+# Blocks whose Merkle trees are kept for inclusion proofs
+MERKLE_CACHE_BLOCKS = 1024
+# Layout of checkpoint_state(); checkpoints in any other layout are replayed over
+CHECKPOINT_FORMAT = 3
+
+# Shared by every Blockchain in the process and served at /metrics
+TEMPLATE_SELECTION_SECONDS = REGISTRY.histogram(
+    'cryptosim_template_selection_seconds', 'Time to select the transactions of a block template')
+BLOCK_INTERVAL_SECONDS = REGISTRY.histogram(
+    'cryptosim_block_interval_seconds', 'Seconds between the timestamps of consecutive blocks',
+    buckets=BLOCK_INTERVAL_BUCKETS)
+HASHES = REGISTRY.counter('cryptosim_hashes_total', 'Nonces tried by proof-of-work searches')
+
+class Blockchain:
+    def __init__(self, network_params, store=None, events=None):
+        # A BlockStore keeps the chain on disk; without one it lives in a list
+        self.store = store
+        # An EventBus receives deltas (blocks, mempool, balances, parameters) for live clients
+        self.events = events
+        self.chain = store if store is not None else []
+        self.current_transactions = []
+        self.network_params = network_params
+        self.balances = Balances()
+        # address -> amount received by pending transactions. It counts in the
+        # balance but cannot be spent until it is mined, so dropping a pending
+        # transaction never takes back funds that were passed on.
+        self.unconfirmed_credit = {}
+        # Batches may spend credit received earlier in the same batch. Such a
+        # spend is only mined with or after the transactions that funded it,
+        # and is dropped with them: raw id -> raw ids of its pending parents,
+        # and the reverse.
+        self.pending_parents = {}
+        self.pending_children = {}
+        self.mempool = Mempool()
+        self.tx_index = {}  # raw txid -> (block index, position in block)
+        self.address_index = defaultdict(list)  # address -> [(block index, position)]
+        self.mining_stats = {
+            'total_blocks_mined': 0,
+            'total_transactions_processed': 0,
+            'average_block_time': 0,
+            'difficulty_adjustments': 0,
+            'orphaned_blocks': 0
+        }
+        self.mempool_stats = {
+            'evictions': 0,
+            'expirations': 0,
+            'replacements': 0
+        }
+        self.decentralization_metrics = {
+            'gini_coefficient': 0,
+            'herfindahl_index': 0,
+            'top_miners_concentration': 0,
+            'node_distribution': {},
+            'window_blocks': 0
+        }
+        self.miner_stats = defaultdict(lambda: {
+            'blocks_mined': 0,
+            'total_rewards': 0,
+            'hashrate': 0
+        })
+        # Rewards behind the decentralization metrics: all time, and the last N blocks
+        self.reward_distribution = RewardDistribution()
+        self.window_distribution = RewardDistribution()
+        self.window_rewards = deque()  # (miner, reward) per block in the window
+        self.window_size = 0
+        # Running aggregates, updated as blocks are appended
+        self.chain_stats = {
+            'total_block_size': 0,
+            'last_block_timestamp': None
+        }
+        self.recent_headers = deque()  # (timestamp, target) of the newest blocks, for retargeting
+        # Measured from nonce searches, which run outside the ledger writer
+        self.hashrate = HashrateMeter()
+        self.miner_hashrates = {}  # miner -> HashrateMeter
+        self.merkle_cache = MerkleCache(MERKLE_CACHE_BLOCKS)
+        # Ledger snapshots rebuild analytics only when the tip, mempool or parameters change
+        self.params_version = 0
+        self._instance_token = uuid4().hex[:8]
+        if store is not None and len(store):
+            self.restore_from_store()
+        else:
+            self.create_genesis_block()
+
+    def create_genesis_block(self):
+        genesis_block = Block(0, time.time(), [], "0", block_size=0)
+        self.append_block(genesis_block)
+
+    def get_last_block(self):
+        return self.chain[-1]
+
+    def append_block(self, block):
+        """Add a block to the chain and index its transactions"""
+        self.chain.append(block)
+        self.index_block(block)
+        self.record_chain_aggregates(block)
+
+    def record_chain_aggregates(self, block):
+        stats = self.chain_stats
+        stats['total_block_size'] += block.block_size
+        if stats['last_block_timestamp'] is not None:
+            interval = block.timestamp - stats['last_block_timestamp']
+            average = self.mining_stats['average_block_time']
+            if block.index > 1:
+                BLOCK_INTERVAL_SECONDS.observe(interval)
+            # Exponentially weighted, so recent blocks dominate the average
+            self.mining_stats['average_block_time'] = (
+                interval if block.index == 1 else
+                average + BLOCK_TIME_EWMA_ALPHA * (interval - average)
+            )
+        stats['last_block_timestamp'] = block.timestamp
+        if block.index > 0:  # the genesis timestamp is just when the chain was created
+            self.recent_headers.append((block.timestamp, block.target))
+            while len(self.recent_headers) > max(1, self.network_params.retarget_window + 1):
+                self.recent_headers.popleft()
+
+    def index_block(self, block):
+        for position, tx in enumerate(block.transactions):
+            if hasattr(tx, 'txid'):
+                txid, sender, recipient = tx.id, tx.sender, tx.recipient
+            else:  # Legacy transaction dict
+                txid, sender, recipient = txid_key(tx.get('txid')), tx.get('sender'), tx.get('recipient')
+            location = (block.index, position)
+            if txid is not None:
+                self.tx_index[txid] = location
+            self.address_index[sender].append(location)
+            if recipient != sender:
+                self.address_index[recipient].append(location)
+
+    def add_transaction(self, sender, recipient, amount, fee=None, replaces=None):
+        if fee is None:
+            fee = self.network_params.transaction_fee
+        
+        amount = float(amount)
+        fee = float(fee)
+        error = transfer_error(sender, amount, fee)
+        if error is not None:
+            return False, error
+        
+        self.expire_mempool()
+        
+        # A replacement frees the funds the original transaction reserved
+        available = self.spendable(sender)
+        original = None
+        replacing = None if replaces is None else txid_key(replaces)
+        if replaces is not None:
+            original = self.mempool.get(replacing)
+            if original is None:
+                return False, "Transaction to replace is not pending"
+            if original.sender != sender:
+                return False, "Only the original sender can replace a transaction"
+            available += original.amount + original.fee
+        
+        if available < (amount + fee):
+            return False, "Insufficient balance"
+        
+        transaction = Transaction(sender, recipient, amount, fee)
+        
+        # Check if transaction would fit in a block
+        if transaction.size > self.network_params.block_size_limit:
+            return False, "Transaction too large"
+        
+        if original is not None and (transaction.fee <= original.fee or
+                                     Mempool.fee_rate(transaction) <= Mempool.fee_rate(original)):
+            return False, "Replacement must pay a higher fee"
+        
+        evicted = self.mempool.eviction_candidates(
+            transaction,
+            self.network_params.mempool_max_bytes,
+            self.network_params.mempool_max_transactions,
+            replacing=replacing
+        )
+        if evicted is None:
+            return False, "Mempool full: fee rate too low"
+        
+        dropped = []
+        if original is not None:
+            dropped += self.drop_pending_transaction(original.id)
+            self.mempool_stats['replacements'] += 1
+        for tx in evicted:
+            removed = self.drop_pending_transaction(tx.id)  # may have gone with an earlier victim
+            self.mempool_stats['evictions'] += len(removed)
+            dropped += removed
+        
+        self.mempool.add(transaction)
+        
+        self.balances[sender] -= (amount + fee)
+        self.balances[recipient] += amount
+        self.unconfirmed_credit[recipient] = self.unconfirmed_credit.get(recipient, 0.0) + amount
+        
+        if self.events is not None:
+            if dropped:
+                self.emit_mempool_removed(dropped)
+            self.emit('mempool_add', dict(transaction.to_dict(), **self.mempool_totals()))
+            self.emit_balances([transaction] + dropped)
+        
+        return True, transaction.txid
+
+    def add_transactions(self, batch):
+        """Validate and admit a batch of transfers in one pass.
+
+        `batch` is a sequence of dicts with sender, recipient, amount and an
+        optional fee. Items are checked in order against balances that already
+        include the effect of the accepted items before them, so an item may
+        spend what earlier items in the batch paid its sender. Such a spend
+        depends on those items: it is only mined with or after them, and is
+        dropped if they are. Credit pending from outside the batch still
+        cannot be spent. The accepted transactions then enter the mempool
+        together. Returns one (success, txid or error) pair per item.
+        """
+        params = self.network_params
+        self.expire_mempool()
+        
+        results = []
+        accepted = []
+        evicted = []
+        evicting = set()
+        seen = set()
+        projected = {}  # address -> balance after the items accepted so far
+        credited = {}  # address -> unconfirmed credit after the items accepted so far
+        received = {}  # address -> amount paid to it by the items accepted so far
+        funders = defaultdict(list)  # address -> raw ids of those items
+        parents = {}  # raw id of an accepted item -> raw ids of the items it spends from
+        pending_count = pending_bytes = 0
+        
+        def balance(address):
+            if address in projected:
+                return projected[address]
+            return self.balances.get(address, 0.0)
+        
+        def credit(address):
+            if address in credited:
+                return credited[address]
+            return self.unconfirmed_credit.get(address, 0.0)
+        
+        for item in batch:
+            try:
+                sender, recipient = item['sender'], item['recipient']
+                if not isinstance(sender, str) or not isinstance(recipient, str):
+                    raise TypeError("addresses must be strings")
+                amount = float(item['amount'])
+                fee = float(item.get('fee', params.transaction_fee))
+            except (KeyError, TypeError, ValueError):
+                results.append((False, "Missing or invalid fields"))
+                continue
+            error = transfer_error(sender, amount, fee)
+            if error is not None:
+                results.append((False, error))
+                continue
+            
+            # Credit from earlier items of this batch is spendable, unlike other pending credit
+            confirmed = balance(sender) - credit(sender)
+            if confirmed + received.get(sender, 0.0) < (amount + fee):
+                results.append((False, "Insufficient balance"))
+                continue
+            
+            transaction = Transaction(sender, recipient, amount, fee)
+            if transaction.size > params.block_size_limit:
+                results.append((False, "Transaction too large"))
+                continue
+            if transaction.id in self.mempool or transaction.id in seen:
+                results.append((False, "Duplicate transaction"))
+                continue
+            
+            victims = self.mempool.eviction_candidates(
+                transaction, params.mempool_max_bytes, params.mempool_max_transactions,
+                pending_count=pending_count, pending_bytes=pending_bytes, evicting=evicting
+            )
+            if victims is None:
+                results.append((False, "Mempool full: fee rate too low"))
+                continue
+            
+            # Spends of a victim's credit go with it
+            victims = self.with_pending_descendants(victims, evicting)
+            for victim in victims:
+                evicting.add(victim.id)
+                if victim.sender != "MINER":
+                    projected[victim.sender] = balance(victim.sender) + victim.amount + victim.fee
+                projected[victim.recipient] = balance(victim.recipient) - victim.amount
+                credited[victim.recipient] = credit(victim.recipient) - victim.amount
+            evicted.extend(victims)
+            pending_count += 1 - len(victims)
+            pending_bytes += transaction.size - sum(victim.size for victim in victims)
+            
+            projected[sender] = balance(sender) - (amount + fee)
+            projected[recipient] = balance(recipient) + amount
+            credited[recipient] = credit(recipient) + amount
+            received[recipient] = received.get(recipient, 0.0) + amount
+            if confirmed < (amount + fee):
+                parents[transaction.id] = list(funders[sender])
+            funders[recipient].append(transaction.id)
+            accepted.append(transaction)
+            seen.add(transaction.id)
+            results.append((True, transaction.txid))
+        
+        for tx in evicted:
+            self.mempool.remove(tx.id)
+            self.unlink_pending(tx.id)
+            self.mempool_stats['evictions'] += 1
+        for tx in accepted:
+            self.mempool.add(tx)
+        for child, funded_by in parents.items():
+            self.link_pending(child, funded_by)
+        # The projections already include the refunds of the evicted transactions
+        self.balances.update(projected)
+        for address, amount in credited.items():
+            self.set_unconfirmed_credit(address, amount)
+        
+        if self.events is not None and (accepted or evicted):
+            if evicted:
+                self.emit_mempool_removed(evicted)
+            totals = self.mempool_totals()
+            for tx in accepted:
+                self.emit('mempool_add', dict(tx.to_dict(), **totals))
+            self.emit_balances(accepted + evicted)
+        
+        return results
+
+    def open_accounts(self, balances):
+        """Give a starting balance to addresses the ledger has not seen yet"""
+        opened = {address: balance for address, balance in balances.items() if address not in self.balances}
+        if opened and self.store is not None:
+            self.store.record_accounts(opened)  # no block records it, so a replay needs it
+        self.balances.update(opened)
+        if opened:
+            self.emit('balances', opened)
+        return opened
+
+    def drop_pending_transaction(self, txid):
+        """Remove a pending transaction (by raw id) and any that spend its credit, undoing their
+        balance changes; returns what was removed"""
+        tx = self.mempool.remove(txid)
+        if tx is None:
+            return []
+        self.refund_transaction(tx)
+        dropped = [tx]
+        for child in self.unlink_pending(txid):
+            dropped += self.drop_pending_transaction(child)
+        return dropped
+
+    def link_pending(self, child, parents):
+        """Record that pending `child` spends credit from the pending `parents`"""
+        self.pending_parents[child] = set(parents)
+        for parent in parents:
+            self.pending_children.setdefault(parent, set()).add(child)
+
+    def unlink_pending(self, txid):
+        """Forget the links of a transaction that left the mempool; returns its pending children"""
+        for parent in self.pending_parents.pop(txid, ()):
+            siblings = self.pending_children[parent]
+            siblings.discard(txid)
+            if not siblings:
+                del self.pending_children[parent]
+        children = self.pending_children.pop(txid, set())
+        for child in children:
+            funders = self.pending_parents[child]
+            funders.discard(txid)
+            if not funders:
+                del self.pending_parents[child]
+        return children
+
+    def with_pending_descendants(self, transactions, excluded=()):
+        """`transactions` followed by the pending ones that spend their credit, directly or not"""
+        found = list(transactions)
+        seen = {tx.id for tx in found}.union(excluded)
+        for tx in found:  # grows while it is walked
+            for child in self.pending_children.get(tx.id, ()):
+                if child not in seen:
+                    seen.add(child)
+                    found.append(self.mempool.get(child))
+        return found
+
+    def refund_transaction(self, tx):
+        """Reverse the optimistic debit and credit applied when tx entered the mempool"""
+        if tx.sender != "MINER":
+            self.balances[tx.sender] += tx.amount + tx.fee
+        self.balances[tx.recipient] -= tx.amount
+        self.settle_credit(tx)
+
+    def spendable(self, address):
+        """Balance less the credit still waiting in the mempool"""
+        return self.balances[address] - self.unconfirmed_credit.get(address, 0.0)
+
+    def settle_credit(self, tx):
+        """Stop counting a pending transaction's amount as unconfirmed credit; it was mined or dropped"""
+        self.set_unconfirmed_credit(tx.recipient, self.unconfirmed_credit.get(tx.recipient, 0.0) - tx.amount)
+
+    def set_unconfirmed_credit(self, address, amount):
+        if amount > CREDIT_EPSILON:
+            self.unconfirmed_credit[address] = amount
+        else:  # settled; rounding may leave a trace either side of zero
+            self.unconfirmed_credit.pop(address, None)
+
+    def expire_mempool(self, now=None):
+        """Drop transactions that have waited longer than the mempool expiry"""
+        expiry = self.network_params.mempool_expiry
+        if not expiry:
+            return []
+        expired = self.mempool.expire((now or time.time()) - expiry)
+        self.mempool_stats['expirations'] += len(expired)
+        dropped = list(expired)
+        for tx in expired:
+            self.refund_transaction(tx)
+            # Spends of its credit may have arrived later; they cannot outlive it
+            for child in self.unlink_pending(tx.id):
+                dropped += self.drop_pending_transaction(child)
+        if dropped and self.events is not None:
+            self.emit_mempool_removed(dropped)
+            self.emit_balances(dropped)
+        return dropped
+
+    # ------------------------
+    # Live events
+    # ------------------------
+    def emit(self, event_type, data):
+        if self.events is not None:
+            self.events.publish(event_type, data)
+
+    def mempool_totals(self):
+        return {'mempool_size': len(self.mempool), 'mempool_bytes': self.mempool.total_bytes}
+
+    def emit_mempool_removed(self, transactions):
+        self.emit('mempool_remove', dict(txids=[tx.txid for tx in transactions], **self.mempool_totals()))
+
+    def emit_balances(self, transactions):
+        """Publish the current balance of every address the transactions touched"""
+        addresses = {tx.sender for tx in transactions} | {tx.recipient for tx in transactions}
+        addresses.discard("MINER")
+        self.emit('balances', {address: self.balances[address] for address in addresses})
+
+    def emit_block(self, block):
+        reward_tx = block.transactions[-1]
+        self.emit('block', {
+            'index': block.index,
+            'hash': block.hash,
+            'previous_hash': block.previous_hash,
+            'timestamp': block.timestamp,
+            'nonce': block.nonce,
+            'difficulty': block.difficulty,
+            'block_size': block.block_size,
+            'tx_count': len(block.transactions),
+            'miner': reward_tx.recipient,
+            'reward': reward_tx.amount,
+            'miner_stats': dict(self.miner_stats[reward_tx.recipient]),
+            'mining_stats': dict(self.mining_stats),
+            'decentralization_metrics': dict(self.decentralization_metrics),
+            'total_blocks': len(self.chain),
+            'average_block_size': self.chain_stats['total_block_size'] / len(self.chain)
+        })
+        self.emit_mempool_removed(block.transactions[:-1])
+
+    def select_transactions_for_block(self):
+        """Select transactions from mempool based on fee priority and size limits"""
+        started = time.perf_counter()
+        size_limit = self.network_params.block_size_limit
+        max_count = self.network_params.max_transactions_per_block
+        selected, block_size = self.mempool.select(size_limit, max_count)
+        if self.pending_parents:
+            chosen = {tx.id for tx in selected}
+            if any(not self.pending_parents.get(tx.id, chosen) <= chosen for tx in selected):
+                selected, block_size = self.select_with_parents(size_limit, max_count)
+        TEMPLATE_SELECTION_SECONDS.observe(time.perf_counter() - started)
+        return selected, block_size
+
+    def select_with_parents(self, size_limit, max_count):
+        """Best-first fill like Mempool.select, in which a spend of batch credit waits for its parents.
+
+        Used only when the plain selection took a spend without its pending
+        parents. A spend that ranks above a parent is set aside and taken,
+        room permitting, once the parent is in.
+        """
+        selected, chosen, block_size = [], set(), 0
+        waiting = {}  # parent raw id -> spends set aside for it
+        ready = deque()
+        for tx in self.mempool:
+            ready.append(tx)
+            while ready and len(selected) < max_count:
+                tx = ready.popleft()
+                if block_size + tx.size > size_limit:
+                    continue
+                missing = self.pending_parents.get(tx.id, chosen) - chosen
+                if missing:
+                    waiting.setdefault(next(iter(missing)), []).append(tx)
+                    continue
+                selected.append(tx)
+                chosen.add(tx.id)
+                block_size += tx.size
+                ready.extend(waiting.pop(tx.id, ()))
+            if len(selected) == max_count:
+                break
+        return selected, block_size
+
+    def proof_of_work(self, block):
+        target = block.target
+        workers = resolve_workers(self.network_params.mining_workers)
+        started = time.perf_counter()
+        if workers > 1:
+            block.nonce, block.hash = parallel_search(block.header_prefix(), target, workers)
+        else:
+            block.nonce, block.hash = search_nonce(block.header_prefix(), target)
+        # Parallel workers cover the nonces below the winner between them
+        self.record_hashing(block.transactions[-1].recipient, block.nonce + 1, time.perf_counter() - started)
+        return block.hash
+
+    def record_hashing(self, miner, hashes, seconds):
+        """Count nonces tried on behalf of `miner` in `seconds`; safe to call from any thread"""
+        HASHES.inc(hashes)
+        self.hashrate.record(hashes, seconds)
+        meter = self.miner_hashrates.get(miner)
+        if meter is None:
+            meter = self.miner_hashrates.setdefault(miner, HashrateMeter())
+        meter.record(hashes, seconds)
+
+    def mine_block(self, miner):
+        """Build a template, search for its proof of work and append it.
+
+        The three steps are separate so that a single ledger writer can own
+        prepare_block and commit_block while the search runs elsewhere.
+        """
+        new_block, message = self.prepare_block(miner)
+        if new_block is None:
+            return None, message
+        self.proof_of_work(new_block)
+        if not self.commit_block(new_block):
+            return None, "Block template went stale"
+        return new_block, message
+
+    def prepare_block(self, miner):
+        """Block template on the current tip, paying `miner`; its nonce is not searched yet"""
+        self.expire_mempool()
+        if not self.mempool:
+            return None, "No transactions to mine"
+        
+        # Select transactions for this block
+        selected_transactions, block_size = self.select_transactions_for_block()
+        
+        if not selected_transactions:
+            return None, "No valid transactions to mine"
+        
+        # Calculate total fees
+        total_fees = sum(tx.fee for tx in selected_transactions)
+        
+        # Add mining reward transaction
+        reward_tx = Transaction("MINER", miner, BLOCK_REWARD + total_fees, 0)
+        selected_transactions.append(reward_tx)
+        
+        last_block = self.get_last_block()
+        new_block = Block(
+            index=last_block.index + 1,
+            timestamp=time.time(),
+            transactions=selected_transactions,
+            previous_hash=last_block.hash,
+            block_size=block_size,
+            target=self.network_params.mining_target
+        )
+        return new_block, f"Block mined successfully with {len(selected_transactions)-1} transactions"
+
+    def is_stale(self, block):
+        """True if a template no longer extends the tip or spends transactions that left the mempool"""
+        if block.previous_hash != self.get_last_block().hash:
+            return True
+        return any(tx.id not in self.mempool for tx in block.transactions[:-1])
+
+    def commit_block(self, block):
+        """Append a block whose proof of work was found; returns False if it went stale meanwhile"""
+        if self.is_stale(block):
+            if block.previous_hash != self.get_last_block().hash:
+                # A solved block that lost the race to the tip is an orphan
+                self.mining_stats['orphaned_blocks'] += 1
+            return False
+        self.append_block(block)
+        
+        # Remove mined transactions from mempool; what they credited is now confirmed
+        for tx in block.transactions[:-1]:  # Exclude reward transaction
+            self.mempool.remove(tx.id)
+            self.unlink_pending(tx.id)
+            self.settle_credit(tx)
+        
+        # The reward mints the subsidy and passes on the fees senders already paid
+        reward_tx = block.transactions[-1]
+        self.balances[reward_tx.recipient] += reward_tx.amount
+        
+        self.record_block_stats(block)
+        self.adjust_difficulty()
+        
+        # Calculate decentralization metrics
+        self.update_decentralization_metrics()
+        
+        if self.store is not None and block.index % self.store.checkpoint_interval == 0:
+            self.save_checkpoint()
+        
+        if self.events is not None:
+            self.emit_block(block)
+            self.emit_balances([reward_tx])
+        return True
+
+    def record_block_stats(self, block):
+        """Update mining and miner statistics for an appended block; its last transaction is the reward"""
+        reward_tx = block.transactions[-1]
+        self.mining_stats['total_blocks_mined'] += 1
+        self.mining_stats['total_transactions_processed'] += len(block.transactions) - 1
+        self.miner_stats[reward_tx.recipient]['blocks_mined'] += 1
+        self.miner_stats[reward_tx.recipient]['total_rewards'] += reward_tx.amount
+        meter = self.miner_hashrates.get(reward_tx.recipient)
+        if meter is not None:  # replayed blocks keep the rate measured when they were mined
+            self.miner_stats[reward_tx.recipient]['hashrate'] = meter.rate()
+        self.reward_distribution.add(reward_tx.recipient, reward_tx.amount)
+        if self.window_size:
+            self.window_rewards.append((reward_tx.recipient, reward_tx.amount))
+            self.window_distribution.add(reward_tx.recipient, reward_tx.amount)
+            if len(self.window_rewards) > self.window_size:
+                miner, reward = self.window_rewards.popleft()
+                self.window_distribution.add(miner, -reward)
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def checkpoint_state(self):
+        """Everything derived from the chain, as of the current tip, and the pending transactions"""
+        tip = self.get_last_block()
+        # Balances are saved without the pending transactions: blocks stored
+        # after the checkpoint may conflict with them, so they are only
+        # readmitted once those blocks are replayed
+        balances = dict(self.balances)
+        for tx in self.mempool:
+            if tx.sender != "MINER":
+                balances[tx.sender] += tx.amount + tx.fee
+            balances[tx.recipient] -= tx.amount
+        return {
+            'format': CHECKPOINT_FORMAT,
+            'height': tip.index,
+            'hash': tip.hash,
+            'accounts_opened': self.store.accounts_recorded if self.store is not None else 0,
+            'balances': balances,
+            'mempool': list(self.mempool),
+            'tx_index': self.tx_index,
+            'address_index': dict(self.address_index),
+            'mining_stats': self.mining_stats,
+            'mempool_stats': self.mempool_stats,
+            'miner_stats': {miner: dict(stats) for miner, stats in self.miner_stats.items()},
+            'decentralization_metrics': self.decentralization_metrics,
+            'chain_stats': self.chain_stats
+        }
+
+    def save_checkpoint(self):
+        if self.store is not None:
+            self.store.save_checkpoint(self.checkpoint_state())
+
+    def restore_from_store(self):
+        """Load the last checkpoint, then replay only the blocks stored after it"""
+        state = self.store.load_checkpoint()
+        start = opened = 0
+        pending = []
+        if (state is not None and state.get('format') == CHECKPOINT_FORMAT and
+                state['height'] < len(self.store) and self.store[state['height']].hash == state['hash']):
+            self.balances.update(state['balances'])
+            pending = state['mempool']
+            self.tx_index = state['tx_index']
+            self.address_index.update(state['address_index'])
+            self.mining_stats.update(state['mining_stats'])
+            self.mempool_stats.update(state['mempool_stats'])
+            for miner, stats in state['miner_stats'].items():
+                self.miner_stats[miner].update(stats)
+                self.reward_distribution.add(miner, stats['total_rewards'])
+            self.decentralization_metrics.update(state['decentralization_metrics'])
+            self.chain_stats.update(state['chain_stats'])
+            start = state['height'] + 1
+            opened = state.get('accounts_opened', 0)
+        # Accounts opened since the checkpoint (all of them without one) had no
+        # funds before, so their starting balances go in ahead of the blocks
+        for address, balance in self.store.load_accounts(opened).items():
+            self.balances[address] += balance
+        
+        window = self.network_params.retarget_window + 1
+        for block in self.store[max(1, start - window):start]:
+            self.recent_headers.append((block.timestamp, block.target))
+        for height in range(start, len(self.store)):
+            self.replay_block(self.store[height])
+        self.readmit_pending(pending)
+        self.update_decentralization_metrics()
+
+    def replay_block(self, block):
+        """Re-derive state from a stored block that is newer than the checkpoint"""
+        self.index_block(block)
+        self.record_chain_aggregates(block)
+        if not block.transactions:  # Genesis
+            return
+        for tx in block.transactions[:-1]:
+            self.balances[tx.sender] -= tx.amount + tx.fee
+            self.balances[tx.recipient] += tx.amount
+        reward_tx = block.transactions[-1]
+        self.balances[reward_tx.recipient] += reward_tx.amount
+        self.record_block_stats(block)
+
+    def readmit_pending(self, transactions):
+        """Return checkpointed pending transactions to the mempool, in arrival order.
+
+        Blocks replayed after the checkpoint may have confirmed them, or
+        confirmed a replacement or another spend of the same funds after they
+        were dropped. Confirmed ones are skipped and any the sender can no
+        longer afford are left out, so nothing is spent twice.
+        """
+        for tx in sorted(transactions, key=lambda tx: tx.timestamp):
+            if tx.id in self.tx_index or tx.id in self.mempool:
+                continue
+            if (transfer_error(tx.sender, tx.amount, tx.fee) is not None or
+                    self.spendable(tx.sender) < tx.amount + tx.fee):
+                continue
+            self.mempool.add(tx, arrival=tx.timestamp)
+            self.balances[tx.sender] -= tx.amount + tx.fee
+            self.balances[tx.recipient] += tx.amount
+            self.unconfirmed_credit[tx.recipient] = self.unconfirmed_credit.get(tx.recipient, 0.0) + tx.amount
+
+    def rebuild_reward_window(self):
+        """Refill the windowed distribution from the last `decentralization_window` blocks"""
+        self.window_size = max(0, int(self.network_params.decentralization_window))
+        self.window_distribution = RewardDistribution()
+        self.window_rewards = deque()
+        if not self.window_size:
+            return
+        for block in self.chain[-self.window_size:]:
+            if block.transactions:
+                reward_tx = block.transactions[-1]
+                self.window_rewards.append((reward_tx.recipient, reward_tx.amount))
+                self.window_distribution.add(reward_tx.recipient, reward_tx.amount)
+
+    def update_decentralization_metrics(self):
+        """Refresh decentralization metrics from the incrementally maintained reward distribution"""
+        if self.window_size != self.network_params.decentralization_window:
+            self.rebuild_reward_window()
+        distribution = self.window_distribution if self.window_size else self.reward_distribution
+        
+        self.decentralization_metrics['gini_coefficient'] = distribution.gini()
+        self.decentralization_metrics['herfindahl_index'] = distribution.herfindahl()
+        # Top miners concentration (percentage controlled by top 3 miners)
+        self.decentralization_metrics['top_miners_concentration'] = distribution.top_concentration(3)
+        self.decentralization_metrics['window_blocks'] = self.window_size
+
+    def adjust_difficulty(self):
+        """Retarget toward block_time_target over a rolling window of recent blocks.
+
+        The new target is the window's mean target scaled by how long the
+        window's blocks actually took compared to how long they should have
+        taken, so the expected work per block follows the hashrate. The scale
+        factor is clamped to [1/RETARGET_MAX_FACTOR, RETARGET_MAX_FACTOR].
+        """
+        params = self.network_params
+        window = int(params.retarget_window)
+        if window <= 0 or len(self.recent_headers) < window + 1:
+            return
+        recent = list(self.recent_headers)[-(window + 1):]
+        actual = max(recent[-1][0] - recent[0][0], 1e-6)
+        expected = params.block_time_target * window
+        factor = min(max(actual / expected, 1 / RETARGET_MAX_FACTOR), RETARGET_MAX_FACTOR)
+        mean_target = sum(target for _, target in recent[1:]) // window
+        # Fixed-point scaling keeps all 256 bits of the target
+        new_target = min(MAX_TARGET, max(1, mean_target * round(factor * 2 ** 32) >> 32))
+        if new_target == params.mining_target:
+            return
+        
+        params.mining_target = new_target
+        self.mining_stats['difficulty_adjustments'] += 1
+        self.params_changed()
+
+    def params_changed(self):
+        """Call after mutating network_params so cached analytics are rebuilt"""
+        self.params_version += 1
+        self.emit('params', self.network_params.to_dict())
+
+    def get_network_analytics(self, miner_distribution=None, network_params=None):
+        """Get comprehensive network analytics; `miner_distribution` and `network_params` reuse existing copies"""
+        if miner_distribution is None:
+            miner_distribution = {miner: dict(stats) for miner, stats in self.miner_stats.items()}
+        if network_params is None:
+            network_params = self.network_params.to_dict()
+        return {
+            'network_params': network_params,
+            'mining_stats': dict(self.mining_stats),
+            'mempool_stats': dict(self.mempool_stats),
+            'decentralization_metrics': dict(self.decentralization_metrics),
+            'mempool_size': len(self.mempool),
+            'mempool_bytes': self.mempool.total_bytes,
+            'total_blocks': len(self.chain),
+            'total_transactions': self.mining_stats['total_transactions_processed'],
+            'average_block_size': self.chain_stats['total_block_size'] / len(self.chain) if len(self.chain) else 0,
+            'miner_distribution': miner_distribution
+        }
+
+    def analytics_version(self):
+        return f"{self._instance_token}-{len(self.chain)}-{self.mempool.version}-{self.params_version}"
+
+    def to_dict(self):
+        return [block.to_dict() for block in self.chain]
+
+    def block_heights(self, from_height=None, limit=None, descending=False, tip=None):
+        """Heights for one page of blocks up to `tip` (by default the live tip) and the cursor for the next page"""
+        if tip is None:
+            tip = len(self.chain) - 1
+        if descending:
+            start = tip if from_height is None else min(from_height, tip)
+            stop = -1 if limit is None else max(start - limit, -1)
+            return range(start, stop, -1), (stop if stop >= 0 else None)
+        start = 0 if from_height is None else max(from_height, 0)
+        stop = tip + 1 if limit is None else min(start + limit, tip + 1)
+        return range(start, stop), (stop if stop <= tip else None)
+
+    def iter_blocks(self, heights):
+        chain = self.chain
+        for height in heights:
+            yield chain[height]
+
+    @staticmethod
+    def transaction_record(txn, block_index):
+        if hasattr(txn, 'txid'):  # Transaction object
+            txn_dict = {
+                'txid': txn.txid,
+                'sender': txn.sender,
+                'recipient': txn.recipient,
+                'amount': txn.amount,
+                'fee': txn.fee,
+                'timestamp': txn.timestamp,
+                'block': block_index
+            }
+        else:  # Legacy transaction dict
+            txn_dict = txn.copy()
+            txn_dict['block'] = block_index
+        return txn_dict
+
+    def iter_transaction_history(self, blocks):
+        for block in blocks:
+            for txn in block.transactions:
+                yield self.transaction_record(txn, block.index)
+
+    def get_transaction_history(self):
+        return list(self.iter_transaction_history(self.chain))
+
+    def confirmed_location(self, key, tip=None):
+        """(block index, position) of a raw txid confirmed at or below `tip`, or None"""
+        location = self.tx_index.get(key)
+        if location is None or (tip is not None and location[0] > tip):
+            return None
+        return location
+
+    def get_transaction(self, txid, mempool=None, tip=None):
+        """Look up one transaction by hex txid, confirmed up to `tip` or pending in `mempool` (by default the live ones)"""
+        key = txid_key(txid)
+        location = self.confirmed_location(key, tip)
+        if location is not None:
+            block_index, position = location
+            record = self.transaction_record(self.chain[block_index].transactions[position], block_index)
+            record['position'] = position
+            record['confirmations'] = (len(self.chain) - 1 if tip is None else tip) - block_index + 1
+            record['status'] = 'confirmed'
+            return record
+        
+        pending = (self.mempool if mempool is None else mempool).get(key)
+        if pending is not None:
+            record = self.transaction_record(pending, None)
+            record['confirmations'] = 0
+            record['status'] = 'pending'
+            return record
+        return None
+
+    def get_merkle_proof(self, txid, tip=None):
+        """Path from a transaction confirmed up to `tip` to its block's Merkle root, or None with the reason"""
+        location = self.confirmed_location(txid_key(txid), tip)
+        if location is None:
+            return None, "Transaction not found in a block"
+        block_index, position = location
+        block = self.chain[block_index]
+        if block.version < 3:
+            return None, "Block predates Merkle commitments"
+        return {
+            'txid': txid,
+            'block_index': block_index,
+            'block_hash': block.hash,
+            'merkle_root': block.merkle_root,
+            'position': position,
+            'path': proof_path(self.merkle_cache.get(block), position)
+        }, None
+
+    def get_address_transactions(self, address, offset=0, limit=50, tip=None):
+        """Transactions touching an address confirmed up to `tip`, oldest first"""
+        locations = self.address_index.get(address, [])
+        # Locations are appended in block order, so the ones up to `tip` are a prefix
+        total = len(locations) if tip is None else bisect_right(locations, tip, key=lambda location: location[0])
+        return total, [
+            self.transaction_record(self.chain[block_index].transactions[position], block_index)
+            for block_index, position in locations[offset:min(offset + limit, total)]
+        ]
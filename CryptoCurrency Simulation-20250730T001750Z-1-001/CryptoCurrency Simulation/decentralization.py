@@ -0,0 +1,157 @@
+"""Incrementally maintained decentralization metrics.
+
+Miner rewards are kept in an order-statistic treap keyed by (reward, miner).
+Each node carries its subtree size and reward sum, which gives the rank of a
+miner and the total reward above it in O(log n). With the rewards sorted
+ascending as x_1..x_n, the metrics only need three running sums:
+
+    S = sum x_i        Q = sum x_i^2        W = sum i * x_i
+
+    HHI  = Q / S^2
+    Gini = sum (2i - n - 1) x_i / (n S) = (2W - (n + 1) S) / (n S)
+
+Moving one miner's reward from rank r to a new rank only shifts the ranks of
+the miners in between, so W is patched with the reward sum above each key
+instead of re-summing the whole distribution.
+"""
+import random
+
+# Node layout: [key, priority, left, right, size, reward_sum]
+KEY, PRIORITY, LEFT, RIGHT, SIZE, SUM = range(6)
+
+
+def _size(node):
+    return node[SIZE] if node else 0
+
+
+def _sum(node):
+    return node[SUM] if node else 0.0
+
+
+def _update(node):
+    node[SIZE] = 1 + _size(node[LEFT]) + _size(node[RIGHT])
+    node[SUM] = node[KEY][0] + _sum(node[LEFT]) + _sum(node[RIGHT])
+
+
+def _split(node, key, inclusive):
+    """Split into (keys < key, keys >= key), or (<=, >) when inclusive"""
+    if node is None:
+        return None, None
+    goes_left = node[KEY] <= key if inclusive else node[KEY] < key
+    if goes_left:
+        left, right = _split(node[RIGHT], key, inclusive)
+        node[RIGHT] = left
+        _update(node)
+        return node, right
+    left, right = _split(node[LEFT], key, inclusive)
+    node[LEFT] = right
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left[PRIORITY] > right[PRIORITY]:
+        left[RIGHT] = _merge(left[RIGHT], right)
+        _update(left)
+        return left
+    right[LEFT] = _merge(left, right[LEFT])
+    _update(right)
+    return right
+
+
+class RewardDistribution:
+    """Rewards per miner with O(log n) updates of the Gini, HHI and top-k inputs"""
+
+    def __init__(self, seed=0):
+        self._root = None
+        self._rewards = {}  # miner -> current reward
+        self._random = random.Random(seed)
+        self.total = 0.0         # S
+        self.sum_squares = 0.0   # Q
+        self.weighted_sum = 0.0  # W, ranks ascending from 1
+
+    def __len__(self):
+        return len(self._rewards)
+
+    def add(self, miner, amount):
+        """Change a miner's reward by `amount`; miners that drop to zero leave the distribution"""
+        old = self._rewards.pop(miner, None)
+        if old is not None:
+            self._remove((old, miner))
+        reward = (old or 0.0) + amount
+        if reward > 0:
+            self._insert((reward, miner))
+            self._rewards[miner] = reward
+        elif not self._rewards:
+            # Nothing left: drop the rounding error accumulated by the running sums
+            self.total = self.sum_squares = self.weighted_sum = 0.0
+
+    def _rank(self, key):
+        """(count, reward sum) of keys strictly below `key`"""
+        count, below = 0, 0.0
+        node = self._root
+        while node is not None:
+            if node[KEY] < key:
+                count += 1 + _size(node[LEFT])
+                below += node[KEY][0] + _sum(node[LEFT])
+                node = node[RIGHT]
+            else:
+                node = node[LEFT]
+        return count, below
+
+    def _insert(self, key):
+        reward = key[0]
+        count, below = self._rank(key)
+        # The new key takes rank count + 1 and pushes everything above it up one
+        self.weighted_sum += (count + 1) * reward + (self.total - below)
+        self.total += reward
+        self.sum_squares += reward * reward
+        left, right = _split(self._root, key, False)
+        node = [key, self._random.random(), None, None, 1, reward]
+        self._root = _merge(_merge(left, node), right)
+
+    def _remove(self, key):
+        reward = key[0]
+        count, below = self._rank(key)
+        self.weighted_sum -= (count + 1) * reward + (self.total - below - reward)
+        self.total -= reward
+        self.sum_squares -= reward * reward
+        left, rest = _split(self._root, key, False)
+        _, right = _split(rest, key, True)
+        self._root = _merge(left, right)
+
+    def top_sum(self, k):
+        """Total reward of the k best-paid miners"""
+        total, taken = 0.0, 0
+        stack, node = [], self._root
+        while (stack or node is not None) and taken < k:
+            while node is not None:
+                stack.append(node)
+                node = node[RIGHT]
+            node = stack.pop()
+            total += node[KEY][0]
+            taken += 1
+            node = node[LEFT]
+        return total
+
+    def gini(self):
+        n, total = len(self._rewards), self.total
+        if n < 2 or total <= 0:
+            return 0
+        # Clamped because the running sums carry floating-point rounding
+        return min(1.0, max(0.0, (2 * self.weighted_sum - (n + 1) * total) / (n * total)))
+
+    def herfindahl(self):
+        if self.total <= 0:
+            return 0
+        return self.sum_squares / (self.total * self.total)
+
+    def top_concentration(self, k=3):
+        """Percentage of all rewards earned by the top k miners"""
+        if self.total <= 0:
+            return 0
+        return min(100.0, self.top_sum(k) / self.total * 100)
@@ -0,0 +1,63 @@
+"""In-process event bus feeding the /events server-sent event stream."""
+import threading
+from collections import deque
+from uuid import uuid4
+
+HISTORY_SIZE = 1000
+
+
+class EventBus:
+    """Numbered events kept in a bounded history.
+
+    Subscribers remember the last id they saw and ask for everything after it,
+    which is what lets an SSE client resume with Last-Event-ID. A client that
+    falls further behind than the history is told to reset and refetch.
+
+    Ids restart at 1 in every process, so the ids sent to clients carry a
+    per-process epoch ("<epoch>-<id>"). An id from an earlier process, such
+    as a client reconnecting across a server restart, also means reset.
+    """
+
+    def __init__(self, history=HISTORY_SIZE):
+        self._events = deque(maxlen=history)  # (id, type, data)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self.epoch = uuid4().hex[:8]
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def format_id(self, event_id):
+        return f"{self.epoch}-{event_id}"
+
+    def parse_id(self, text):
+        """The id in a client's Last-Event-ID, or None if this process did not issue it"""
+        epoch, _, number = str(text).rpartition('-')
+        if epoch != self.epoch or not number.isdigit() or int(number) > self._last_id:
+            return None
+        return int(number)
+
+    def publish(self, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._condition.notify_all()
+
+    def since(self, last_id, timeout=None):
+        """Wait up to `timeout` for events newer than `last_id`.
+
+        Returns (reset, events); `reset` is True when events after `last_id`
+        have already dropped out of the history, or when `last_id` was never
+        issued (it is ahead of the newest event).
+        """
+        with self._condition:
+            if last_id > self._last_id:
+                return True, list(self._events)
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+            if not self._events or self._last_id <= last_id:
+                return False, []
+            oldest = self._events[0][0]
+            if last_id < oldest - 1:
+                return True, list(self._events)
+            return False, [event for event in self._events if event[0] > last_id]
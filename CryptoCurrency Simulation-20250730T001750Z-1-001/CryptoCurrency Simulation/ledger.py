@@ -0,0 +1,241 @@
+"""Single-writer access to a Blockchain from many request threads.
+
+Every mutation is queued to one writer thread, which owns the Blockchain and
+applies commands one at a time. After draining the queue it publishes a
+LedgerSnapshot: an immutable view of the tip, balances, mempool and analytics
+that readers use without taking any lock. A snapshot is published before the
+commands that produced it return, so a caller always reads its own writes.
+
+Mining is split so the writer is never busy searching nonces: the writer
+builds a template, a mining job's thread runs the proof of work (see
+mining_jobs), and the writer commits the block, or rejects it if the tip or
+the mempool moved on meanwhile.
+"""
+import json
+import queue
+import threading
+from collections.abc import Mapping
+from concurrent.futures import Future
+from math import isqrt
+
+
+# A snapshot's balances and mempool carry up to this many changes per square
+# root of their size on top of an earlier copy; the next snapshot then copies
+# afresh. Copying the changes costs O(changes) per batch and a fresh copy
+# O(size) per limit's worth of changes, so both stay near O(sqrt(size)).
+OVERLAY_CHANGES_PER_ROOT = 4
+MIN_OVERLAY_CHANGES = 256
+
+
+def overlay_limit(size):
+    return max(MIN_OVERLAY_CHANGES, OVERLAY_CHANGES_PER_ROOT * isqrt(size))
+
+
+class BalancesView(Mapping):
+    """Read-only balances: a copy taken at an earlier batch plus the balances set since"""
+
+    def __init__(self, source, base, changes):
+        self._source = source  # the live Balances; only the writer looks at it
+        self._base = base
+        self._changes = changes
+        self._merged = None if changes else base
+
+    @classmethod
+    def publish(cls, balances, previous):
+        """View of `balances` now, sharing what it can with the `previous` view"""
+        changed = balances.take_changes()
+        if (previous is None or previous._source is not balances or
+                len(previous._changes) + len(changed) > overlay_limit(len(balances))):
+            return cls(balances, dict(balances), {})
+        if not changed:
+            return previous
+        changes = dict(previous._changes)
+        for address in changed:
+            changes[address] = balances[address]
+        return cls(balances, previous._base, changes)
+
+    def __getitem__(self, address):
+        if address in self._changes:
+            return self._changes[address]
+        return self._base[address]
+
+    def __contains__(self, address):
+        return address in self._changes or address in self._base
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def to_dict(self):
+        """Every balance in one dict, merged on first use"""
+        if self._merged is None:
+            self._merged = {**self._base, **self._changes}
+        return self._merged
+
+
+class MempoolView:
+    """Read-only mempool: a frozen copy taken at an earlier batch plus the transactions added or removed since.
+
+    Lookups, len() and total_bytes come straight from the overlay. page(),
+    select() and iteration need fee-rate order, so the first of them applies
+    the changes to a copy of the base, once per view.
+    """
+
+    def __init__(self, source, base, changes):
+        self._source = source  # the live Mempool; only the writer looks at it
+        self._base = base
+        self._changes = changes
+        self._merged = None if changes else base
+        self._length = len(source)
+        self.total_bytes = source.total_bytes
+        self.version = source.version
+
+    @classmethod
+    def publish(cls, mempool, previous):
+        """View of `mempool` now, sharing what it can with the `previous` view"""
+        changes = mempool.take_changes()
+        if (previous is None or previous._source is not mempool or
+                len(previous._changes) + len(changes) > overlay_limit(len(mempool))):
+            return cls(mempool, mempool.frozen_copy(), {})
+        if not changes:
+            return previous
+        merged = dict(previous._changes)
+        merged.update(changes)
+        return cls(mempool, previous._base, merged)
+
+    def get(self, txid):
+        if txid in self._changes:
+            return self._changes[txid]
+        return self._base.get(txid)
+
+    def __contains__(self, txid):
+        return self.get(txid) is not None
+
+    def __len__(self):
+        return self._length
+
+    def merged(self):
+        if self._merged is None:
+            self._merged = self._base.with_changes(self._changes, self.version)
+        return self._merged
+
+    def __iter__(self):
+        return iter(self.merged())
+
+    def page(self, offset=0, limit=None):
+        return self.merged().page(offset, limit)
+
+    def select(self, size_limit, max_count):
+        return self.merged().select(size_limit, max_count)
+
+
+class LedgerSnapshot:
+    """Ledger state as of one writer batch; treat every attribute as read-only.
+
+    Publishing one costs far less than copying the ledger. The balances and
+    the mempool are views over a copy taken at an earlier batch plus what
+    changed since (see overlay_limit). The miner distribution is shared with
+    the previous snapshot until a block is added, and the parameters until
+    they change.
+    """
+
+    def __init__(self, blockchain, previous=None):
+        self.height = len(blockchain.chain) - 1
+        self.tip = blockchain.get_last_block()
+        self.version = blockchain.analytics_version()
+        self.params_version = blockchain.params_version
+        self.balances = BalancesView.publish(blockchain.balances, previous and previous.balances)
+        self.mempool = MempoolView.publish(blockchain.mempool, previous and previous.mempool)
+        miner_distribution = network_params = None
+        if previous is not None and previous.height == self.height:
+            miner_distribution = previous.analytics['miner_distribution']
+        if previous is not None and previous.params_version == self.params_version:
+            network_params = previous.analytics['network_params']
+        self.analytics = blockchain.get_network_analytics(miner_distribution, network_params)
+        self.analytics['version'] = self.version
+        self._analytics_json = None
+
+    def analytics_json(self):
+        """Serialized analytics, encoded once per snapshot"""
+        if self._analytics_json is None:
+            self._analytics_json = json.dumps(self.analytics).encode()
+        return self._analytics_json
+
+
+class Ledger:
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self._queue = queue.Queue()
+        self.snapshot = LedgerSnapshot(blockchain)
+        self._writer = threading.Thread(target=self._run, name='ledger-writer', daemon=True)
+        self._writer.start()
+
+    # ------------------------
+    # Writer
+    # ------------------------
+    def submit(self, function, *args, **kwargs):
+        """Queue `function(*args, **kwargs)` for the writer; returns a Future of its result"""
+        future = Future()
+        self._queue.put((function, args, kwargs, future))
+        return future
+
+    def call(self, function, *args, **kwargs):
+        """Run `function` on the writer thread and wait for its result"""
+        if threading.current_thread() is self._writer:
+            return function(*args, **kwargs)
+        return self.submit(function, *args, **kwargs).result()
+
+    def _run(self):
+        while True:
+            commands = [self._queue.get()]
+            while True:
+                try:
+                    commands.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            done = []
+            stopping = False
+            for command in commands:
+                if command is None:
+                    stopping = True
+                    continue
+                function, args, kwargs, future = command
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    done.append((future, True, function(*args, **kwargs)))
+                except BaseException as error:
+                    done.append((future, False, error))
+
+            if done:
+                self.snapshot = LedgerSnapshot(self.blockchain, self.snapshot)
+            for future, ok, outcome in done:
+                if ok:
+                    future.set_result(outcome)
+                else:
+                    future.set_exception(outcome)
+            if stopping:
+                return
+
+    def close(self):
+        """Checkpoint through the writer, then stop it"""
+        if not self._writer.is_alive():
+            return
+        self.call(self.blockchain.save_checkpoint)
+        self._queue.put(None)
+        self._writer.join()
+
+    # ------------------------
+    # Mutations
+    # ------------------------
+    def add_transaction(self, sender, recipient, amount, fee=None, replaces=None):
+        return self.call(self.blockchain.add_transaction, sender, recipient, amount, fee, replaces=replaces)
+
+    def add_transactions(self, batch):
+        return self.call(self.blockchain.add_transactions, batch)
+
+    def open_accounts(self, balances):
+        return self.call(self.blockchain.open_accounts, balances)
@@ -0,0 +1,306 @@
+"""Pending-transaction pool keyed by txid, with fee rate and size held in NumPy columns."""
+import time
+from collections import deque
+from itertools import count
+
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+# Cheapest transactions ranked per pass when looking for eviction victims
+EVICTION_BATCH = 64
+# Fee rates sampled to estimate the cutoff of a block's best candidates
+CUTOFF_SAMPLE = 16384
+
+
+class Mempool:
+    """Transactions waiting to be mined.
+
+    Each pending transaction owns a slot. Its size, fee rate and arrival
+    sequence sit at that slot in NumPy arrays (a free slot's rate is -inf),
+    and a dict maps the raw 32-byte txid to the slot. Slots freed by mined or
+    evicted transactions are reused.
+
+    Fee-rate order (highest fee per byte first, earlier arrivals first among
+    equals) is not maintained on every insert. It is computed from the
+    columns when needed: select() cuts out the best candidates with a fee
+    rate threshold estimated from a sample and sorts only those, eviction
+    ranks only the cheapest few, and a full ranking for iteration and paging
+    is cached until the pool changes. Arrival times are queued separately so
+    expiry only looks at the oldest entries.
+    """
+
+    def __init__(self):
+        self._slots = {}          # txid -> slot
+        self._transactions = []   # slot -> Transaction, None when free
+        self._free = []           # released slots
+        self._size = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._rate = np.full(INITIAL_CAPACITY, -np.inf)
+        self._sequence_column = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._live = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._arrivals = deque()  # (arrival time, txid), oldest first
+        self._sequence = count()
+        self._ranking = None      # slots best-first, valid for `version`
+        self._changes = None      # txid -> tx added or None removed since take_changes(); None until asked
+        self.total_bytes = 0
+        self.version = 0  # bumped on every change, so readers can tell when to refresh
+
+    @staticmethod
+    def fee_rate(tx):
+        return tx.fee / tx.size if tx.size else 0.0
+
+    def _grow(self):
+        capacity = 2 * len(self._size)
+        for name in ('_size', '_rate', '_sequence_column', '_live'):
+            column = getattr(self, name)
+            grown = np.full(capacity, -np.inf) if name == '_rate' else np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def add(self, tx, arrival=None):
+        if self._free:
+            slot = self._free.pop()
+            self._transactions[slot] = tx
+        else:
+            slot = len(self._transactions)
+            if slot == len(self._size):
+                self._grow()
+            self._transactions.append(tx)
+        self._slots[tx.id] = slot
+        self._size[slot] = tx.size
+        self._rate[slot] = self.fee_rate(tx)
+        self._sequence_column[slot] = next(self._sequence)
+        self._live[slot] = True
+        self._arrivals.append((arrival if arrival is not None else time.time(), tx.id))
+        self.total_bytes += tx.size
+        self.version += 1
+        if self._changes is not None:
+            self._changes[tx.id] = tx
+        # Entries for mined or evicted transactions linger until they reach the
+        # front of the arrival queue; compact when they dominate it.
+        if len(self._arrivals) > 2 * len(self._slots) + 1024:
+            self._arrivals = deque(entry for entry in self._arrivals if entry[1] in self._slots)
+
+    def remove(self, txid):
+        """Drop a transaction by its raw id; returns it, or None if it was not pending."""
+        slot = self._slots.pop(txid, None)
+        if slot is None:
+            return None
+        tx = self._transactions[slot]
+        self._transactions[slot] = None
+        self._live[slot] = False
+        self._rate[slot] = -np.inf
+        self._size[slot] = 0
+        self._free.append(slot)
+        self.total_bytes -= tx.size
+        self.version += 1
+        if self._changes is not None:
+            self._changes[txid] = None
+        return tx
+
+    def expire(self, cutoff):
+        """Remove and return every transaction that arrived before `cutoff`"""
+        expired = []
+        arrivals = self._arrivals
+        while arrivals and arrivals[0][0] < cutoff:
+            _, txid = arrivals.popleft()
+            tx = self.remove(txid)
+            if tx is not None:
+                expired.append(tx)
+        return expired
+
+    # ------------------------
+    # Ranking
+    # ------------------------
+    def _rank(self, slots):
+        """`slots` ordered best-first: fee rate descending, then arrival"""
+        return slots[np.lexsort((self._sequence_column[slots], -self._rate[slots]))]
+
+    def ranking(self):
+        """Every pending slot, best-first; cached until the pool changes"""
+        if self._ranking is None or self._ranking[0] != self.version:
+            self._ranking = (self.version, self._rank(np.flatnonzero(self._live)))
+        return self._ranking[1]
+
+    def _cheapest(self, needed):
+        """At least `needed` of the cheapest slots (all of them if fewer), cheapest first"""
+        live = np.flatnonzero(self._live)
+        if needed < len(live):
+            rates = self._rate[live]
+            cutoff = np.partition(rates, needed)[needed]
+            live = live[rates <= cutoff]  # keeps ties at the cutoff, so the order below is exact
+        return self._rank(live)[::-1]
+
+    def eviction_candidates(self, tx, max_bytes, max_count, replacing=None,
+                            pending_count=0, pending_bytes=0, evicting=()):
+        """Cheapest transactions that must leave for `tx` to fit within the limits.
+
+        `replacing` is a pending txid that `tx` will replace, whose space counts
+        as free. Returns a (possibly empty) list without modifying the pool, or
+        None if `tx` cannot fit or does not pay a higher fee rate than every
+        transaction it would push out.
+
+        Batches admit several transactions before touching the pool: the
+        `pending_*` arguments are the net growth already promised to earlier
+        members, and `evicting` holds the txids already chosen to make room.
+        """
+        if tx.size > max_bytes:
+            return None
+        freed = self.get(replacing)
+        excess_count = len(self._slots) + pending_count + 1 - max_count
+        excess_bytes = self.total_bytes + pending_bytes + tx.size - max_bytes
+        if freed is not None:
+            excess_count -= 1
+            excess_bytes -= freed.size
+        if excess_count <= 0 and excess_bytes <= 0:
+            return []
+
+        fee_rate = self.fee_rate(tx)
+        needed = EVICTION_BATCH + len(evicting) + 1
+        while True:
+            candidates = self._cheapest(needed)
+            victims = []
+            shortfall_count, shortfall_bytes = excess_count, excess_bytes
+            for slot in candidates.tolist():
+                if shortfall_count <= 0 and shortfall_bytes <= 0:
+                    return victims
+                victim = self._transactions[slot]
+                if victim.id == replacing or victim.id in evicting:
+                    continue
+                if self.fee_rate(victim) >= fee_rate:
+                    return None
+                victims.append(victim)
+                shortfall_count -= 1
+                shortfall_bytes -= victim.size
+            if shortfall_count <= 0 and shortfall_bytes <= 0:
+                return victims
+            if len(candidates) == len(self._slots):
+                return None
+            needed *= 4
+
+    def frozen_copy(self):
+        """Point-in-time copy for concurrent readers.
+
+        Only lookups, len(), iteration, page() and select() are meaningful on
+        the copy; it shares the (immutable) transactions with this pool.
+        """
+        copy = Mempool.__new__(Mempool)
+        copy._slots = dict(self._slots)
+        copy._transactions = list(self._transactions)
+        copy._free = None
+        copy._size = self._size.copy()
+        copy._rate = self._rate.copy()
+        copy._sequence_column = self._sequence_column.copy()
+        copy._live = self._live.copy()
+        copy._arrivals = None
+        copy._sequence = None
+        copy._ranking = self._ranking
+        copy._changes = None
+        copy.total_bytes = self.total_bytes
+        copy.version = self.version
+        return copy
+
+    def take_changes(self):
+        """Transactions added (txid -> tx) or removed (txid -> None) since the previous call.
+
+        Recording starts with the first call, which returns nothing.
+        """
+        changes, self._changes = self._changes or {}, {}
+        return changes
+
+    def with_changes(self, changes, version):
+        """Frozen copy of this (frozen) pool with `changes`, as take_changes() returns them, applied.
+
+        Added transactions arrived after everything in this pool, in the
+        order of `changes`, so they rank after its entries of equal fee rate.
+        """
+        copy = self.frozen_copy()
+        live = self._sequence_column[self._live]
+        copy._sequence = count(int(live.max()) + 1 if len(live) else 0)
+        copy._free, copy._arrivals = [], deque()
+        for txid, tx in changes.items():
+            copy.remove(txid)
+            if tx is not None:
+                copy.add(tx, arrival=0.0)
+        copy._free = copy._arrivals = copy._sequence = None
+        copy.version = version
+        return copy
+
+    def get(self, txid):
+        slot = self._slots.get(txid)
+        return None if slot is None else self._transactions[slot]
+
+    def __contains__(self, txid):
+        return txid in self._slots
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        transactions = self._transactions
+        for slot in self.ranking().tolist():
+            yield transactions[slot]
+
+    def page(self, offset=0, limit=None):
+        """Slice of the pool in fee-rate order"""
+        stop = None if limit is None else offset + limit
+        transactions = self._transactions
+        return [transactions[slot] for slot in self.ranking()[offset:stop].tolist()]
+
+    def select(self, size_limit, max_count):
+        """Best-paying transactions that fit within a block's size and count limits.
+
+        Takes transactions best-first and skips any that no longer fit, like
+        filling the block one at a time, but a run of transactions that fit
+        is taken with one cumulative sum.
+        """
+        pending = len(self._slots)
+        if self._ranking is not None and self._ranking[0] == self.version:
+            ranked = self._ranking[1]
+        elif 4 * max_count < pending:
+            # Only the best few can make the block: rank those, and fall back
+            # to the full ranking if skipped transactions leave room unused
+            ranked = self._rank(self._best(2 * max_count))
+        else:
+            ranked = self.ranking()
+
+        chosen, current_size = self._fill(ranked, size_limit, max_count)
+        if sum(map(len, chosen)) < max_count and current_size < size_limit and len(ranked) < pending:
+            chosen, current_size = self._fill(self.ranking(), size_limit, max_count)
+        transactions = self._transactions
+        return [transactions[slot] for part in chosen for slot in part.tolist()], current_size
+
+    def _best(self, needed):
+        """Pending slots of at least `needed` of the best-paying transactions (fewer than are pending), unordered"""
+        live = np.flatnonzero(self._live)
+        rates = self._rate[live]
+        # Estimate the fee rate the best `needed` clear from an even sample,
+        # aiming at twice as many; only a short sample pays for a partition
+        sample = rates[::max(1, len(rates) // CUTOFF_SAMPLE)]
+        share = 2 * needed / len(live)
+        if share < 0.5:
+            position = int(len(sample) * (1 - share))
+            cutoff = np.partition(sample, position)[position]
+            best = live[rates >= cutoff]
+            if len(best) >= needed:
+                return best
+        position = len(rates) - needed
+        return live[rates >= np.partition(rates, position)[position]]
+
+    def _fill(self, ranked, size_limit, max_count):
+        """Runs of `ranked` (pending slots, best-first) that fill a block, and their total size"""
+        chosen, taken, current_size = [], 0, 0
+        rest = ranked
+        while rest.size and taken < max_count and current_size < size_limit:
+            sizes = self._size[rest]
+            room = size_limit - current_size
+            fitting = np.flatnonzero(sizes <= room)
+            if not fitting.size:
+                break
+            first = fitting[0]
+            running = np.cumsum(sizes[first:])
+            run = min(int(np.searchsorted(running, room, side='right')), max_count - taken)
+            chosen.append(rest[first:first + run])
+            current_size += int(running[run - 1])
+            taken += run
+            rest = rest[first + run:]
+        return chosen, current_size
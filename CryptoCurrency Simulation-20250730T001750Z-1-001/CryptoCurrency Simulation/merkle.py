@@ -0,0 +1,96 @@
+"""Merkle trees over block transactions.
+
+Leaves and interior nodes are hashed with different one-byte prefixes, as in
+RFC 6962, so an interior node can never pass for a transaction:
+
+    leaf = sha256(0x00 | txid)
+    node = sha256(0x01 | left | right)
+
+A node with no sibling is carried up to the next level unchanged. Bitcoin
+pairs it with a copy of itself instead, which lets two different transaction
+lists share a root. The root of a block with no transactions is sha256(b"").
+
+An inclusion proof is the sibling hash at every level where the node has
+one, each tagged with the side it sits on. Checking it takes one hash per
+level, O(log n), and needs nothing from the block but its header.
+"""
+import threading
+from collections import OrderedDict
+from hashlib import sha256
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+EMPTY_ROOT = sha256(b'').digest()
+
+
+def leaf_hash(data):
+    return sha256(LEAF_PREFIX + data).digest()
+
+
+def node_hash(left, right):
+    return sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_levels(leaves):
+    """Every level of the tree, leaf hashes first and the root last, as lists of raw digests"""
+    level = [leaf_hash(data) for data in leaves]
+    if not level:
+        return [[EMPTY_ROOT]]
+    levels = [level]
+    while len(level) > 1:
+        paired = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        levels.append(paired)
+        level = paired
+    return levels
+
+
+def merkle_root(leaves):
+    return build_levels(leaves)[-1][0].hex()
+
+
+def proof_path(levels, position):
+    """Sibling hashes from the leaf at `position` up to the root"""
+    path = []
+    for level in levels[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            path.append({'hash': level[sibling].hex(), 'side': 'left' if sibling < position else 'right'})
+        position //= 2
+    return path
+
+
+def verify_proof(data, path, root):
+    """True if leaf `data` (a transaction's raw txid) and `path` hash up to the hex `root`"""
+    node = leaf_hash(data)
+    for step in path:
+        sibling = bytes.fromhex(step['hash'])
+        node = node_hash(sibling, node) if step['side'] == 'left' else node_hash(node, sibling)
+    return node.hex() == root
+
+
+class MerkleCache:
+    """Tree levels of recently used blocks, keyed by block hash, least recently used evicted first"""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._levels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, block):
+        with self._lock:
+            levels = self._levels.get(block.hash)
+            if levels is not None:
+                self._levels.move_to_end(block.hash)
+                return levels
+        levels = block.merkle_levels()
+        self.put(block.hash, levels)
+        return levels
+
+    def put(self, block_hash, levels):
+        with self._lock:
+            self._levels[block_hash] = levels
+            self._levels.move_to_end(block_hash)
+            while len(self._levels) > self.capacity:
+                self._levels.popitem(last=False)
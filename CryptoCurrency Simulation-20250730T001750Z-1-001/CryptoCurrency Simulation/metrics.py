@@ -0,0 +1,191 @@
+"""Counters, gauges and histograms exposed at /metrics in the Prometheus text format.
+
+Instrumented code records once per request, block template, nonce-search
+round or block, never per hash or per transaction, so an update costs about
+a microsecond. Updates to a disabled registry return at once. A gauge can
+be given a function instead of being set; it is read only when /metrics is
+scraped, so values kept elsewhere anyway (mempool size, chain height) cost
+nothing between scrapes.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Seconds; request latencies and other short operations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds between consecutive blocks
+BLOCK_INTERVAL_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 60, 120, 300, 600, 1800, 3600)
+# Seconds of nonce-search history behind a measured hash rate
+HASHRATE_WINDOW = 10.0
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, description, labels=()):
+        self.registry = registry
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{format_labels(self.labels, labels)} {format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, labels=()):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, registry, name, description, labels=(), function=None):
+        super().__init__(registry, name, description, labels)
+        self.function = function
+
+    def set(self, value, labels=()):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        if self.function is not None:
+            with self._lock:
+                self._values[()] = self.function()
+        return super().render()
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, exposed cumulatively with their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        if not self.registry.enabled:
+            return
+        bucket = bisect_left(self.buckets, value)  # first bound >= value; past the end is +Inf
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = [(labels, list(series)) for labels, series in self._values.items()]
+        for labels, series in values:
+            cumulative = 0
+            for bound, observed in zip(self.buckets + (float('inf'),), series):
+                cumulative += observed
+                le = 'le="' + format_value(float(bound)) + '"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, labels)} {format_value(series[-1])}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, labels)} {cumulative}')
+        return lines
+
+
+class HashrateMeter:
+    """Hashes per second over the last `window` seconds of nonce searching.
+
+    Searches are recorded as rounds of (hashes, seconds taken). Rounds from
+    concurrent searches add up. Until the window is full, the rate is taken
+    over the time since the oldest round began, so a search that only just
+    started is not diluted by the idle time before it.
+    """
+
+    def __init__(self, window=HASHRATE_WINDOW):
+        self.window = window
+        self._rounds = deque()  # (finished, started, hashes) in monotonic seconds, oldest first
+        self._hashes = 0
+        self._lock = threading.Lock()
+
+    def record(self, hashes, seconds, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._rounds.append((now, now - seconds, hashes))
+            self._hashes += hashes
+            self._expire(now)
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            if not self._rounds:
+                return 0.0
+            span = min(self.window, now - self._rounds[0][1])
+            return self._hashes / span if span > 0 else 0.0
+
+    def _expire(self, now):
+        rounds = self._rounds
+        while rounds and rounds[0][0] < now - self.window:
+            self._hashes -= rounds.popleft()[2]
+
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}  # name -> metric, in registration order
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering a name (a module imported twice) keeps the first metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, description, labels=()):
+        return self._register(Counter(self, name, description, labels))
+
+    def gauge(self, name, description, labels=(), function=None):
+        return self._register(Gauge(self, name, description, labels, function))
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, description, labels, buckets))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
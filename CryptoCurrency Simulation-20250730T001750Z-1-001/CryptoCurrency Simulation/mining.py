@@ -0,0 +1,165 @@
+"""Proof-of-work engine.
+
+A block header is packed into fixed-width bytes so that one hash attempt costs
+the same no matter how many transactions the block carries:
+
+    version (uint32) | previous_hash (32 bytes) | merkle_root (32 bytes)
+    | timestamp (float64) | target (32 bytes) | nonce (uint64)
+
+Everything before the nonce is constant while searching, so it is fed into
+SHA-256 once and the resulting state is copied for each nonce (the "midstate").
+
+A block is valid when its digest, read as a 256-bit big-endian integer, is at
+most the target. The search compares the raw 32-byte digest against the
+target's 32-byte encoding, which orders exactly like the integers. Version 1
+headers carried a whole number of leading hex zeros (uint32) instead of the
+target; they still hash as they did. Before version 3 the root field held a
+flat hash of the concatenated txids rather than a Merkle root (see merkle.py).
+Version 4 keeps the layout; only the txids under the root changed, from
+hashes of JSON to hashes of the binary transaction encoding.
+"""
+import atexit
+import math
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+from hashlib import sha256
+
+HEADER_VERSION = 4
+HEADER_PREFIX = struct.Struct('>I32s32sd32s')
+LEGACY_HEADER_PREFIX = struct.Struct('>I32s32sdI')  # version 1: difficulty in hex zeros
+NONCE = struct.Struct('>Q')
+HEADER_SIZE = HEADER_PREFIX.size + NONCE.size
+MAX_NONCE = 2 ** 64 - 1
+MAX_TARGET = 2 ** 256 - 1
+MAX_DIFFICULTY = 64
+# Nonces in one task of a parallel search; a search that has ended leaves
+# at most one such task per worker to run out
+PARALLEL_CHUNK = 1 << 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_to_bytes(hex_hash):
+    """Convert a hex digest to 32 raw bytes (short values such as the genesis "0" are left-padded)."""
+    return bytes.fromhex(hex_hash.rjust(64, '0'))
+
+
+def pack_header_prefix(version, previous_hash, merkle_root, timestamp, target):
+    """Pack every header field except the nonce."""
+    if version < 2:
+        return LEGACY_HEADER_PREFIX.pack(version, hash_to_bytes(previous_hash), hash_to_bytes(merkle_root),
+                                         timestamp, round(target_to_difficulty(target)))
+    return HEADER_PREFIX.pack(
+        version,
+        hash_to_bytes(previous_hash),
+        hash_to_bytes(merkle_root),
+        timestamp,
+        target.to_bytes(32, 'big')
+    )
+
+
+def difficulty_to_target(difficulty):
+    """Target equivalent to `difficulty` leading hex zeros; fractional difficulties fall in between."""
+    difficulty = max(0.0, min(float(difficulty), MAX_DIFFICULTY))
+    if difficulty == int(difficulty):  # exact for whole numbers of hex zeros
+        return (1 << (256 - 4 * int(difficulty))) - 1
+    return max(0, int(2.0 ** (256 - 4 * difficulty)) - 1)
+
+
+def target_to_difficulty(target):
+    """Equivalent number of leading hex zeros: log16 of the expected work"""
+    return max(0.0, math.log2(expected_hashes(target)) / 4)
+
+
+def expected_hashes(target):
+    """Average number of attempts to find a digest <= target"""
+    return 2 ** 256 / (min(max(int(target), 0), MAX_TARGET) + 1)
+
+
+def hash_header(prefix, nonce):
+    return sha256(prefix + NONCE.pack(nonce)).hexdigest()
+
+
+def search_nonce(prefix, target, start=0, stop=MAX_NONCE + 1):
+    """Scan nonces in [start, stop) for a header hash <= target (a 256-bit integer).
+
+    Returns (nonce, hex_hash) for the first match, or None if the range is exhausted.
+    """
+    target = target.to_bytes(32, 'big')
+    midstate = sha256(prefix)
+    pack = NONCE.pack
+    for nonce in range(start, stop):
+        attempt = midstate.copy()
+        attempt.update(pack(nonce))
+        digest = attempt.digest()
+        if digest <= target:
+            return nonce, digest.hex()
+    return None
+
+
+def resolve_workers(workers):
+    """Translate a configured worker count into a process count (0 or None means one per CPU)."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def start_search_pool(processes=None):
+    """Start the worker pool that parallel searches share, one process per CPU by default.
+
+    The workers are created once and reused by every search. Forking is
+    only safe while no other thread can hold a lock, so the pool forks only
+    if this is the sole thread; otherwise it starts its workers through a
+    fresh interpreter (forkserver, or spawn where there is none). The app
+    starts the pool at import, before its own threads exist.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if threading.active_count() == 1:
+                method = 'fork'
+            elif 'forkserver' in multiprocessing.get_all_start_methods():
+                method = 'forkserver'
+            else:
+                method = 'spawn'
+            context = multiprocessing.get_context(method)
+            _pool = context.Pool(processes or resolve_workers(0))
+            atexit.register(_pool.terminate)
+        return _pool
+
+
+def parallel_search(prefix, target, workers, start=0, stop=MAX_NONCE + 1, chunk=PARALLEL_CHUNK, cancel=None):
+    """Search the nonce range [start, stop) on up to `workers` processes of the shared pool.
+
+    The range is handed out in chunks, lowest first, and `workers` of them
+    are kept running. The first valid hash reported ends the search; the
+    chunks still running finish on their own and are ignored. `cancel` is an
+    optional threading.Event that aborts the search from the caller's side.
+    Returns (nonce, hex_hash) or None.
+    """
+    pool = start_search_pool()
+    results = queue.Queue()
+    nonce, running = start, 0
+    while True:
+        while running < workers and nonce < stop:
+            end = min(nonce + chunk, stop)
+            pool.apply_async(search_nonce, (prefix, target, nonce, end),
+                             callback=results.put, error_callback=results.put)
+            nonce, running = end, running + 1
+        if not running:
+            return None
+        if cancel is not None and cancel.is_set():
+            return None
+        try:
+            result = results.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        running -= 1
+        if isinstance(result, BaseException):
+            raise result
+        if result is not None:
+            return result
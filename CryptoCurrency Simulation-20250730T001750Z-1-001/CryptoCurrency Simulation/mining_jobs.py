@@ -0,0 +1,199 @@
+"""Background mining jobs.
+
+A job mines on its own thread so no HTTP request waits for a nonce search.
+It takes a block template from the ledger writer, scans nonces in rounds,
+and between rounds checks the ledger snapshot: if the tip moved or a
+transaction in the template left the mempool, or if a refreshed template
+would pay more fees, the search restarts on a new template. Found blocks are
+committed through the writer. Continuous jobs keep going until cancelled,
+and wait for the mempool to refill when it runs dry. Each running job holds
+a thread (and, with several mining workers, tasks in the shared search
+pool), so only `max_running` run at once; start() refuses more.
+"""
+import threading
+import time
+from itertools import count
+
+from mining import PARALLEL_CHUNK, parallel_search, resolve_workers, search_nonce
+
+# Nonces a single-process job scans between template checks
+ROUND_NONCES = 1 << 16
+# Chunks per worker in each parallel search round
+PARALLEL_ROUND_CHUNKS = 16
+# Seconds between template rebuilds while the ledger keeps changing
+TEMPLATE_REFRESH = 1.0
+# Seconds a continuous job sleeps when there is nothing to mine
+IDLE_WAIT = 1.0
+FINISHED_JOBS_KEPT = 100
+# Jobs, continuous or not, that may run at the same time
+MAX_RUNNING_JOBS = 8
+# Fee gain below which a new template is not worth restarting the search for
+FEE_EPSILON = 1e-9
+
+
+class MiningJob:
+    def __init__(self, job_id, miner, continuous):
+        self.id = job_id
+        self.miner = miner
+        self.continuous = continuous
+        self.state = 'running'  # running, completed, cancelled, failed
+        self.message = None
+        self.blocks = []  # hashes of the blocks this job committed
+        self.last_block = None
+        self.nonces_tried = 0
+        self.templates = 0
+        self.started = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.started
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def finish(self, state, message):
+        self.state = state
+        self.message = message
+        self.finished = time.time()
+        self.done.set()
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        return {
+            'id': self.id,
+            'miner': self.miner,
+            'continuous': self.continuous,
+            'state': self.state,
+            'message': self.message,
+            'blocks': list(self.blocks),
+            'nonces_tried': self.nonces_tried,
+            'hashrate': self.nonces_tried / elapsed if elapsed > 0 else 0,
+            'elapsed': elapsed,
+            'templates': self.templates
+        }
+
+
+class MiningJobManager:
+    def __init__(self, ledger, max_running=MAX_RUNNING_JOBS):
+        self.ledger = ledger
+        self.max_running = max_running
+        self.jobs = {}  # job id -> MiningJob, oldest first
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def running(self):
+        return sum(1 for job in self.jobs.values() if not job.done.is_set())
+
+    def start(self, miner, continuous=False):
+        """Start a job on its own thread; returns None if `max_running` jobs are already running"""
+        with self._lock:
+            if self.running() >= self.max_running:
+                return None
+            job = MiningJob(str(next(self._ids)), miner, continuous)
+            self.jobs[job.id] = job
+            self._prune()
+        threading.Thread(target=self._run, args=(job,), name=f'mining-job-{job.id}', daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def cancel_all(self):
+        for job in list(self.jobs.values()):
+            job.cancel()
+        for job in list(self.jobs.values()):
+            job.wait()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self.jobs[job_id]
+
+    # ------------------------
+    # Worker thread
+    # ------------------------
+    def _run(self, job):
+        try:
+            state, message = self._mine(job)
+        except Exception as error:
+            state, message = 'failed', str(error)
+        job.finish(state, message)
+
+    def _mine(self, job):
+        ledger = self.ledger
+        blockchain = ledger.blockchain
+        while not job.cancel_event.is_set():
+            block, message = ledger.call(blockchain.prepare_block, job.miner)
+            if block is None:
+                if not job.continuous:
+                    return 'failed', message
+                job.cancel_event.wait(IDLE_WAIT)
+                continue
+            job.templates += 1
+
+            if self._search(job, block) and ledger.call(blockchain.commit_block, block):
+                job.blocks.append(block.hash)
+                job.last_block = block
+                if not job.continuous:
+                    return 'completed', message
+        return 'cancelled', "Mining cancelled"
+
+    def _search(self, job, block):
+        """Search nonces for `block`; False once the template should be replaced"""
+        ledger = self.ledger
+        blockchain = ledger.blockchain
+        prefix = block.header_prefix()
+        target = block.target
+        version = ledger.snapshot.version
+        checked = time.monotonic()
+        nonce = 0
+        while not job.cancel_event.is_set():
+            workers = resolve_workers(blockchain.network_params.mining_workers)
+            started = time.perf_counter()
+            if workers > 1:
+                stop = nonce + workers * PARALLEL_CHUNK * PARALLEL_ROUND_CHUNKS
+                result = parallel_search(prefix, target, workers, nonce, stop, cancel=job.cancel_event)
+            else:
+                stop = nonce + ROUND_NONCES
+                result = search_nonce(prefix, target, nonce, stop)
+            if result is not None:
+                block.nonce, block.hash = result
+                job.nonces_tried += block.nonce - nonce + 1
+                blockchain.record_hashing(job.miner, block.nonce - nonce + 1, time.perf_counter() - started)
+                return True
+            job.nonces_tried += stop - nonce
+            blockchain.record_hashing(job.miner, stop - nonce, time.perf_counter() - started)
+            nonce = stop
+
+            # A new tip makes the template worthless at once; other changes to
+            # the mempool or parameters are looked at once per refresh interval
+            snapshot = ledger.snapshot
+            if snapshot.tip.hash != block.previous_hash:
+                return False
+            if snapshot.version != version and time.monotonic() - checked >= TEMPLATE_REFRESH:
+                version, checked = snapshot.version, time.monotonic()
+                if self._template_outdated(block, snapshot):
+                    return False
+        return False
+
+    def _template_outdated(self, block, snapshot):
+        if block.target != int(snapshot.analytics['network_params']['mining_target'], 16):
+            return True
+        if any(tx.id not in snapshot.mempool for tx in block.transactions[:-1]):
+            return True
+        # Switch when a fresh selection from the current mempool pays more fees
+        params = self.ledger.blockchain.network_params
+        selected, _ = snapshot.mempool.select(params.block_size_limit, params.max_transactions_per_block)
+        return sum(tx.fee for tx in selected) > sum(tx.fee for tx in block.transactions[:-1]) + FEE_EPSILON
@@ -0,0 +1,216 @@
+"""Discrete-event simulation of block propagation, forks and orphans across many nodes.
+
+Each of `node_count` nodes mines on its own view of the chain. A block found
+by node i reaches node j after
+
+    latency[i, j] + block_size / bandwidth[i]
+
+seconds, and never before its parent. Nodes follow the most-work chain they
+have received, and on equal work keep the block they saw first. Blocks that
+end up off the most-work chain are orphans.
+
+Transactions arrive as a Poisson stream of `tx_rate` per second and are seen
+by every node at once. A block takes as much of its miner's backlog (all
+arrivals so far, less what the miner's chain already confirmed) as fits in
+a block, so its size, and with it its propagation delay, follows the load.
+Transactions in an orphan are still pending on the main chain.
+
+Mining events sit in a heap with one entry per node; with exponential
+(memoryless) discovery times, a node never needs to reschedule when its tip
+changes. Node tips are not stored. Each block in flight keeps one vector of
+arrival times per node, and a miner's tip is worked out on demand: it is the
+best of the "settled" tip (the best block that has reached every node) and
+the in-flight blocks that have already reached that miner. Blocks settle off
+a second heap keyed by their last arrival, and their vectors are then
+dropped, so memory stays proportional to the blocks in flight.
+
+    python netsim.py --blocks 200000 --node-count 500 --block-interval 10 --tx-rate 50 \\
+                     --block-size-limit 1000000 --latency 0.1 --bandwidth 1250000
+"""
+import argparse
+import csv
+import heapq
+import json
+import sys
+import time
+
+import numpy as np
+
+from mining import expected_hashes
+from simulate import add_parameter_arguments, mean_block_interval, miner_nodes, parse_params, typical_transaction_size
+
+GENESIS = 0
+
+
+class NetworkSimulation:
+    def __init__(self, params, latency=0.1, latency_jitter=0.5, bandwidth=1.25e6, bandwidth_jitter=0.5,
+                 block_interval=None, seed=0, tx_rate=7.0):
+        self.params = params
+        self.rng = np.random.default_rng(seed)
+        self.names, shares = miner_nodes(params)
+        nodes = len(self.names)
+        interval = block_interval or mean_block_interval(params)
+        # Each node discovers blocks at its share of the network rate
+        self.node_intervals = interval / shares
+
+        rng = self.rng
+        pair = latency * rng.uniform(1 - latency_jitter, 1 + latency_jitter, size=(nodes, nodes))
+        self.latency = np.triu(pair, 1) + np.triu(pair, 1).T  # symmetric, zero to self
+        self.bandwidth = bandwidth * rng.uniform(1 - bandwidth_jitter, 1 + bandwidth_jitter, size=nodes)
+
+        self.tx_rate = tx_rate
+        self.tx_size = typical_transaction_size(params)
+        self.tx_per_block = min(params.max_transactions_per_block, params.block_size_limit // self.tx_size)
+        self.arrived = 0  # transactions sent so far
+        self.block_work = expected_hashes(params.mining_target)
+
+        # Per-block columns, indexed by block id (genesis is 0)
+        self.parent = [-1]
+        self.miner = [-1]
+        self.found = [0.0]
+        self.height = [0]
+        self.work = [0.0]
+        self.included = [0]
+        self.confirmed = [0]  # transactions in the block and its ancestors
+
+        self.in_flight = {}   # block id -> arrival time at every node
+        self.settling = []    # heap of (time the block reaches its last node, block id)
+        self.settled = GENESIS
+        self.settled_arrivals = np.zeros(nodes)
+
+    def tip(self, node, now):
+        """Best block `node` has received by `now`: most work, then earliest arrival"""
+        best = self.settled
+        best_key = (self.work[best], -self.settled_arrivals[node])
+        for block, arrivals in self.in_flight.items():
+            arrival = arrivals[node]
+            if arrival <= now:
+                key = (self.work[block], -arrival)
+                if key > best_key:
+                    best, best_key = block, key
+        return best
+
+    def settle(self, now):
+        """Retire in-flight blocks that every node has received"""
+        while self.settling and self.settling[0][0] <= now:
+            _, block = heapq.heappop(self.settling)
+            arrivals = self.in_flight.pop(block)
+            if self.work[block] > self.work[self.settled]:
+                self.settled, self.settled_arrivals = block, arrivals
+
+    def run(self, blocks):
+        rng = self.rng
+        heap = [(rng.exponential(interval), node) for node, interval in enumerate(self.node_intervals)]
+        heapq.heapify(heap)
+        last = 0.0
+
+        for block in range(1, blocks + 1):
+            now, node = heap[0]
+            heapq.heapreplace(heap, (now + rng.exponential(self.node_intervals[node]), node))
+            self.settle(now)
+            self.arrived += int(rng.poisson(self.tx_rate * (now - last)))
+            last = now
+
+            parent = self.tip(node, now)
+            included = min(self.tx_per_block, self.arrived - self.confirmed[parent])
+            self.parent.append(parent)
+            self.miner.append(node)
+            self.found.append(now)
+            self.height.append(self.height[parent] + 1)
+            self.work.append(self.work[parent] + self.block_work)
+            self.included.append(included)
+            self.confirmed.append(self.confirmed[parent] + included)
+
+            arrivals = now + self.latency[node] + included * self.tx_size / self.bandwidth[node]
+            arrivals[node] = now
+            parent_arrivals = self.in_flight.get(parent)
+            if parent_arrivals is not None:
+                np.maximum(arrivals, parent_arrivals, out=arrivals)
+            self.in_flight[block] = arrivals
+            heapq.heappush(self.settling, (arrivals.max(), block))
+        return self
+
+    def best_block(self):
+        return int(np.argmax(np.asarray(self.work)))  # first (earliest found) block among equals
+
+    def main_chain(self):
+        """Block ids on the most-work chain, as a boolean mask"""
+        work = np.asarray(self.work)
+        best = self.best_block()
+        on_chain = np.zeros(len(work), dtype=bool)
+        parent = self.parent
+        while best != -1:
+            on_chain[best] = True
+            best = parent[best]
+        return on_chain
+
+    def summary(self):
+        on_chain = self.main_chain()
+        blocks = len(self.parent) - 1
+        orphans = int(blocks - (on_chain.sum() - 1))
+        duration = self.found[-1]
+        main_blocks = int(on_chain.sum() - 1)
+        sizes = np.asarray(self.included[1:]) * self.tx_size
+        confirmed = self.confirmed[self.best_block()]
+        miners = np.asarray(self.miner[1:])
+        orphaned_by_node = np.bincount(miners[~on_chain[1:]], minlength=len(self.names))
+        mined_by_node = np.bincount(miners, minlength=len(self.names))
+        return {
+            'nodes': len(self.names),
+            'blocks': blocks,
+            'main_chain_blocks': main_blocks,
+            'orphaned_blocks': orphans,
+            'orphan_rate': orphans / blocks if blocks else 0.0,
+            'simulated_seconds': duration,
+            'offered_tps': self.arrived / duration if duration else 0.0,
+            'mean_block_size': float(sizes.mean()) if blocks else 0.0,
+            'max_block_size': int(sizes.max()) if blocks else 0,
+            'mean_propagation_delay': float(np.mean(self.latency) +
+                                            (sizes.mean() if blocks else 0.0) * np.mean(1 / self.bandwidth)),
+            'throughput_tps': confirmed / duration if duration else 0.0,
+            'final_backlog': self.arrived - confirmed,
+            'worst_node_orphan_rate': float(np.max(
+                np.divide(orphaned_by_node, mined_by_node, out=np.zeros(len(self.names)), where=mined_by_node > 0)
+            ))
+        }
+
+    def write_blocks(self, path):
+        on_chain = self.main_chain()
+        with open(path, 'w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(['block', 'parent', 'height', 'miner', 'found', 'block_size', 'main_chain'])
+            for block in range(1, len(self.parent)):
+                writer.writerow([block, self.parent[block], self.height[block], self.names[self.miner[block]],
+                                 self.found[block], self.included[block] * self.tx_size, int(on_chain[block])])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=100000)
+    parser.add_argument('--tx-rate', type=float, default=7.0, help='transactions per simulated second')
+    parser.add_argument('--block-interval', type=float,
+                        help='mean seconds between blocks (default: from difficulty and network hashrate)')
+    parser.add_argument('--latency', type=float, default=0.1, help='mean one-way latency between nodes, seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0.5, help='latencies vary by up to this fraction')
+    parser.add_argument('--bandwidth', type=float, default=1.25e6, help='mean upload bandwidth, bytes/s')
+    parser.add_argument('--bandwidth-jitter', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='per-block CSV (parent, miner, main chain membership)')
+    add_parameter_arguments(parser)
+    args = parser.parse_args()
+
+    params = parse_params(args)
+    started = time.perf_counter()
+    simulation = NetworkSimulation(params, args.latency, args.latency_jitter, args.bandwidth,
+                                   args.bandwidth_jitter, args.block_interval, args.seed,
+                                   args.tx_rate).run(args.blocks)
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {args.blocks:,} blocks across {len(simulation.names)} nodes in {elapsed:.2f}s",
+          file=sys.stderr)
+    if args.output:
+        simulation.write_blocks(args.output)
+    print(json.dumps(simulation.summary(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
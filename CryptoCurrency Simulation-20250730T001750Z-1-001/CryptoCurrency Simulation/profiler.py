@@ -0,0 +1,103 @@
+"""On-demand sampling profiler for a running server.
+
+Nothing is instrumented ahead of time. While a capture runs, a background
+thread reads the stack of every thread (sys._current_frames) every
+`interval` seconds. It keeps the stacks that pass through the requested
+function, trimmed to start at that function. In the server that is, for
+example, _mine or _search (mining jobs), search_nonce, prepare_block or
+commit_block (the ledger writer), or a route's view function. When no
+capture is running the profiler costs nothing.
+
+Results use the folded format that flamegraph.pl and speedscope read: one
+line per distinct stack, frames root first separated by ";", then the
+number of samples. Work done in child processes (parallel nonce searches)
+is not seen.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 300
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Capture:
+    def __init__(self, function, seconds, interval):
+        self.function = function
+        self.seconds = seconds
+        self.interval = interval
+        self.started = time.time()
+        self.finished = None
+        self.samples = 0  # sampling passes
+        self.matched = 0  # stacks kept, summed over threads
+        self.stacks = Counter()  # folded stack -> samples
+        self.stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self.finished is None
+
+    def sample(self, skip):
+        self.samples += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                if frame.f_code.co_name == self.function:
+                    self.stacks[';'.join(reversed(labels))] += 1
+                    self.matched += 1
+                    break
+                frame = frame.f_back
+
+    def run(self):
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.seconds
+        while not self.stop_event.wait(self.interval) and time.monotonic() < deadline:
+            self.sample(me)
+        self.finished = time.time()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def to_dict(self):
+        return {
+            'function': self.function,
+            'seconds': self.seconds,
+            'interval': self.interval,
+            'state': 'running' if self.running else 'finished',
+            'elapsed': (self.finished or time.time()) - self.started,
+            'samples': self.samples,
+            'matched': self.matched
+        }
+
+
+class SamplingProfiler:
+    """Runs one capture at a time and keeps the last one for collection"""
+
+    def __init__(self):
+        self.capture = None
+        self._lock = threading.Lock()
+
+    def start(self, function, seconds, interval=DEFAULT_INTERVAL):
+        """Begin sampling stacks through `function`; returns None if a capture is already running"""
+        with self._lock:
+            if self.capture is not None and self.capture.running:
+                return None
+            capture = Capture(function, min(max(float(seconds), interval), MAX_SECONDS), max(0.001, interval))
+            self.capture = capture
+        threading.Thread(target=capture.run, name='sampling-profiler', daemon=True).start()
+        return capture
+
+    def stop(self):
+        capture = self.capture
+        if capture is not None:
+            capture.stop_event.set()
+        return capture
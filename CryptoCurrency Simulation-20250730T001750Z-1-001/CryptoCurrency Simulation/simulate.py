@@ -0,0 +1,256 @@
+"""Headless fast-forward simulation: blocks from sampled discovery times instead of real proof of work.
+
+Block discovery is a Poisson process. A block takes 2^256 / (target + 1)
+hashes on average (16^d for a difficulty of d hex zeros), so intervals are
+exponential with that mean divided by network_hashrate. Each block's winner
+is drawn in proportion to hashrate. The hashrate is split between miner classes by
+`miner_distribution`, and each class is split evenly among its nodes.
+Classes listed first are the big miners: with node_count nodes, node counts
+grow 1, 2, 4, ... down the list. Transactions arrive as a Poisson stream of
+--tx-rate per second.
+
+The "fast" engine samples everything in bulk with NumPy and runs the queue
+through the Lindley recursion, B_k = max(0, B_{k-1} + A_k - C), written in
+closed form as S_k - min(0, min_{j<=k} S_j), where S is the cumulative sum
+of A_k - C and C is the block capacity in transactions. It handles a million
+blocks in a few seconds. The "ledger" engine drives the real Blockchain
+(mempool, fee-rate selection, balances, statistics) with the same sampled
+times and winners but no hashing, for runs that need the full ledger state.
+
+    python simulate.py --blocks 1000000 --tx-rate 7 --output blocks.csv
+    python simulate.py --engine ledger --blocks 2000 --output blocks.parquet
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+
+import numpy as np
+
+from blockchain import BLOCK_REWARD, Blockchain, NetworkParameters, Transaction
+from decentralization import RewardDistribution
+from mining import expected_hashes
+
+COLUMNS = ['height', 'timestamp', 'interval', 'miner', 'arrivals', 'included',
+           'backlog', 'block_size', 'fees', 'reward']
+FUNDED_ACCOUNTS = 100
+
+
+def miner_nodes(params):
+    """Node names and their shares of the network hashrate"""
+    classes = [(name, share) for name, share in params.miner_distribution.items() if share > 0]
+    weights = np.array([2.0 ** rank for rank in range(len(classes))])
+    counts = np.maximum(1, np.floor(params.node_count * weights / weights.sum())).astype(int)
+    # Rounding leftovers go to the class with the most (smallest) nodes
+    counts[-1] += max(0, params.node_count - counts.sum())
+
+    names, shares = [], []
+    total = sum(share for _, share in classes)
+    for (name, share), nodes in zip(classes, counts):
+        for node in range(nodes):
+            names.append(f"{name}-{node}")
+            shares.append(share / total / nodes)
+    return names, np.array(shares)
+
+
+def mean_block_interval(params):
+    return expected_hashes(params.mining_target) / params.network_hashrate
+
+
+def typical_transaction_size(params):
+    return Transaction("user0", "user1", 1.0, params.transaction_fee).size
+
+
+def sample_blocks(params, blocks, tx_rate, rng):
+    """Intervals, winning node indexes and transaction arrivals for `blocks` blocks"""
+    names, shares = miner_nodes(params)
+    intervals = rng.exponential(mean_block_interval(params), blocks)
+    winners = rng.choice(len(names), size=blocks, p=shares)
+    arrivals = rng.poisson(tx_rate * intervals)
+    return names, intervals, winners, arrivals
+
+
+def run_fast(params, blocks, tx_rate, seed=0):
+    """Per-block metrics as a dict of NumPy columns, with no per-block Python loop"""
+    rng = np.random.default_rng(seed)
+    names, intervals, winners, arrivals = sample_blocks(params, blocks, tx_rate, rng)
+    tx_size = typical_transaction_size(params)
+    capacity = min(params.max_transactions_per_block, params.block_size_limit // tx_size)
+
+    # Lindley recursion via the running minimum of the cumulative net arrivals
+    walk = np.cumsum(arrivals - capacity)
+    backlog = walk - np.minimum(np.minimum.accumulate(walk), 0)
+    previous = np.concatenate(([0], backlog[:-1]))
+    included = previous + arrivals - backlog
+
+    fees = included * params.transaction_fee
+    return {
+        'height': np.arange(1, blocks + 1),
+        'timestamp': np.cumsum(intervals),
+        'interval': intervals,
+        'miner': np.array(names)[winners],
+        'arrivals': arrivals,
+        'included': included,
+        'backlog': backlog,
+        'block_size': included * tx_size,
+        'fees': fees,
+        'reward': BLOCK_REWARD + fees
+    }
+
+
+def run_ledger(params, blocks, tx_rate, seed=0):
+    """Same sampling, but every block is built and committed by a real Blockchain"""
+    rng = np.random.default_rng(seed)
+    names, intervals, winners, arrivals = sample_blocks(params, blocks, tx_rate, rng)
+    params.mempool_expiry = 0  # expiry follows wall-clock time, which simulated blocks outrun
+    params.retarget_window = 0  # sampled intervals do not respond to the target
+    blockchain = Blockchain(params)
+    accounts = [f"user{i}" for i in range(FUNDED_ACCOUNTS)]
+    blockchain.open_accounts({account: 1e12 for account in accounts})
+    senders = rng.integers(FUNDED_ACCOUNTS, size=int(arrivals.sum()))
+
+    columns = {name: [] for name in COLUMNS}
+    genesis_time = blockchain.get_last_block().timestamp
+    clock = 0.0  # simulated seconds since genesis
+    sent = 0
+    for height in range(blocks):
+        count = int(arrivals[height])
+        batch = [{'sender': accounts[s], 'recipient': accounts[(s + 1) % FUNDED_ACCOUNTS], 'amount': 1.0}
+                 for s in senders[sent:sent + count]]
+        sent += count
+        blockchain.add_transactions(batch)
+
+        clock += intervals[height]
+        miner = names[winners[height]]
+        block, _ = blockchain.prepare_block(miner)
+        included = fees = size = 0
+        if block is not None:
+            # Stamp the simulated discovery time; the hash is left unsearched
+            block.timestamp = genesis_time + clock
+            block.hash = block.compute_hash()
+            blockchain.commit_block(block)
+            included = len(block.transactions) - 1
+            fees = block.transactions[-1].amount - BLOCK_REWARD
+            size = block.block_size
+        columns['height'].append(height + 1)
+        columns['timestamp'].append(clock)
+        columns['interval'].append(intervals[height])
+        columns['miner'].append(miner)
+        columns['arrivals'].append(count)
+        columns['included'].append(included)
+        columns['backlog'].append(len(blockchain.mempool))
+        columns['block_size'].append(size)
+        columns['fees'].append(fees)
+        columns['reward'].append(BLOCK_REWARD + fees if block is not None else 0.0)
+    return {name: np.asarray(values) for name, values in columns.items()}
+
+
+ENGINES = {'fast': run_fast, 'ledger': run_ledger}
+# Numeric NetworkParameters fields each engine's results depend on. The fast
+# engine has no mempool, and neither engine hashes or retargets.
+ENGINE_PARAMETERS = {
+    'fast': {'block_size_limit', 'mining_difficulty', 'transaction_fee', 'max_transactions_per_block',
+             'network_hashrate', 'node_count'},
+}
+ENGINE_PARAMETERS['ledger'] = ENGINE_PARAMETERS['fast'] | {'mempool_max_bytes', 'mempool_max_transactions'}
+# Keys of summarize(), in order
+SUMMARY_COLUMNS = ['blocks', 'simulated_seconds', 'mean_block_time', 'offered_tps', 'throughput_tps',
+                   'mean_backlog', 'max_backlog', 'final_backlog', 'mean_latency', 'miners',
+                   'gini_coefficient', 'herfindahl_index', 'top_miners_concentration']
+
+
+def summarize(result, tx_rate):
+    """Throughput, backlog, latency and decentralization of a run"""
+    duration = float(result['timestamp'][-1]) if len(result['timestamp']) else 0.0
+    intervals = result['interval']
+    backlog = result['backlog']
+    # Time-averaged queue length: the backlog left by the previous block plus,
+    # on average, half of the arrivals during each interval. Little's law then
+    # turns it into the mean wait of a transaction.
+    previous = np.concatenate(([0], backlog[:-1]))
+    queue_area = float(np.sum((previous + result['arrivals'] / 2) * intervals))
+    latency = queue_area / duration / tx_rate if duration and tx_rate else 0.0
+
+    distribution = RewardDistribution()
+    miners, inverse = np.unique(result['miner'], return_inverse=True)
+    for miner, reward in zip(miners.tolist(), np.bincount(inverse, weights=result['reward']).tolist()):
+        distribution.add(miner, reward)
+    return {
+        'blocks': len(intervals),
+        'simulated_seconds': duration,
+        'mean_block_time': float(intervals.mean()) if len(intervals) else 0.0,
+        'offered_tps': float(result['arrivals'].sum()) / duration if duration else 0.0,
+        'throughput_tps': float(result['included'].sum()) / duration if duration else 0.0,
+        'mean_backlog': float(backlog.mean()) if len(backlog) else 0.0,
+        'max_backlog': int(backlog.max()) if len(backlog) else 0,
+        'final_backlog': int(backlog[-1]) if len(backlog) else 0,
+        'mean_latency': latency,
+        'miners': len(miners),
+        'gini_coefficient': distribution.gini(),
+        'herfindahl_index': distribution.herfindahl(),
+        'top_miners_concentration': distribution.top_concentration(3)
+    }
+
+
+def write_output(result, path):
+    if path.endswith('.parquet'):
+        try:
+            import pandas as pd
+        except ImportError:
+            sys.exit("Parquet output needs pandas and pyarrow (pip install pandas pyarrow)")
+        pd.DataFrame(result).to_parquet(path, index=False)
+        return
+    with open(path, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(result[name].tolist() for name in COLUMNS)))
+
+
+def parse_params(args):
+    params = NetworkParameters()
+    for name in ('block_size_limit', 'mining_difficulty', 'transaction_fee', 'max_transactions_per_block',
+                 'network_hashrate', 'node_count'):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(params, name, value)
+    if args.miner_distribution:
+        params.miner_distribution = json.loads(args.miner_distribution)
+    return params
+
+
+def add_parameter_arguments(parser):
+    parser.add_argument('--block-size-limit', dest='block_size_limit', type=int)
+    parser.add_argument('--mining-difficulty', dest='mining_difficulty', type=float)
+    parser.add_argument('--transaction-fee', dest='transaction_fee', type=float)
+    parser.add_argument('--max-transactions-per-block', dest='max_transactions_per_block', type=int)
+    parser.add_argument('--network-hashrate', dest='network_hashrate', type=float)
+    parser.add_argument('--node-count', dest='node_count', type=int)
+    parser.add_argument('--miner-distribution', dest='miner_distribution',
+                        help='JSON object of miner class -> hashrate share')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=100000)
+    parser.add_argument('--tx-rate', type=float, default=7.0, help='transactions per simulated second')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='fast')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='per-block metrics, .csv or .parquet')
+    add_parameter_arguments(parser)
+    args = parser.parse_args()
+
+    params = parse_params(args)
+    started = time.perf_counter()
+    result = ENGINES[args.engine](params, args.blocks, args.tx_rate, args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Simulated {args.blocks:,} blocks in {elapsed:.2f}s ({args.blocks / elapsed:,.0f} blocks/s)",
+          file=sys.stderr)
+
+    if args.output:
+        write_output(result, args.output)
+    print(json.dumps(summarize(result, args.tx_rate), indent=2))
+
+
+if __name__ == '__main__':
+    main()
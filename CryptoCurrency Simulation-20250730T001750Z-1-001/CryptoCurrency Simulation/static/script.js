@@ -19,6 +19,9 @@ function showTab(tabId) {
     case "analytics":
       loadAnalytics();
       break;
+    case "mine":
+      loadMiningJobs();
+      break;
     case "parameters":
       loadParameters();
       break;
@@ -43,28 +46,45 @@ tabs.forEach(tab => {
   });
 });
 
+// -----------------------------
+// Analytics Snapshot
+// -----------------------------
+// Every tab reads the same snapshot; the server answers 304 until its
+// version changes, so repeated loads cost one tiny round trip.
+let analyticsCache = { etag: null, data: null };
+
+async function getAnalytics() {
+  const headers = analyticsCache.etag ? { "If-None-Match": analyticsCache.etag } : {};
+  const res = await fetch("/analytics", { headers, cache: "no-store" });
+  if (res.status === 304) return analyticsCache.data;
+  analyticsCache = { etag: res.headers.get("ETag"), data: await res.json() };
+  return analyticsCache.data;
+}
+
 // -----------------------------
 // Dashboard Functions
 // -----------------------------
 async function loadDashboard() {
   try {
-    const [analyticsRes, balancesRes] = await Promise.all([
-      fetch("/analytics"),
+    const [analytics, balancesRes] = await Promise.all([
+      getAnalytics(),
       fetch("/balances")
     ]);
     
-    const analytics = await analyticsRes.json();
-    const balances = await balancesRes.json();
-    
-    updateNetworkStatus(analytics);
-    updateQuickStats(analytics, balances);
-    updateRecentActivity(analytics);
-    updateNetworkHealth(analytics);
+    balancesState = await balancesRes.json();
+    renderDashboard(analytics, balancesState);
   } catch (e) {
     console.error("Error loading dashboard:", e);
   }
 }
 
+function renderDashboard(analytics, balances) {
+  updateNetworkStatus(analytics);
+  updateQuickStats(analytics, balances);
+  updateRecentActivity(analytics);
+  updateNetworkHealth(analytics);
+}
+
 function updateNetworkStatus(analytics) {
   const status = document.getElementById("networkStatus");
   const params = analytics.network_params;
@@ -73,7 +93,7 @@ function updateNetworkStatus(analytics) {
     <div class="metric-value">${analytics.total_blocks}</div>
     <div class="metric-label">Total Blocks</div>
     <p><span class="status-indicator status-healthy"></span>Network Active</p>
-    <p><strong>Difficulty:</strong> ${params.mining_difficulty}</p>
+    <p><strong>Difficulty:</strong> ${params.mining_difficulty.toFixed(2)}</p>
     <p><strong>Block Size:</strong> ${formatBytes(params.block_size_limit)}</p>
     <p><strong>Target Block Time:</strong> ${params.block_time_target}s</p>
   `;
@@ -152,28 +172,30 @@ function updateNetworkHealth(analytics) {
 // -----------------------------
 async function loadAnalytics() {
   try {
-    const res = await fetch("/analytics");
-    const analytics = await res.json();
-    
-    updateNetworkParams(analytics);
-    updateMiningStats(analytics);
-    updateTransactionMetrics(analytics);
-    updateBlockStats(analytics);
+    renderAnalytics(await getAnalytics());
   } catch (e) {
     console.error("Error loading analytics:", e);
   }
 }
 
+function renderAnalytics(analytics) {
+  updateNetworkParams(analytics);
+  updateMiningStats(analytics);
+  updateTransactionMetrics(analytics);
+  updateBlockStats(analytics);
+}
+
 function updateNetworkParams(analytics) {
   const params = document.getElementById("networkParams");
   const networkParams = analytics.network_params;
   
   const paramsHtml = `
     <p><strong>Block Size Limit:</strong> ${formatBytes(networkParams.block_size_limit)}</p>
-    <p><strong>Mining Difficulty:</strong> ${networkParams.mining_difficulty}</p>
+    <p><strong>Mining Difficulty:</strong> ${networkParams.mining_difficulty.toFixed(2)}</p>
     <p><strong>Transaction Fee:</strong> ${networkParams.transaction_fee} SIM</p>
     <p><strong>Block Time Target:</strong> ${networkParams.block_time_target}s</p>
     <p><strong>Max Tx per Block:</strong> ${networkParams.max_transactions_per_block}</p>
+    <p><strong>Mining Workers:</strong> ${networkParams.mining_workers || "all CPUs"}</p>
   `;
   
   params.innerHTML = paramsHtml;
@@ -199,7 +221,8 @@ function updateTransactionMetrics(analytics) {
   
   const metricsHtml = `
     <p><strong>Total Transactions:</strong> ${analytics.total_transactions}</p>
-    <p><strong>Mempool Size:</strong> ${analytics.mempool_size}</p>
+    <p><strong>Mempool Size:</strong> ${analytics.mempool_size} (${formatBytes(analytics.mempool_bytes)})</p>
+    <p><strong>Evicted / Expired / Replaced:</strong> ${analytics.mempool_stats.evictions} / ${analytics.mempool_stats.expirations} / ${analytics.mempool_stats.replacements}</p>
     <p><strong>Average Block Size:</strong> ${formatBytes(analytics.average_block_size)}</p>
     <p><strong>Transaction Throughput:</strong> ${(analytics.total_transactions / Math.max(1, analytics.total_blocks)).toFixed(2)} tx/block</p>
   `;
@@ -225,33 +248,44 @@ function updateBlockStats(analytics) {
 // -----------------------------
 async function loadParameters() {
   try {
-    const res = await fetch("/analytics");
-    const analytics = await res.json();
+    const analytics = await getAnalytics();
     const params = analytics.network_params;
     
     // Populate form fields with current values
-    document.getElementById("blockSizeLimit").value = params.block_size_limit;
-    document.getElementById("miningDifficulty").value = params.mining_difficulty;
-    document.getElementById("transactionFee").value = params.transaction_fee;
-    document.getElementById("blockTimeTarget").value = params.block_time_target;
-    document.getElementById("maxTxPerBlock").value = params.max_transactions_per_block;
+    setParameterField("blockSizeLimit", params.block_size_limit);
+    setParameterField("miningDifficulty", params.mining_difficulty.toFixed(2));
+    setParameterField("transactionFee", params.transaction_fee);
+    setParameterField("blockTimeTarget", params.block_time_target);
+    setParameterField("retargetWindow", params.retarget_window);
+    setParameterField("maxTxPerBlock", params.max_transactions_per_block);
+    setParameterField("miningWorkers", params.mining_workers);
   } catch (e) {
     console.error("Error loading parameters:", e);
   }
 }
 
+// The loaded value is kept as the field's default, so a submit can tell what was edited
+function setParameterField(id, value) {
+  const field = document.getElementById(id);
+  field.value = field.defaultValue = value;
+}
+
 // Parameter form submission
 document.getElementById("parameterForm")?.addEventListener("submit", async (e) => {
   e.preventDefault();
   
-  const formData = new FormData(e.target);
+  // Only edited fields are sent: the difficulty shown is rounded, and posting
+  // it back unchanged would overwrite the retargeted 256-bit mining target
   const params = {};
-  
-  for (let [key, value] of formData.entries()) {
-    if (value) {
-      params[key] = value;
+  for (const field of e.target.elements) {
+    if (field.name && field.value && field.value !== field.defaultValue) {
+      params[field.name] = field.value;
     }
   }
+  if (Object.keys(params).length === 0) {
+    alert("No parameters changed");
+    return;
+  }
   
   try {
     const res = await fetch("/update_params", {
@@ -279,31 +313,34 @@ document.getElementById("parameterForm")?.addEventListener("submit", async (e) =
 // -----------------------------
 async function fetchMempool() {
   try {
-    const res = await fetch("/mempool");
-    const mempool = await res.json();
-    
-    const mempoolList = document.getElementById("mempoolList");
-    
-    if (mempool.length === 0) {
-      mempoolList.innerHTML = "<p>No pending transactions in mempool.</p>";
-      return;
-    }
-    
-    const mempoolHtml = mempool.map(tx => `
-      <div class="transaction-item">
-        <p><strong>TXID:</strong> ${tx.txid.substring(0, 16)}...</p>
-        <p><strong>From:</strong> ${tx.sender} <strong>To:</strong> ${tx.recipient}</p>
-        <p><strong>Amount:</strong> ${tx.amount} SIM <strong>Fee:</strong> ${tx.fee} SIM</p>
-        <p><strong>Size:</strong> ${formatBytes(tx.size)}</p>
-      </div>
-    `).join("");
-    
-    mempoolList.innerHTML = mempoolHtml;
+    const res = await fetch(`/mempool?limit=${MEMPOOL_PAGE_SIZE}`);
+    mempoolState = await res.json();
+    renderMempool();
   } catch (e) {
     document.getElementById("mempoolList").innerText = "Failed to load mempool.";
   }
 }
 
+function renderMempool() {
+  const mempoolList = document.getElementById("mempoolList");
+  
+  if (mempoolState.length === 0) {
+    mempoolList.innerHTML = "<p>No pending transactions in mempool.</p>";
+    return;
+  }
+  
+  const mempoolHtml = mempoolState.map(tx => `
+    <div class="transaction-item">
+      <p><strong>TXID:</strong> ${tx.txid.substring(0, 16)}...</p>
+      <p><strong>From:</strong> ${tx.sender} <strong>To:</strong> ${tx.recipient}</p>
+      <p><strong>Amount:</strong> ${tx.amount} SIM <strong>Fee:</strong> ${tx.fee} SIM</p>
+      <p><strong>Size:</strong> ${formatBytes(tx.size)}</p>
+    </div>
+  `).join("");
+  
+  mempoolList.innerHTML = mempoolHtml;
+}
+
 function refreshMempool() {
   fetchMempool();
 }
@@ -313,18 +350,19 @@ function refreshMempool() {
 // -----------------------------
 async function loadDecentralization() {
   try {
-    const res = await fetch("/analytics");
-    const analytics = await res.json();
-    
-    updateDecentralizationMetrics(analytics);
-    updateMinerDistribution(analytics);
-    updateNetworkConcentration(analytics);
-    updateDecentralizationScore(analytics);
+    renderDecentralization(await getAnalytics());
   } catch (e) {
     console.error("Error loading decentralization data:", e);
   }
 }
 
+function renderDecentralization(analytics) {
+  updateDecentralizationMetrics(analytics);
+  updateMinerDistribution(analytics);
+  updateNetworkConcentration(analytics);
+  updateDecentralizationScore(analytics);
+}
+
 function updateDecentralizationMetrics(analytics) {
   const metrics = document.getElementById("decentralizationMetrics");
   const decentralization = analytics.decentralization_metrics;
@@ -462,33 +500,61 @@ async function fetchBalances() {
   }
 }
 
-async function fetchBlockchain() {
+// Explorer and history pages are fetched newest-first; the cursor is the
+// next height to request, or null once the genesis block has been shown.
+const PAGE_SIZE = 20;
+let blockCursor = null;
+let transactionCursor = null;
+
+function pageUrl(path, cursor, loadMore) {
+  let url = `${path}?order=desc&limit=${PAGE_SIZE}`;
+  if (loadMore && cursor !== null) url += `&from_height=${cursor}`;
+  return url;
+}
+
+function renderPage(elementId, buttonId, html, loadMore, emptyText, cursor) {
+  const view = document.getElementById(elementId);
+  if (loadMore) {
+    view.insertAdjacentHTML("beforeend", html);
+  } else {
+    view.innerHTML = html || emptyText;
+  }
+  document.getElementById(buttonId).style.display = cursor === null ? "none" : "";
+}
+
+// Block headers pushed over /events carry tx_count instead of the transactions
+function renderBlock(block) {
+  const txCount = block.tx_count ?? block.transactions.length;
+  return `
+    <div class="block-item">
+      <h4>Block #${block.index}</h4>
+      <p><strong>Hash:</strong> ${block.hash.substring(0, 32)}...</p>
+      <p><strong>Previous:</strong> ${block.previous_hash.substring(0, 32)}...</p>
+      <p><strong>Nonce:</strong> ${block.nonce}</p>
+      <p><strong>Transactions:</strong> ${txCount}</p>
+      <p><strong>Size:</strong> ${formatBytes(block.block_size || 0)}</p>
+      <p><strong>Timestamp:</strong> ${new Date(block.timestamp * 1000).toLocaleString()}</p>
+    </div>
+  `;
+}
+
+async function fetchBlockchain(loadMore = false) {
   try {
-    const res = await fetch("/chain");
-    const data = await res.json();
-    const output = data
-      .map(block => `
-        <div class="block-item">
-          <h4>Block #${block.index}</h4>
-          <p><strong>Hash:</strong> ${block.hash.substring(0, 32)}...</p>
-          <p><strong>Previous:</strong> ${block.previous_hash.substring(0, 32)}...</p>
-          <p><strong>Nonce:</strong> ${block.nonce}</p>
-          <p><strong>Transactions:</strong> ${block.transactions.length}</p>
-          <p><strong>Size:</strong> ${formatBytes(block.block_size || 0)}</p>
-          <p><strong>Timestamp:</strong> ${new Date(block.timestamp * 1000).toLocaleString()}</p>
-        </div>
-      `).join("");
-    document.getElementById("blockchainView").innerHTML = output || "Blockchain is empty.";
+    const res = await fetch(pageUrl("/chain", blockCursor, loadMore));
+    const page = await res.json();
+    const output = page.blocks.map(renderBlock).join("");
+    blockCursor = page.next_from_height;
+    renderPage("blockchainView", "loadMoreBlocks", output, loadMore, "Blockchain is empty.", blockCursor);
   } catch (e) {
     document.getElementById("blockchainView").innerText = "Failed to load blockchain.";
   }
 }
 
-async function fetchTransactions() {
+async function fetchTransactions(loadMore = false) {
   try {
-    const res = await fetch("/transactions");
-    const data = await res.json();
-    const output = data
+    const res = await fetch(pageUrl("/transactions", transactionCursor, loadMore));
+    const page = await res.json();
+    const output = page.transactions
       .map(tx => `
         <div class="transaction-item">
           <p><strong>TXID:</strong> ${tx.txid ? tx.txid.substring(0, 16) + '...' : 'N/A'}</p>
@@ -497,7 +563,8 @@ async function fetchTransactions() {
           <p><strong>Time:</strong> ${new Date(tx.timestamp * 1000).toLocaleString()}</p>
         </div>
       `).join("");
-    document.getElementById("transactionList").innerHTML = output || "No transactions yet.";
+    transactionCursor = page.next_from_height;
+    renderPage("transactionList", "loadMoreTransactions", output, loadMore, "No transactions yet.", transactionCursor);
   } catch (e) {
     document.getElementById("transactionList").innerText = "Failed to load transactions.";
   }
@@ -543,22 +610,22 @@ function clearFlashMessages() {
 
 // Handle form validation
 function validateTransactionForm() {
-  const amount = document.getElementById('amount');
-  const recipient = document.getElementById('recipient');
+  const amounts = [...document.querySelectorAll('.transaction-form input[name="amount"]')];
+  const recipients = [...document.querySelectorAll('.transaction-form input[name="recipient"]')];
   const userBalance = parseFloat(document.querySelector('.user-balance').textContent.match(/[\d.]+/)[0]);
-  const amountValue = parseFloat(amount.value);
+  const amountValues = amounts.map(amount => parseFloat(amount.value));
   
-  if (amountValue > userBalance) {
+  if (amountValues.reduce((total, value) => total + value, 0) > userBalance) {
     showFlashMessage('Insufficient balance for this transaction', 'error');
     return false;
   }
   
-  if (amountValue <= 0) {
+  if (amountValues.some(value => !(value > 0))) {
     showFlashMessage('Amount must be greater than 0', 'error');
     return false;
   }
   
-  if (!recipient.value.trim()) {
+  if (recipients.some(recipient => !recipient.value.trim())) {
     showFlashMessage('Please enter a recipient', 'error');
     return false;
   }
@@ -566,19 +633,176 @@ function validateTransactionForm() {
   return true;
 }
 
+// Extra recipient/amount pairs are sent together and recorded in one commit
+function addRecipientRow() {
+  const rows = document.querySelectorAll('.transaction-form .recipient-row');
+  const row = rows[rows.length - 1].cloneNode(true);
+  row.querySelectorAll('input').forEach(input => {
+    input.removeAttribute('id');
+    input.value = '';
+  });
+  row.querySelectorAll('label').forEach(label => label.removeAttribute('for'));
+  row.querySelectorAll('small').forEach(small => small.remove());
+  rows[rows.length - 1].after(row);
+}
+
+// -----------------------------
+// Mining Jobs
+// -----------------------------
+// Jobs mine in the background; their progress is polled while the Mine tab is open
+const MINING_POLL_INTERVAL = 1000;
+let miningPoll = null;
+
+async function loadMiningJobs() {
+  clearTimeout(miningPoll);
+  try {
+    const res = await fetch("/api/mine");
+    const jobs = await res.json();
+    renderMiningJobs(jobs.reverse());
+    if (activeTab() === "mine" && jobs.some(job => job.state === "running")) {
+      miningPoll = setTimeout(loadMiningJobs, MINING_POLL_INTERVAL);
+    }
+  } catch (e) {
+    document.getElementById("miningInfo").innerText = "Failed to load mining jobs.";
+  }
+}
+
+function renderMiningJobs(jobs) {
+  const miningInfo = document.getElementById("miningInfo");
+  if (jobs.length === 0) {
+    miningInfo.innerHTML = "<p>No mining jobs yet.</p>";
+    return;
+  }
+  miningInfo.innerHTML = jobs.map(job => `
+    <div class="transaction-item">
+      <p><strong>Job #${job.id}</strong> (${job.miner}${job.continuous ? ", continuous" : ""}): ${job.state}</p>
+      <p><strong>Blocks:</strong> ${job.blocks.length} <strong>Nonces:</strong> ${job.nonces_tried.toLocaleString()}
+         <strong>Hash Rate:</strong> ${Math.round(job.hashrate).toLocaleString()} H/s
+         <strong>Elapsed:</strong> ${job.elapsed.toFixed(1)}s</p>
+      ${job.message ? `<p>${job.message}</p>` : ""}
+      ${job.state === "running" ? `<button onclick="cancelMiningJob('${job.id}')" class="btn-secondary">
+        <i class="fas fa-stop"></i> Cancel</button>` : ""}
+    </div>
+  `).join("");
+}
+
+async function cancelMiningJob(jobId) {
+  await fetch(`/api/mine/${jobId}`, { method: "DELETE" });
+  loadMiningJobs();
+}
+
+// -----------------------------
+// Live Updates
+// -----------------------------
+// /events pushes small deltas; they are applied to the cached analytics,
+// balances and mempool so the visible tab re-renders without refetching.
+let balancesState = null;
+let mempoolState = null;  // best-paying page of the mempool, at most MEMPOOL_PAGE_SIZE entries
+const MEMPOOL_PAGE_SIZE = 100;
+
+function activeTab() {
+  return document.querySelector(".tab-link.active")?.dataset.tab;
+}
+
+function renderActiveTab() {
+  const analytics = analyticsCache.data;
+  if (!analytics) return;
+  switch (activeTab()) {
+    case "dashboard":
+      renderDashboard(analytics, balancesState || {});
+      break;
+    case "analytics":
+      renderAnalytics(analytics);
+      break;
+    case "decentralization":
+      renderDecentralization(analytics);
+      break;
+  }
+}
+
+function applyAnalyticsDelta(mutate) {
+  if (!analyticsCache.data) return;
+  mutate(analyticsCache.data);
+  // The local copy no longer matches any server version
+  analyticsCache.etag = null;
+  renderActiveTab();
+}
+
+function applyMempoolTotals(totals) {
+  applyAnalyticsDelta(a => {
+    a.mempool_size = totals.mempool_size;
+    a.mempool_bytes = totals.mempool_bytes;
+  });
+}
+
+function connectEvents() {
+  const source = new EventSource("/events");
+  
+  source.addEventListener("block", e => {
+    const block = JSON.parse(e.data);
+    applyAnalyticsDelta(a => {
+      a.total_blocks = block.total_blocks;
+      a.mining_stats = block.mining_stats;
+      a.total_transactions = block.mining_stats.total_transactions_processed;
+      a.decentralization_metrics = block.decentralization_metrics;
+      a.average_block_size = block.average_block_size;
+      a.miner_distribution[block.miner] = block.miner_stats;
+    });
+    if (activeTab() === "explorer" && document.querySelector("#blockchainView .block-item")) {
+      document.getElementById("blockchainView").insertAdjacentHTML("afterbegin", renderBlock(block));
+    }
+  });
+  
+  source.addEventListener("mempool_add", e => {
+    const tx = JSON.parse(e.data);
+    applyMempoolTotals(tx);
+    if (mempoolState) {
+      // Keep the local page in fee-rate order, like the server's pool
+      const rate = tx.fee / tx.size;
+      const at = mempoolState.findIndex(other => other.fee / other.size < rate);
+      mempoolState.splice(at === -1 ? mempoolState.length : at, 0, tx);
+      // Stay a page: the lowest fee rate drops off the end, as it would on a refetch
+      if (mempoolState.length > MEMPOOL_PAGE_SIZE) mempoolState.pop();
+      if (activeTab() === "mempool") renderMempool();
+    }
+  });
+  
+  source.addEventListener("mempool_remove", e => {
+    const removed = JSON.parse(e.data);
+    applyMempoolTotals(removed);
+    if (mempoolState) {
+      const txids = new Set(removed.txids);
+      mempoolState = mempoolState.filter(tx => !txids.has(tx.txid));
+      if (activeTab() === "mempool") renderMempool();
+    }
+  });
+  
+  source.addEventListener("balances", e => {
+    if (!balancesState) return;
+    Object.assign(balancesState, JSON.parse(e.data));
+    renderActiveTab();
+  });
+  
+  source.addEventListener("params", e => {
+    const params = JSON.parse(e.data);
+    applyAnalyticsDelta(a => { a.network_params = params; });
+  });
+  
+  // The server's event history no longer covers what we missed: refetch
+  source.addEventListener("reset", () => {
+    analyticsCache = { etag: null, data: null };
+    mempoolState = null;
+    showTab(activeTab() || "dashboard");
+  });
+}
+
 // -----------------------------
 // Auto Load and Refresh
 // -----------------------------
 window.addEventListener("DOMContentLoaded", () => {
-  // Load dashboard by default
+  // Load dashboard by default, then keep it current from pushed events
   loadDashboard();
-  
-  // Set up auto-refresh for dashboard
-  setInterval(() => {
-    if (document.querySelector('[data-tab="dashboard"]').classList.contains('active')) {
-      loadDashboard();
-    }
-  }, 10000); // Refresh every 10 seconds
+  connectEvents();
   
   // Add form validation to send form
   const sendForm = document.querySelector('.transaction-form');
@@ -0,0 +1,173 @@
+"""Parameter sweeps over NetworkParameters, run in parallel and resumable.
+
+Each configuration is an independent simulation (see simulate.py) run in a
+process pool. Configurations come from a grid (every combination of the
+--grid values) or from --random samples drawn uniformly from --range
+bounds, not both. Besides NetworkParameters fields, `tx_rate` can be swept
+too; a field the chosen engine does not read is refused, since every row
+would come out the same.
+
+Every configuration gets a seed derived from its own values, so a result
+does not depend on the order or the number of workers. Rows are appended to
+the results CSV as soon as a run finishes, keyed by a configuration id;
+rerunning the same command skips the ids already present, so an interrupted
+sweep picks up where it stopped.
+
+    python sweep.py --grid block_size_limit=250000,1000000 --grid max_transactions_per_block=500,1000,2000 \\
+                    --grid tx_rate=50,100,200 --output sweep.csv
+    python sweep.py --random 200 --range transaction_fee=0.0001:0.01 --range node_count=5:500 --output sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from hashlib import sha256
+
+import numpy as np
+
+from blockchain import NetworkParameters
+from simulate import ENGINE_PARAMETERS, ENGINES, SUMMARY_COLUMNS, summarize
+
+SWEEPABLE = {
+    name: type(value) for name, value in vars(NetworkParameters()).items()
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and name != 'mining_target'
+}
+SWEEPABLE['mining_difficulty'] = float  # the 256-bit target, as fractional hex zeros
+SWEEPABLE['tx_rate'] = float
+DEFAULT_TX_RATE = 7.0
+# What run_config() reports besides summarize()
+COLUMNS = SUMMARY_COLUMNS + ['backlog_growth_tps', 'runtime_seconds']
+
+
+def check_fields(fields, engine):
+    """Refuse fields that cannot be swept, or that `engine` never reads"""
+    for field in fields:
+        if field not in SWEEPABLE:
+            raise SystemExit(f"Cannot sweep {field!r}; choose from {', '.join(sorted(SWEEPABLE))}")
+        if field != 'tx_rate' and field not in ENGINE_PARAMETERS[engine]:
+            read = sorted(ENGINE_PARAMETERS[engine] | {'tx_rate'})
+            raise SystemExit(f"The {engine} engine ignores {field!r}; it reads {', '.join(read)}")
+
+
+def parse_value(field, text):
+    return SWEEPABLE[field](float(text)) if SWEEPABLE[field] is int else float(text)
+
+
+def grid_configs(grid):
+    """Every combination of the --grid field=v1,v2,... values"""
+    fields = [field for field, _ in grid]
+    values = [[parse_value(field, text) for text in texts.split(',')] for field, texts in grid]
+    return [dict(zip(fields, combination)) for combination in itertools.product(*values)]
+
+
+def random_configs(ranges, samples, seed):
+    """`samples` configurations drawn uniformly from the --range field=low:high bounds"""
+    rng = np.random.default_rng(seed)
+    configs = [{} for _ in range(samples)]
+    for field, bounds in ranges:
+        low, high = (parse_value(field, text) for text in bounds.split(':'))
+        if SWEEPABLE[field] is int:
+            values = rng.integers(low, high, endpoint=True, size=samples).tolist()
+        else:
+            values = rng.uniform(low, high, size=samples).tolist()
+        for config, value in zip(configs, values):
+            config[field] = value
+    return configs
+
+
+def config_id(config, engine, blocks, base_seed):
+    """Stable id of one run; also the source of its seed"""
+    key = json.dumps({'config': config, 'engine': engine, 'blocks': blocks, 'seed': base_seed}, sort_keys=True)
+    return sha256(key.encode()).hexdigest()[:16]
+
+
+def run_config(config, engine, blocks, seed):
+    """Run one configuration in a worker process and summarize it"""
+    params = NetworkParameters()
+    tx_rate = DEFAULT_TX_RATE
+    for field, value in config.items():
+        if field == 'tx_rate':
+            tx_rate = value
+        else:
+            setattr(params, field, value)
+    started = time.perf_counter()
+    result = ENGINES[engine](params, blocks, tx_rate, seed)
+    summary = summarize(result, tx_rate)
+    # Near zero when blocks keep up with arrivals; the net queue growth otherwise
+    duration = summary['simulated_seconds']
+    summary['backlog_growth_tps'] = summary['final_backlog'] / duration if duration else 0.0
+    summary['runtime_seconds'] = time.perf_counter() - started
+    return summary
+
+
+def completed_ids(path, columns):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as results:
+        reader = csv.DictReader(results)
+        if reader.fieldnames and reader.fieldnames != columns:
+            raise SystemExit(f"{path} holds a sweep with different columns; use another --output")
+        return {row['config_id'] for row in reader}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--grid', action='append', default=[], metavar='FIELD=V1,V2,...')
+    source.add_argument('--random', type=int, metavar='N', help='draw N configurations from the --range bounds')
+    parser.add_argument('--range', action='append', default=[], metavar='FIELD=LOW:HIGH')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='fast')
+    parser.add_argument('--blocks', type=int, default=10000, help='blocks per configuration')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes (default: one per CPU)')
+    parser.add_argument('--output', default='sweep.csv')
+    args = parser.parse_args()
+
+    grid = [tuple(spec.split('=', 1)) for spec in args.grid]
+    ranges = [tuple(spec.split('=', 1)) for spec in args.range]
+    if args.random:
+        if not ranges:
+            parser.error("--random needs --range bounds")
+        fields = [field for field, _ in ranges]
+        check_fields(fields, args.engine)
+        configs = random_configs(ranges, args.random, args.seed)
+    else:
+        if ranges:
+            parser.error("--range only applies to --random")
+        fields = [field for field, _ in grid]
+        check_fields(fields, args.engine)
+        configs = grid_configs(grid)
+
+    runs = {config_id(config, args.engine, args.blocks, args.seed): config for config in configs}
+    columns = ['config_id', 'seed'] + fields + COLUMNS
+    done = completed_ids(args.output, columns)
+    pending = {run_id: config for run_id, config in runs.items() if run_id not in done}
+    print(f"{len(runs)} configurations, {len(runs) - len(pending)} already in {args.output}, "
+          f"running {len(pending)} on {args.workers} processes", file=sys.stderr)
+    if not pending:
+        return
+
+    write_header = not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+    started = time.perf_counter()
+    with open(args.output, 'a', newline='') as results, ProcessPoolExecutor(args.workers) as pool:
+        writer = csv.DictWriter(results, columns)
+        if write_header:
+            writer.writeheader()
+        futures = {
+            pool.submit(run_config, config, args.engine, args.blocks, int(run_id, 16) % 2 ** 32): run_id
+            for run_id, config in pending.items()
+        }
+        for finished, future in enumerate(as_completed(futures), 1):
+            run_id = futures[future]
+            writer.writerow({'config_id': run_id, 'seed': int(run_id, 16) % 2 ** 32,
+                             **pending[run_id], **future.result()})
+            results.flush()
+            print(f"  {finished}/{len(pending)} done ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
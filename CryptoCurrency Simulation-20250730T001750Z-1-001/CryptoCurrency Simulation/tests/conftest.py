@@ -0,0 +1,5 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CRYPTOSIM_CHAIN_DIR', '')  # tests that import the app keep its chain in memory
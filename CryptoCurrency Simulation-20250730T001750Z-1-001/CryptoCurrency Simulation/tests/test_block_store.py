@@ -0,0 +1,130 @@
+import pytest
+
+from block_store import BlockStore
+from blockchain import Blockchain, NetworkParameters
+from validate import validate_chain
+
+
+def network_params():
+    params = NetworkParameters()
+    params.mining_difficulty = 0
+    params.retarget_window = 0
+    return params
+
+
+def test_opening_balances_survive_a_restart_without_checkpoint(tmp_path):
+    store = BlockStore(str(tmp_path))
+    blockchain = Blockchain(network_params(), store=store)
+    blockchain.open_accounts({'alice': 50, 'bob': 30})
+    assert blockchain.add_transaction('alice', 'bob', 10, 0.5)[0]
+    blockchain.mine_block('miner')
+    blockchain.open_accounts({'dave': 7})
+    balances = dict(blockchain.balances)
+    store.close()  # no checkpoint was written: the process "crashed"
+
+    store = BlockStore(str(tmp_path))
+    restored = Blockchain(network_params(), store=store)
+    assert {address: restored.balances[address] for address in balances} == balances
+    assert restored.open_accounts({'alice': 1000}) == {}
+    store.close()
+
+
+def test_restore_applies_only_openings_after_the_checkpoint(tmp_path):
+    store = BlockStore(str(tmp_path))
+    blockchain = Blockchain(network_params(), store=store)
+    blockchain.open_accounts({'alice': 50})
+    blockchain.save_checkpoint()
+    blockchain.open_accounts({'bob': 30})
+    store.close()
+
+    store = BlockStore(str(tmp_path))
+    restored = Blockchain(network_params(), store=store)
+    assert restored.balances['alice'] == 50 and restored.balances['bob'] == 30
+    store.close()
+
+
+def test_interrupted_opening_is_dropped(tmp_path):
+    store = BlockStore(str(tmp_path))
+    Blockchain(network_params(), store=store).open_accounts({'alice': 50})
+    store.close()
+    with open(tmp_path / 'accounts.jsonl', 'ab') as accounts_file:
+        accounts_file.write(b'{"bob": 3')
+
+    store = BlockStore(str(tmp_path))
+    assert store.accounts_recorded == 1 and store.load_accounts() == {'alice': 50}
+    store.record_accounts({'carol': 20})
+    assert store.load_accounts() == {'alice': 50, 'carol': 20}
+    store.close()
+
+
+def test_validator_starts_from_the_journaled_openings(tmp_path):
+    store = BlockStore(str(tmp_path))
+    blockchain = Blockchain(network_params(), store=store)
+    blockchain.open_accounts({'erin': 100})
+    assert blockchain.add_transaction('erin', 'frank', 90, 0.1)[0]
+    blockchain.mine_block('miner')
+    store.close()
+
+    store = BlockStore(str(tmp_path), readonly=True)
+    report = validate_chain(store, workers=1, resume=False)
+    store.close()
+    assert report['valid'], report['reason']
+
+
+def test_replaced_transaction_stays_dropped_after_a_crash(tmp_path):
+    store = BlockStore(str(tmp_path))
+    blockchain = Blockchain(network_params(), store=store)
+    blockchain.open_accounts({'alice': 10})
+    ok, original = blockchain.add_transaction('alice', 'bob', 9, 0.1)
+    blockchain.save_checkpoint()
+    assert blockchain.add_transaction('alice', 'carol', 9, 0.5, replaces=original)[0]
+    blockchain.mine_block('miner')
+    store.close()  # crash: the checkpoint still holds alice -> bob as pending
+
+    store = BlockStore(str(tmp_path))
+    restored = Blockchain(network_params(), store=store)
+    assert len(restored.mempool) == 0
+    assert restored.balances['alice'] == pytest.approx(0.5) and restored.balances['bob'] == 0
+    assert restored.mine_block('miner')[0] is None
+    store.close()
+
+    store = BlockStore(str(tmp_path), readonly=True)
+    report = validate_chain(store, workers=1, resume=False)
+    store.close()
+    assert report['valid'], report['reason']
+
+
+def test_pending_transactions_survive_a_restart(tmp_path):
+    store = BlockStore(str(tmp_path))
+    blockchain = Blockchain(network_params(), store=store)
+    blockchain.open_accounts({'alice': 10})
+    ok, txid = blockchain.add_transaction('alice', 'bob', 4, 0.1)
+    blockchain.save_checkpoint()
+    store.close()
+
+    store = BlockStore(str(tmp_path))
+    restored = Blockchain(network_params(), store=store)
+    assert restored.get_transaction(txid)['status'] == 'pending'
+    assert restored.balances['alice'] == pytest.approx(5.9) and restored.unconfirmed_credit == {'bob': 4}
+    store.close()
+
+
+def test_chain_built_by_the_node_validates(tmp_path):
+    store = BlockStore(str(tmp_path))
+    blockchain = Blockchain(network_params(), store=store)
+    blockchain.open_accounts({'alice': 50})
+    assert blockchain.add_transaction('MINER', 'alice', 5)[0] is False
+    assert blockchain.add_transaction('alice', 'bob', 0, 0.1)[0] is False
+    assert blockchain.add_transaction('alice', 'bob', 1, -0.1)[0] is False
+    assert [ok for ok, _ in blockchain.add_transactions([
+        {'sender': 'MINER', 'recipient': 'alice', 'amount': 5},
+        {'sender': 'alice', 'recipient': 'bob', 'amount': -1},
+        {'sender': 'alice', 'recipient': 'bob', 'amount': 10, 'fee': 0.1},
+    ])] == [False, False, True]
+    blockchain.mine_block('miner')
+    store.close()
+
+    store = BlockStore(str(tmp_path), readonly=True)
+    report = validate_chain(store, workers=1, resume=False)
+    store.close()
+    assert report['valid'], report['reason']
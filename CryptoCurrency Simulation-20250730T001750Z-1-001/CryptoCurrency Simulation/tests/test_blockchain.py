@@ -0,0 +1,133 @@
+import pytest
+
+from blockchain import Blockchain, NetworkParameters
+
+
+def make_blockchain(**params):
+    network_params = NetworkParameters()
+    network_params.mining_difficulty = 0
+    network_params.retarget_window = 0
+    for name, value in params.items():
+        setattr(network_params, name, value)
+    blockchain = Blockchain(network_params)
+    blockchain.open_accounts({'alice': 50})
+    return blockchain
+
+
+def test_unconfirmed_credit_cannot_be_spent():
+    blockchain = make_blockchain()
+    assert blockchain.add_transaction('alice', 'bob', 10, 0.001)[0]
+    assert blockchain.balances['bob'] == 10
+    assert blockchain.add_transaction('bob', 'carol', 9, 0.005) == (False, "Insufficient balance")
+
+    blockchain.mine_block('miner')
+    assert blockchain.add_transaction('bob', 'carol', 9, 0.005)[0]
+    assert blockchain.unconfirmed_credit == {'carol': 9}
+
+
+def test_batch_can_spend_what_it_receives():
+    blockchain = make_blockchain(max_transactions_per_block=1)
+    results = blockchain.add_transactions([
+        {'sender': 'alice', 'recipient': 'bob', 'amount': 10, 'fee': 0.001},
+        {'sender': 'bob', 'recipient': 'carol', 'amount': 9, 'fee': 0.005},
+        {'sender': 'bob', 'recipient': 'carol', 'amount': 2, 'fee': 0.005},
+    ])
+    assert [ok for ok, _ in results] == [True, True, False]
+
+    # The spend pays the better fee rate but cannot be mined ahead of its funding
+    block, _ = blockchain.mine_block('miner')
+    assert [tx.txid for tx in block.transactions[:-1]] == [results[0][1]]
+    block, _ = blockchain.mine_block('miner')
+    assert [tx.txid for tx in block.transactions[:-1]] == [results[1][1]]
+    assert blockchain.pending_parents == {} and blockchain.pending_children == {}
+
+
+def test_pending_credit_from_an_earlier_batch_stays_unspendable():
+    blockchain = make_blockchain()
+    blockchain.add_transactions([{'sender': 'alice', 'recipient': 'bob', 'amount': 10, 'fee': 0.001}])
+    results = blockchain.add_transactions([{'sender': 'bob', 'recipient': 'carol', 'amount': 9, 'fee': 0.005}])
+    assert results == [(False, "Insufficient balance")]
+
+
+def test_spend_of_batch_credit_is_dropped_with_its_funding():
+    blockchain = make_blockchain(mempool_expiry=60)
+    results = blockchain.add_transactions([
+        {'sender': 'alice', 'recipient': 'bob', 'amount': 10, 'fee': 0.001},
+        {'sender': 'bob', 'recipient': 'carol', 'amount': 9, 'fee': 0.005},
+    ])
+    funding = blockchain.mempool.get(bytes.fromhex(results[0][1]))
+    expired = blockchain.expire_mempool(now=funding.timestamp + 60.5)
+    assert {tx.txid for tx in expired} == {txid for _, txid in results}
+    assert len(blockchain.mempool) == 0 and blockchain.pending_parents == {}
+    assert blockchain.balances['alice'] == pytest.approx(50) and blockchain.balances['bob'] == pytest.approx(0)
+    assert blockchain.unconfirmed_credit == {}
+
+
+def test_replacing_the_funding_drops_the_spend():
+    blockchain = make_blockchain()
+    results = blockchain.add_transactions([
+        {'sender': 'alice', 'recipient': 'bob', 'amount': 10, 'fee': 0.001},
+        {'sender': 'bob', 'recipient': 'carol', 'amount': 9, 'fee': 0.005},
+    ])
+    assert blockchain.add_transaction('alice', 'dave', 10, 0.01, replaces=results[0][1])[0]
+    assert len(blockchain.mempool) == 1
+    assert blockchain.balances['bob'] == pytest.approx(0) and blockchain.balances['carol'] == 0
+
+
+def test_eviction_leaves_no_negative_balance():
+    blockchain = make_blockchain(mempool_max_transactions=2)
+    blockchain.open_accounts({'bob': 5, 'carol': 5})
+    assert blockchain.add_transaction('alice', 'bob', 10, 0.0001)[0]
+    assert blockchain.add_transaction('bob', 'carol', 4, 0.005)[0]
+    assert blockchain.add_transaction('carol', 'alice', 1, 0.01)[0]  # evicts alice -> bob
+
+    assert blockchain.mempool_stats['evictions'] == 1
+    assert min(blockchain.balances.values()) >= 0
+    assert blockchain.balances['bob'] == pytest.approx(5 - 4.005)
+
+
+def test_expiry_refunds_and_settles_credit():
+    blockchain = make_blockchain(mempool_expiry=60)
+    assert blockchain.add_transaction('alice', 'bob', 10, 0.001)[0]
+    tx = next(iter(blockchain.mempool))
+    expired = blockchain.expire_mempool(now=tx.timestamp + 61)
+    assert len(expired) == 1
+    assert blockchain.balances['alice'] == 50 and blockchain.balances['bob'] == 0
+    assert blockchain.unconfirmed_credit == {}
+
+
+def test_replacement_frees_the_original_funds():
+    blockchain = make_blockchain()
+    ok, txid = blockchain.add_transaction('alice', 'bob', 49, 0.001)
+    assert ok
+    assert blockchain.add_transaction('alice', 'carol', 49, 0.002, replaces=txid)[0]
+    assert blockchain.balances['bob'] == 0 and blockchain.unconfirmed_credit == {'carol': 49}
+
+
+
+def test_add_transactions_rejects_non_string_addresses():
+    blockchain = make_blockchain()
+    results = blockchain.add_transactions([
+        {'sender': ['alice'], 'recipient': 'bob', 'amount': 1},
+        {'sender': 'alice', 'recipient': 7, 'amount': 1},
+        {'sender': 'alice', 'recipient': 'bob', 'amount': 1},
+    ])
+    assert results[0] == results[1] == (False, "Missing or invalid fields")
+    assert results[2][0]
+
+
+def test_reads_stop_at_the_given_tip():
+    blockchain = make_blockchain()
+    ok, first = blockchain.add_transaction('alice', 'bob', 10, 0.001)
+    blockchain.mine_block('miner')
+    tip = len(blockchain.chain) - 1
+    ok, second = blockchain.add_transaction('alice', 'bob', 5, 0.001)
+    blockchain.mine_block('miner')
+
+    assert list(blockchain.block_heights(tip=tip)[0]) == list(range(tip + 1))
+    assert blockchain.get_transaction(first, tip=tip)['confirmations'] == 1
+    assert blockchain.get_transaction(second, tip=tip, mempool=blockchain.mempool) is None
+    assert blockchain.get_merkle_proof(second, tip=tip) == (None, "Transaction not found in a block")
+    total, transactions = blockchain.get_address_transactions('bob', tip=tip)
+    assert total == 1 and [record['txid'] for record in transactions] == [first]
+    assert blockchain.get_address_transactions('bob')[0] == 2
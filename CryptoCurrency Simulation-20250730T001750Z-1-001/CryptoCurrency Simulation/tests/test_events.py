@@ -0,0 +1,34 @@
+from events import EventBus
+
+
+def test_since_returns_newer_events():
+    bus = EventBus()
+    for number in range(3):
+        bus.publish('block', {'index': number})
+    reset, events = bus.since(1, timeout=0)
+    assert not reset and [event[0] for event in events] == [2, 3]
+
+
+def test_since_resets_a_client_that_fell_out_of_the_history():
+    bus = EventBus(history=2)
+    for number in range(5):
+        bus.publish('block', {'index': number})
+    reset, events = bus.since(1, timeout=0)
+    assert reset and [event[0] for event in events] == [4, 5]
+
+
+def test_since_resets_an_id_ahead_of_the_bus():
+    bus = EventBus()
+    bus.publish('block', {'index': 0})
+    reset, events = bus.since(500, timeout=0)  # issued before a restart
+    assert reset and [event[0] for event in events] == [1]
+
+
+def test_ids_from_another_process_are_not_resumed():
+    before, after = EventBus(), EventBus()
+    before.publish('block', {})
+    after.publish('block', {})
+    after.publish('block', {})
+    assert after.parse_id(after.format_id(1)) == 1
+    assert after.parse_id(before.format_id(1)) is None
+    assert after.parse_id('1') is None and after.parse_id('garbage') is None
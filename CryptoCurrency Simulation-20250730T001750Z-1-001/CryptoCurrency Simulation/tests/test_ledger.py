@@ -0,0 +1,66 @@
+import random
+
+import ledger as ledger_module
+from blockchain import Blockchain, NetworkParameters
+from ledger import LedgerSnapshot
+
+ACCOUNTS = [f"user{i}" for i in range(20)]
+
+
+def make_blockchain():
+    params = NetworkParameters()
+    params.mining_difficulty = 0
+    params.retarget_window = 0
+    params.mempool_max_transactions = 150  # so some sends evict
+    blockchain = Blockchain(params)
+    blockchain.open_accounts({account: 1000.0 for account in ACCOUNTS})
+    return blockchain
+
+
+def state(view_or_pool, balances):
+    pool = list(view_or_pool)
+    return {
+        'balances': dict(balances),
+        'pool': [tx.id for tx in pool],
+        'select': [tx.id for tx in view_or_pool.select(3000, 20)[0]],
+        'length': len(view_or_pool),
+        'bytes': view_or_pool.total_bytes,
+    }
+
+
+def test_snapshots_match_the_ledger_as_of_their_batch(monkeypatch):
+    monkeypatch.setattr(ledger_module, 'MIN_OVERLAY_CHANGES', 16)  # rebuild the copies often
+    rng = random.Random(7)
+    blockchain = make_blockchain()
+    snapshot = LedgerSnapshot(blockchain)
+    published = []
+    for step in range(400):
+        if step % 50 == 49:
+            blockchain.mine_block(f"miner{step % 3}")
+        else:
+            blockchain.add_transaction(rng.choice(ACCOUNTS), rng.choice(ACCOUNTS),
+                                       round(rng.uniform(0.1, 5), 3), round(rng.uniform(0.0001, 0.01), 6))
+        snapshot = LedgerSnapshot(blockchain, snapshot)
+        expected = state(blockchain.mempool, blockchain.balances)
+        assert state(snapshot.mempool, snapshot.balances.to_dict()) == expected
+        for tx in list(blockchain.mempool)[:5]:
+            assert snapshot.mempool.get(tx.id) is tx and tx.id in snapshot.mempool
+        if step % 37 == 0:
+            published.append((snapshot, expected))
+
+    # Later batches never show through an earlier snapshot
+    for old, expected in published:
+        assert state(old.mempool, old.balances.to_dict()) == expected
+
+
+def test_unchanged_parts_are_shared():
+    blockchain = make_blockchain()
+    first = LedgerSnapshot(blockchain)
+    second = LedgerSnapshot(blockchain, first)
+    assert second.balances is first.balances and second.mempool is first.mempool
+
+    blockchain.add_transaction('user1', 'user2', 1, 0.001)
+    third = LedgerSnapshot(blockchain, second)
+    assert third.balances._base is first.balances._base
+    assert set(third.balances._changes) == {'user1', 'user2'}
+    assert len(third.mempool) == 1 and 'user3' in third.balances and 'nobody' not in third.balances
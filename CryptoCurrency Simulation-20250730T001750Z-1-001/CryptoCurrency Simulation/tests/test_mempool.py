@@ -0,0 +1,125 @@
+import random
+
+from blockchain import Transaction
+from mempool import Mempool
+
+
+def transfer(fee, sender='alice', recipient='bob', amount=1.0, timestamp=None):
+    return Transaction(sender, recipient, amount, fee, timestamp=timestamp)
+
+
+def greedy(transactions, size_limit, max_count):
+    """Reference block filling: best fee rate first, earlier first among equals, skip what no longer fits"""
+    ranked = sorted(enumerate(transactions), key=lambda entry: (-Mempool.fee_rate(entry[1]), entry[0]))
+    chosen, size = [], 0
+    for _, tx in ranked:
+        if len(chosen) == max_count:
+            break
+        if size + tx.size <= size_limit:
+            chosen.append(tx)
+            size += tx.size
+    return chosen, size
+
+
+def test_select_matches_greedy_fill():
+    rng = random.Random(1)
+    pool = Mempool()
+    transactions = [transfer(round(rng.uniform(0.0001, 0.01), 6), recipient='x' * rng.randint(1, 300))
+                    for _ in range(5000)]
+    for tx in transactions:
+        pool.add(tx)
+    for size_limit, max_count in ((10 ** 6, 1000), (20000, 1000), (10 ** 6, 10), (500, 5)):
+        selected, size = pool.select(size_limit, max_count)
+        expected, expected_size = greedy(transactions, size_limit, max_count)
+        assert [tx.id for tx in selected] == [tx.id for tx in expected]
+        assert size == expected_size
+
+
+def test_select_skips_freed_slots():
+    pool = Mempool()
+    small = [transfer(0.001, amount=i) for i in range(10000)]
+    for tx in small:
+        pool.add(tx)
+    for tx in small:
+        pool.remove(tx.id)
+    large = [transfer(0.01, recipient='r' * 480, amount=i) for i in range(100)]
+    for tx in large:
+        pool.add(tx)
+
+    selected, size = pool.select(1200, 10)
+    assert all(tx is not None for tx in selected)
+    assert len(selected) == 1200 // large[0].size
+    assert size == len(selected) * large[0].size
+
+
+def test_remove_and_lookup():
+    pool = Mempool()
+    tx = transfer(0.001)
+    pool.add(tx)
+    assert tx.id in pool and pool.get(tx.id) is tx
+    assert pool.remove(tx.id) is tx
+    assert tx.id not in pool and len(pool) == 0 and pool.total_bytes == 0
+    assert pool.remove(tx.id) is None
+
+
+def test_eviction_candidates_are_cheapest_first():
+    pool = Mempool()
+    transactions = [transfer(fee) for fee in (0.004, 0.001, 0.003, 0.002)]
+    for tx in transactions:
+        pool.add(tx)
+    newcomer = transfer(0.005)
+    victims = pool.eviction_candidates(newcomer, max_bytes=10 ** 6, max_count=3)
+    assert [tx.fee for tx in victims] == [0.001, 0.002]
+    assert len(pool) == 4  # nothing is removed until the caller decides
+
+
+def test_eviction_refuses_lower_fee_rate():
+    pool = Mempool()
+    for fee in (0.002, 0.003):
+        pool.add(transfer(fee))
+    assert pool.eviction_candidates(transfer(0.001), max_bytes=10 ** 6, max_count=2) is None
+    assert pool.eviction_candidates(transfer(0.001), max_bytes=10 ** 6, max_count=3) == []
+
+
+def test_eviction_by_bytes():
+    pool = Mempool()
+    transactions = [transfer(0.001, amount=i) for i in range(3)]
+    for tx in transactions:
+        pool.add(tx)
+    newcomer = transfer(0.01)
+    victims = pool.eviction_candidates(newcomer, max_bytes=pool.total_bytes, max_count=100)
+    # Equal fee rates: the latest arrival ranks last, so it goes first
+    assert [tx.id for tx in victims] == [transactions[-1].id]
+
+
+def test_expire_removes_only_older_arrivals():
+    pool = Mempool()
+    old = transfer(0.001, amount=1)
+    new = transfer(0.001, amount=2)
+    pool.add(old, arrival=100.0)
+    pool.add(new, arrival=200.0)
+    assert pool.expire(150.0) == [old]
+    assert old.id not in pool and new.id in pool
+    assert pool.expire(150.0) == []
+
+
+def test_expire_skips_transactions_already_removed():
+    pool = Mempool()
+    mined = transfer(0.001, amount=1)
+    waiting = transfer(0.001, amount=2)
+    pool.add(mined, arrival=100.0)
+    pool.add(waiting, arrival=110.0)
+    pool.remove(mined.id)
+    assert pool.expire(200.0) == [waiting]
+    assert len(pool) == 0
+
+
+def test_frozen_copy_is_unaffected_by_later_changes():
+    pool = Mempool()
+    first = transfer(0.001, amount=1)
+    pool.add(first)
+    copy = pool.frozen_copy()
+    pool.remove(first.id)
+    pool.add(transfer(0.002, amount=2))
+    assert copy.page() == [first]
+    assert copy.select(10 ** 6, 10)[0] == [first]
@@ -0,0 +1,27 @@
+import threading
+
+from mining import difficulty_to_target, hash_header, parallel_search, start_search_pool
+
+PREFIX = b'header prefix'
+
+
+def test_parallel_search_finds_a_valid_nonce():
+    target = difficulty_to_target(3)
+    nonce, digest = parallel_search(PREFIX, target, workers=4, chunk=1 << 12)
+    assert digest == hash_header(PREFIX, nonce) and int(digest, 16) <= target
+
+
+def test_searches_reuse_the_same_workers():
+    pool = start_search_pool()
+    workers = {process.pid for process in pool._pool}
+    for difficulty in (1, 2, 3):
+        assert parallel_search(PREFIX, difficulty_to_target(difficulty), workers=2, chunk=1 << 12)
+    assert start_search_pool() is pool
+    assert {process.pid for process in pool._pool} == workers
+
+
+def test_exhausted_range_and_cancelled_search_return_none():
+    assert parallel_search(PREFIX, 0, workers=2, start=0, stop=1 << 12, chunk=1 << 10) is None
+    cancel = threading.Event()
+    cancel.set()
+    assert parallel_search(PREFIX, 0, workers=2, cancel=cancel) is None
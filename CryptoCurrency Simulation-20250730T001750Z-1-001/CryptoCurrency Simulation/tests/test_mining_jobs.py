@@ -0,0 +1,22 @@
+from blockchain import Blockchain, NetworkParameters
+from ledger import Ledger
+from mining_jobs import MiningJobManager
+
+
+def test_start_refuses_jobs_beyond_the_cap():
+    params = NetworkParameters()
+    params.retarget_window = 0
+    ledger = Ledger(Blockchain(params))
+    jobs = MiningJobManager(ledger, max_running=1)
+    try:
+        first = jobs.start('miner1', continuous=True)  # an empty mempool keeps it idling
+        assert first is not None
+        assert jobs.start('miner2') is None
+        first.cancel()
+        assert first.wait(timeout=10)
+        second = jobs.start('miner2')
+        assert second is not None and second.wait(timeout=10)
+        assert second.state != 'running'
+    finally:
+        jobs.cancel_all()
+        ledger.close()
@@ -0,0 +1,16 @@
+from blockchain import NetworkParameters
+from netsim import NetworkSimulation
+
+
+def simulate(tx_rate):
+    params = NetworkParameters()
+    params.node_count = 20
+    return NetworkSimulation(params, bandwidth=1.25e5, block_interval=10, tx_rate=tx_rate).run(5000).summary()
+
+
+def test_block_size_follows_the_load():
+    light, heavy = simulate(1), simulate(1000)
+    assert light['mean_block_size'] < heavy['mean_block_size']
+    assert light['final_backlog'] < heavy['final_backlog']
+    assert light['orphan_rate'] < heavy['orphan_rate']
+    assert abs(light['throughput_tps'] - light['offered_tps']) < 0.1
@@ -0,0 +1,16 @@
+import pytest
+
+from sweep import COLUMNS, check_fields, run_config
+
+
+def test_columns_match_a_run():
+    assert list(run_config({'tx_rate': 5.0}, 'fast', 20, 0)) == COLUMNS
+
+
+def test_ignored_fields_are_refused():
+    check_fields(['node_count', 'tx_rate'], 'fast')
+    check_fields(['mempool_max_bytes'], 'ledger')
+    for field, engine in [('block_time_target', 'fast'), ('mining_workers', 'ledger'),
+                          ('mempool_max_bytes', 'fast'), ('miner_distribution', 'fast')]:
+        with pytest.raises(SystemExit):
+            check_fields([field], engine)
@@ -0,0 +1,46 @@
+from hashlib import sha256
+
+from blockchain import BLOCK_REWARD
+from validate import replay_block
+
+
+def txid(number):
+    return sha256(str(number).encode()).digest()
+
+
+def reward(fees, miner='miner'):
+    return (txid('reward'), 'MINER', miner, BLOCK_REWARD + fees, 0)
+
+
+def test_payment_before_its_funding_in_the_same_block_is_valid():
+    balances = {'carol': 20.0}
+    transactions = [
+        (txid(1), 'dave', 'erin', 5.0, 0.01),   # higher fee rate, so first in the template
+        (txid(2), 'carol', 'dave', 19.0, 0.001),
+        reward(0.011),
+    ]
+    assert replay_block(1, 'prev', 'prev', transactions, balances, set()) is None
+    assert abs(balances['dave'] - (19.0 - 5.01)) < 1e-9
+    assert balances['erin'] == 5.0
+
+
+def test_net_overdraft_is_invalid():
+    balances = {'carol': 20.0}
+    transactions = [
+        (txid(1), 'dave', 'erin', 25.0, 0.01),
+        (txid(2), 'carol', 'dave', 19.0, 0.001),
+        reward(0.011),
+    ]
+    reason = replay_block(1, 'prev', 'prev', transactions, balances, set())
+    assert reason is not None and reason.startswith("block overdraws dave")
+
+
+def test_reward_must_match_subsidy_and_fees():
+    transactions = [(txid(1), 'carol', 'dave', 1.0, 0.5), reward(0.4)]
+    assert "reward pays" in replay_block(1, 'prev', 'prev', transactions, {'carol': 20.0}, set())
+
+
+def test_repeated_txid_is_invalid():
+    seen = {txid(1)}
+    transactions = [(txid(1), 'carol', 'dave', 1.0, 0.5), reward(0.5)]
+    assert "already confirmed" in replay_block(1, 'prev', 'prev', transactions, {'carol': 20.0}, seen)
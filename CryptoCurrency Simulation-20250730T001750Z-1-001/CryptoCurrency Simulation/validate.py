@@ -0,0 +1,237 @@
+"""Full-chain validation of an on-disk block log.
+
+Checks that every block's transactions hash to their txids and to the
+header's Merkle root, that the header hashes to the stored hash, that the
+hash is at most the target the header commits to, and that each block
+links to the one before it. A sequential replay then confirms that no
+block leaves a balance negative, that no txid appears twice and that every
+reward pays exactly the block reward plus the block's fees. Balances are
+checked once per block, after all of its transfers: templates order
+transactions by fee rate, so a payment can come before the one that funds it.
+
+The per-block checks need nothing from other blocks, so batches of raw
+records go to a process pool. Workers hand back only what the replay needs:
+hashes and (txid, sender, recipient, amount, fee) tuples, so the replay
+loop does no JSON parsing. Validation stops at the first invalid height and
+reports why.
+
+Addresses opened outside the chain (the demo accounts, and users who signed
+up) hold starting balances that no block records, so the replay begins from
+`initial_balances`: by default the openings the node journaled next to the
+log, or the demo accounts for a log without a journal. After a run the
+state at the last valid block is saved as a "validated" checkpoint next to
+the log. A later run with the same initial balances resumes after that
+block, provided the block is still in the log with the same hash.
+
+    python validate.py instance/chaindata --workers 8
+    python validate.py instance/chaindata --balances users.json --full
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+
+from blockchain import BLOCK_REWARD, DEMO_BALANCES, Block, Transaction, txid_key
+from block_store import BlockStore
+from mining import resolve_workers
+
+BATCH_BLOCKS = 256
+# Blocks between validated checkpoints, so an interrupted run loses little
+VALIDATION_CHECKPOINT_INTERVAL = 100000
+CHECKPOINT_NAME = 'validated'
+CHECKPOINT_FORMAT = 2  # txids kept as raw bytes
+# Float rounding allowed in balance and reward arithmetic
+BALANCE_EPSILON = 1e-9
+
+
+class InvalidBlock(Exception):
+    pass
+
+
+def check_block(height, raw):
+    """Stateless checks of one stored block; returns what the replay needs"""
+    try:
+        block = Block.from_dict(json.loads(raw))
+    except (ValueError, KeyError, TypeError) as error:
+        raise InvalidBlock(f"unreadable block record ({error!r})")
+    if block.index != height:
+        raise InvalidBlock(f"block claims height {block.index}")
+
+    transactions = []
+    for position, tx in enumerate(block.transactions):
+        if isinstance(tx, Transaction):
+            if tx.compute_txid(block.version) != tx.txid:
+                raise InvalidBlock(f"transaction {position} does not hash to its txid {tx.txid}")
+            transactions.append((tx.id, tx.sender, tx.recipient, tx.amount, tx.fee))
+        else:  # Legacy transaction dict
+            transactions.append((txid_key(tx.get('txid')), tx.get('sender'), tx.get('recipient'),
+                                 tx.get('amount', 0.0), tx.get('fee', 0.0)))
+    if block.compute_merkle_root() != block.merkle_root:
+        raise InvalidBlock("merkle root does not match the block's transactions")
+    if block.compute_hash() != block.hash:
+        raise InvalidBlock(f"header hashes to {block.compute_hash()}, not the stored {block.hash}")
+    if int(block.hash, 16) > block.target:
+        raise InvalidBlock(f"hash {block.hash} is above the block's target {block.target:064x}")
+    return block.hash, block.previous_hash, transactions
+
+
+def check_batch(start, records):
+    """Check consecutive blocks from `start`; stops at the first invalid one"""
+    checked = []
+    for height, raw in enumerate(records, start):
+        try:
+            checked.append(check_block(height, raw))
+        except InvalidBlock as error:
+            return checked, (height, str(error))
+    return checked, None
+
+
+def checked_batches(store, start, end, workers):
+    """(first height, checked blocks, error) per batch of heights [start, end), in chain order"""
+    ranges = [(height, min(height + BATCH_BLOCKS, end)) for height in range(start, end, BATCH_BLOCKS)]
+    read = lambda first, stop: [store.read_raw(height) for height in range(first, stop)]  # noqa: E731
+    if workers == 1:
+        for first, stop in ranges:
+            yield (first,) + check_batch(first, read(first, stop))
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        # Only a few batches in flight, so memory stays flat on long chains
+        pending = deque()
+        for first, stop in ranges:
+            pending.append((first, pool.submit(check_batch, first, read(first, stop))))
+            if len(pending) >= workers * 2:
+                first, future = pending.popleft()
+                yield (first,) + future.result()
+        for first, future in pending:
+            yield (first,) + future.result()
+
+
+def balances_digest(balances):
+    return sha256(json.dumps(balances, sort_keys=True).encode()).hexdigest()
+
+
+def validate_chain(store, initial_balances=None, workers=0, resume=True):
+    """Validate `store` (a BlockStore) from genesis or from its validated checkpoint.
+
+    Returns a report with `valid`, the first `invalid_height` and its
+    `reason` (None when valid), the heights covered and blocks per second.
+    """
+    if initial_balances is None:
+        initial_balances = store.load_accounts() if store.accounts_recorded else DEMO_BALANCES
+    initial_balances = dict(initial_balances)
+    digest = balances_digest(initial_balances)
+    balances = dict(initial_balances)
+    seen = set()
+    start, previous_hash = 0, "0"
+    end = len(store)  # blocks a running node appends meanwhile are left for the next run
+
+    state = store.load_checkpoint(CHECKPOINT_NAME) if resume else None
+    if (state is not None and state.get('format') == CHECKPOINT_FORMAT and state['initial_balances'] == digest
+            and state['height'] < end and store[state['height']].hash == state['hash']):
+        balances, seen = state['balances'], state['txids']
+        start, previous_hash = state['height'] + 1, state['hash']
+
+    def save(height, block_hash):
+        store.save_checkpoint({'format': CHECKPOINT_FORMAT, 'height': height, 'hash': block_hash,
+                               'initial_balances': digest, 'balances': balances, 'txids': seen}, CHECKPOINT_NAME)
+
+    started = time.perf_counter()
+    height, invalid, reason = start, None, None
+    replayed = True  # False once a failed replay has left the state half-applied
+    for first, checked, error in checked_batches(store, start, end, resolve_workers(workers)):
+        for height, (block_hash, linked_to, transactions) in enumerate(checked, first):
+            reason = replay_block(height, linked_to, previous_hash, transactions, balances, seen)
+            if reason is not None:
+                replayed = False
+                break
+            previous_hash = block_hash
+            if height % VALIDATION_CHECKPOINT_INTERVAL == 0 and height > start:
+                save(height, block_hash)
+        if reason is None and error is not None:
+            height, reason = error
+        if reason is not None:
+            invalid = height
+            break
+    elapsed = time.perf_counter() - started
+
+    last_valid = (invalid if invalid is not None else end) - 1
+    if last_valid >= start and replayed:
+        save(last_valid, previous_hash)
+    checked_blocks = last_valid - start + 1
+    return {
+        'valid': invalid is None,
+        'invalid_height': invalid,
+        'reason': reason,
+        'start_height': start,
+        'last_valid_height': last_valid,
+        'blocks_checked': checked_blocks,
+        'seconds': elapsed,
+        'blocks_per_second': checked_blocks / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def replay_block(height, linked_to, previous_hash, transactions, balances, seen):
+    """Apply one block's transactions to `balances`; returns why the block is invalid, or None"""
+    if linked_to != previous_hash:
+        return f"previous_hash {linked_to} does not link to block {height - 1} ({previous_hash})"
+    if height == 0:
+        return "genesis block carries transactions" if transactions else None
+    if not transactions:
+        return "block has no reward transaction"
+
+    fees = 0.0
+    senders = set()
+    for position, (txid, sender, recipient, amount, fee) in enumerate(transactions):
+        if txid is not None and txid in seen:
+            return f"transaction {position} ({txid.hex()}) was already confirmed"
+        seen.add(txid)
+        if position == len(transactions) - 1:
+            break
+        if sender == "MINER":
+            return f"transaction {position} mints coins outside the reward"
+        if amount <= 0 or fee < 0:
+            return f"transaction {position} has amount {amount} and fee {fee}"
+        balances[sender] = balances.get(sender, 0.0) - amount - fee
+        balances[recipient] = balances.get(recipient, 0.0) + amount
+        senders.add(sender)
+        fees += fee
+    for sender in senders:
+        if balances[sender] < -BALANCE_EPSILON:
+            return f"block overdraws {sender} to {balances[sender]}"
+
+    txid, sender, recipient, amount, fee = transactions[-1]
+    if sender != "MINER" or fee != 0:
+        return "last transaction is not a block reward"
+    if abs(amount - (BLOCK_REWARD + fees)) > BALANCE_EPSILON * max(1.0, amount):
+        return f"reward pays {amount}, expected {BLOCK_REWARD + fees} (subsidy plus fees)"
+    balances[recipient] = balances.get(recipient, 0.0) + amount
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help='block store directory (instance/chaindata by default in the app)')
+    parser.add_argument('--balances', help='JSON object of starting balances held outside the chain '
+                                           '(default: the journaled account openings)')
+    parser.add_argument('--workers', type=int, default=0, help='processes checking hashes (default: one per CPU)')
+    parser.add_argument('--full', action='store_true', help='ignore the validated checkpoint and start at genesis')
+    args = parser.parse_args()
+
+    initial_balances = None
+    if args.balances:
+        with open(args.balances) as balances_file:
+            initial_balances = json.load(balances_file)
+    store = BlockStore(args.directory, readonly=True)
+    report = validate_chain(store, initial_balances, args.workers, resume=not args.full)
+    store.close()
+    print(f"Checked {report['blocks_checked']:,} blocks from height {report['start_height']} "
+          f"in {report['seconds']:.2f}s ({report['blocks_per_second']:,.0f} blocks/s)", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['valid'] else 1)
+
+
+if __name__ == '__main__':
+    main()